@@ -1,9 +1,6 @@
-import os
-import boto3
 from pydantic import BaseModel, Field
 from typing import Literal, List
-import instructor
-from instructor import Mode
+from .llm import structured
 
 # --- 1. Define the (NEW) Structured Output Schema ---
 # This new, more detailed model forces the AI to be more comprehensive.
@@ -43,11 +40,7 @@ class DetailedBusinessAdvice(BaseModel):
         description="A 1-2 sentence warning about potential risks, pitfalls, or important considerations the user must keep in mind. If irrelevant, this should be 'N/A'."
     )
 
-# --- 2. System Instruction and LLM Configuration ---
-MODEL_ID = "meta.llama3-70b-instruct-v1:0"
-AWS_REGION = os.environ.get("AWS_REGION", "us-east-1") 
-
-# --- UPDATED SYSTEM PROMPT ---
+# --- 2. System Instruction (UPDATED SYSTEM PROMPT) ---
 SYSTEM_PROMPT = """
 You are a senior Nigerian Business and Tax Advisor. Replies must be Nigeria-specific, factual, and concise.
 Rules:
@@ -57,29 +50,13 @@ Rules:
 Return JSON strictly matching the schema.
 """
 
-_bedrock = None
-
-def _client():
-    global _bedrock
-    if _bedrock is None:
-        _bedrock = boto3.client('bedrock-runtime', region_name=AWS_REGION)
-    return _bedrock
-
-
 def get_nigerian_advice(user_query: str) -> DetailedBusinessAdvice:
     """
-    Calls the Llama 3 70B model via AWS Bedrock using instructor for structured output.
+    Calls the Llama 3 70B model (see ai/llm.py) for structured output.
     """
     try:
-        client = instructor.from_bedrock(_client(), mode=Mode.BEDROCK_JSON)
         full_query = f"{SYSTEM_PROMPT}\n\nUSER QUERY:\n{user_query}"
-        return client.messages.create(
-            model=MODEL_ID,
-            messages=[{"role": "user", "content": full_query}],
-            response_model=DetailedBusinessAdvice,
-            max_tokens=900,
-            temperature=0.1
-        )
+        return structured(DetailedBusinessAdvice, full_query, max_tokens=900, temperature=0.1, caller="advisor")
     except Exception as e:
         print(f"[Advisor] Bedrock failed: {e}")
         return DetailedBusinessAdvice(
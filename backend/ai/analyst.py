@@ -1,9 +1,6 @@
-import os
-import boto3
 from pydantic import BaseModel, Field
 from typing import List
-import instructor
-from instructor import Mode
+from .llm import structured
 
 # --- Structured Output Schema ---
 class BusinessAnalysisReport(BaseModel):
@@ -31,9 +28,7 @@ class BusinessAnalysisReport(BaseModel):
         description="3-5 Nigeria-specific bullets with measurable target and timeframe."
     )
 
-# --- 2. System Instruction and LLM Configuration ---
-MODEL_ID = "meta.llama3-70b-instruct-v1:0"
-AWS_REGION = os.environ.get("AWS_REGION", "us-east-1")
+# --- 2. System Instruction ---
 
 SYSTEM_PROMPT = (
     "You are an expert Nigerian Business Analyst for MSMEs. Be numeric, concise, and Nigeria-specific.\n"
@@ -46,21 +41,9 @@ SYSTEM_PROMPT = (
     "Return JSON matching the schema exactly."
 )
 
-_bedrock_client = None
-
-def _get_bedrock_client():
-    global _bedrock_client
-    if _bedrock_client is None:
-        _bedrock_client = boto3.client("bedrock-runtime", region_name=AWS_REGION)
-    return _bedrock_client
-
-
 def get_business_analysis(user_data: dict) -> BusinessAnalysisReport:
-    """Generate a structured business analysis via Bedrock with Instructor."""
+    """Generate a structured business analysis via the shared LLM client (ai/llm.py)."""
     try:
-        bedrock_client = _get_bedrock_client()
-        client = instructor.from_bedrock(bedrock_client, mode=Mode.BEDROCK_JSON)
-
         data_string = (
             f"Monthly Revenue: {user_data.get('revenue', 0):,.2f} NGN\n"
             f"Total Costs: {user_data.get('total_costs', 0):,.2f} NGN\n"
@@ -68,15 +51,19 @@ def get_business_analysis(user_data: dict) -> BusinessAnalysisReport:
             f"Bank Balance: {user_data.get('bank_balance', 0):,.2f} NGN\n"
             f"Industry: {user_data.get('industry', 'N/A')}"
         )
+        projection = user_data.get('projection') or {}
+        if projection:
+            data_string += (
+                f"\nProjection ({projection['months_of_history']} months of history, {projection['method']} fit):\n"
+                f"Sales trend: {projection['monthly_sales_trend']:+,.0f} NGN per month\n"
+                f"Next 12 months revenue (median): {projection['next_12m_revenue_p50']:,.0f} NGN\n"
+                f"Next 12 months profit (p10 / median / p90): {projection['next_12m_profit_p10']:,.0f} / "
+                f"{projection['next_12m_profit_p50']:,.0f} / {projection['next_12m_profit_p90']:,.0f} NGN\n"
+                f"Provisional taxes next 12 months (median): PIT {projection['next_12m_pit_p50']:,.0f}, "
+                f"CIT+TET {projection['next_12m_cit_p50']:,.0f}, VAT {projection['next_12m_vat_p50']:,.0f} NGN"
+            )
         full_query = f"{SYSTEM_PROMPT}\n\nContext:\n{data_string}"
-        report_object = client.messages.create(
-            model=MODEL_ID,
-            messages=[{"role": "user", "content": full_query}],
-            response_model=BusinessAnalysisReport,
-            max_tokens=650,
-            temperature=0.05
-        )
-        return report_object
+        return structured(BusinessAnalysisReport, full_query, max_tokens=650, temperature=0.05, caller="analyst")
     except Exception as e:
         print(f"[Analyst] Bedrock failed: {e}")
         # Fallback: compute a minimal report from numeric inputs
@@ -85,9 +72,18 @@ def get_business_analysis(user_data: dict) -> BusinessAnalysisReport:
         net_profit = float(user_data.get('net_profit', revenue - total_costs))
         margin = (net_profit / revenue * 100) if revenue > 0 else 0.0
         est_valuation = f"Approx. NGN {int(max(0, net_profit) * 12 * 2):,} (2x annual net profit)"
+        projection = user_data.get('projection') or {}
+        if projection:
+            growth = (
+                f"Trend {projection['monthly_sales_trend']:+,.0f} NGN/month in sales; next 12 months profit "
+                f"NGN {projection['next_12m_profit_p10']:,.0f} to {projection['next_12m_profit_p90']:,.0f} "
+                f"(median {projection['next_12m_profit_p50']:,.0f})."
+            )
+        else:
+            growth = "Insufficient history for projections; provide monthly series."
         return BusinessAnalysisReport(
             profitability_analysis=f"Net profit NGN {net_profit:,.2f} (margin {margin:.1f}%).",
-            growth_and_future_projection="Insufficient history for projections; provide monthly series.",
+            growth_and_future_projection=growth,
             business_efficiency_analysis=f"Cost-to-revenue ratio {(total_costs / revenue * 100) if revenue>0 else 0:.1f}%.",
             estimated_business_valuation=est_valuation,
             tax_compliance_overview="Maintain VAT (7.5%) records; CIT/TET depend on company size.",
@@ -1,13 +1,9 @@
-import os
-import boto3
+from flask import g, has_app_context
 from pydantic import BaseModel, Field
-import instructor
-from instructor import Mode
 from typing import List
-import re
-
-MODEL_ID = "meta.llama3-70b-instruct-v1:0"
-AWS_REGION = os.environ.get("AWS_REGION", "us-east-1")
+import metrics
+from .llm import structured
+from .semantic_cache import chat_cache, is_general
 
 class ChatReply(BaseModel):
     reply: str = Field(..., description="Short, actionable reply in plain English.")
@@ -18,42 +14,75 @@ _SYSTEM_PROMPT = (
     "Provide numbered steps with metrics/timeframes when giving advice."
 )
 
-_bedrock = None
+FALLBACK_REPLY = "Couldn't reach the server at this moment, try again later"
+
+def _format_history(history: List[dict], summary: str) -> str:
+    """Plain 'User: ...' lines; far fewer tokens than the repr of a list of dicts."""
+    parts = []
+    if summary:
+        parts.append(f"Earlier in this conversation (summary):\n{summary}")
+    if history:
+        names = {"user": "User", "assistant": "Assistant"}
+        parts.append("Recent messages:\n" + "\n".join(
+            f"{names.get(turn.get('role'), 'User')}: {turn.get('content', '')}" for turn in history
+        ))
+    return "\n\n".join(parts) or "(none)"
+
+def shares_answer(user_message: str) -> bool:
+    """True when the reply comes from (or goes into) the shared cache, so no business context is needed."""
+    return chat_cache() is not None and is_general(user_message)
+
+def _cached_answer(user_message: str):
+    """The shared cache's answer (or None), looked up once per request.
 
-def _client():
-    global _bedrock
-    if _bedrock is None:
-        _bedrock = boto3.client('bedrock-runtime', region_name=AWS_REGION)
-    return _bedrock
+    The skip_slot probe and the handler both ask; reusing the first result saves a second
+    nearest-neighbour search and means an entry expiring in between cannot reach the LLM slot-free.
+    """
+    memo = g.get("chat_cache_lookup") if has_app_context() else None
+    if memo is not None and memo[0] == user_message:
+        return memo[1]
+    answer = chat_cache().get(user_message)
+    if has_app_context():
+        g.chat_cache_lookup = (user_message, answer)
+    return answer
 
+def is_cached(user_message: str) -> bool:
+    """Whether a shared cached answer exists right now (no LLM call would be made)."""
+    return shares_answer(user_message) and _cached_answer(user_message) is not None
 
-def get_business_chat_reply(history: List[dict], user_message: str, context: str = "") -> ChatReply:
+def get_business_chat_reply(history: List[dict], user_message: str, context: str = "", summary: str = "") -> ChatReply:
     """
-    Generate a chat response using Bedrock + instructor with a simple schema.
-    history: list of { role: 'user'|'assistant', content: str }
+    Generate a chat response via the shared LLM client (ai/llm.py) with a simple schema.
+    history: list of { role: 'user'|'assistant', content: str } (recent turns only)
     user_message: latest user message
     context: optional business context string to prepend
+    summary: optional rolling summary of turns older than `history`
     """
+    cache = chat_cache()
+    # General questions are answered without the asker's context so the reply can be shared
+    cacheable = shares_answer(user_message)
+    if cacheable:
+        cached = _cached_answer(user_message)
+        metrics.inc("chat_cache_lookups_total", outcome="hit" if cached else "miss")
+        if cached:
+            return ChatReply(reply=cached)
+        context, history, summary = "", [], ""
+    else:
+        metrics.inc("chat_cache_lookups_total", outcome="bypass")
+
     try:
-        client = instructor.from_bedrock(_client(), mode=Mode.BEDROCK_JSON)
         prompt = (
             f"{_SYSTEM_PROMPT}\n\nContext:\n{context}\n\n"
-            f"History: {history}\n\nQuestion: {user_message}"
+            f"History:\n{_format_history(history, summary)}\n\nQuestion: {user_message}"
         )
-        result = client.messages.create(
-            model=MODEL_ID,
-            messages=[{"role": "user", "content": prompt}],
-            response_model=ChatReply,
-            max_tokens=500,
-            temperature=0.1
-        )
-        return result
+        result = structured(ChatReply, prompt, max_tokens=500, temperature=0.1, caller="chat")
     except Exception as e:
         print(f"[Chat] Bedrock failed: {e}")
         # Provide a generic fallback if the AI service fails
-        return ChatReply(
-            reply="Couldn't reach the server at this moment, try again later"
-        )
+        return ChatReply(reply=FALLBACK_REPLY)
+    if cacheable:
+        cache.put(user_message, result.reply)
+    return result
 
 # --- 4. Interactive Execution ---
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+"""Server-side conversations for /ai/chat.
+
+Clients send only the new message and a session id. The prompt carries the
+session's rolling summary plus its last CHAT_RECENT_TURNS turns, so request
+and prompt size stay flat however long the conversation runs.
+
+When an exchange pushes turns out of the recent window they are folded into
+`ChatSession.summary`: the first sentence of each turn, with the oldest lines
+dropped past CHAT_SUMMARY_CHARS. Folding is extractive so it costs no extra
+model call, and each turn is folded exactly once.
+"""
+import re
+import secrets
+from datetime import datetime
+from flask import current_app
+from extensions import db
+from models import ChatSession, ChatTurn
+
+_CODES = {"user": "u", "assistant": "a"}
+_ROLES = {"u": "user", "a": "assistant"}
+_NAMES = {"u": "User", "a": "Assistant"}
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+FOLD_LINE_CHARS = 160
+
+
+def get_session(business_id: int, session_id: str):
+    """The session if it exists and belongs to `business_id`, else None."""
+    if not isinstance(session_id, str) or len(session_id) != 32:
+        return None
+    return ChatSession.query.filter_by(id=session_id, business_id=business_id).first()
+
+
+def new_session(business_id: int) -> ChatSession:
+    session = ChatSession(id=secrets.token_hex(16), business_id=business_id,
+                          summary='', summarized_through=0, turn_count=0)
+    db.session.add(session)
+    return session
+
+
+def recent_turns(session: ChatSession) -> list:
+    """The unsummarised tail of the conversation as [{role, content}], oldest first."""
+    if not session.turn_count:
+        return []
+    start = max(session.summarized_through, session.turn_count - current_app.config['CHAT_RECENT_TURNS'])
+    rows = (
+        db.session.query(ChatTurn.role, ChatTurn.content)
+        .filter(ChatTurn.session_id == session.id, ChatTurn.seq >= start)
+        .order_by(ChatTurn.seq)
+        .all()
+    )
+    return [{"role": _ROLES[role], "content": content} for role, content in rows]
+
+
+def _fold_line(role: str, content: str) -> str:
+    first = _SENTENCE_END.split(" ".join(content.split()), maxsplit=1)[0]
+    if len(first) > FOLD_LINE_CHARS:
+        first = first[:FOLD_LINE_CHARS - 1] + "…"
+    return f"{_NAMES[role]}: {first}"
+
+
+def _fold(session: ChatSession):
+    fold_until = session.turn_count - current_app.config['CHAT_RECENT_TURNS']
+    if fold_until <= session.summarized_through:
+        return
+    rows = (
+        db.session.query(ChatTurn.role, ChatTurn.content)
+        .filter(ChatTurn.session_id == session.id,
+                ChatTurn.seq >= session.summarized_through, ChatTurn.seq < fold_until)
+        .order_by(ChatTurn.seq)
+        .all()
+    )
+    lines = [line for line in session.summary.split("\n") if line]
+    lines += [_fold_line(role, content) for role, content in rows]
+    limit = current_app.config['CHAT_SUMMARY_CHARS']
+    while lines and sum(len(line) + 1 for line in lines) > limit:
+        lines.pop(0)
+    session.summary = "\n".join(lines)
+    session.summarized_through = fold_until
+
+
+def record_exchange(session: ChatSession, user_message: str, reply: str):
+    """Append a user/assistant pair and fold anything that left the recent window. Caller commits.
+
+    Concurrent posts to the same session collide on (session_id, seq) and raise IntegrityError at commit.
+    """
+    seq = session.turn_count
+    db.session.add_all([
+        ChatTurn(session_id=session.id, seq=seq, role=_CODES["user"], content=user_message),
+        ChatTurn(session_id=session.id, seq=seq + 1, role=_CODES["assistant"], content=reply),
+    ])
+    session.turn_count = seq + 2
+    session.updated_at = datetime.utcnow()
+    _fold(session)
@@ -0,0 +1,144 @@
+import hashlib
+import io
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+
+# Column headers that identify the label and value columns of a financial statement sheet
+METRIC_COL_NAMES = ['metric', 'item', 'description', 'particulars', 'details', 'name']
+AMOUNT_COL_NAMES = ['amount', 'value', 'ngn', 'total', 'cost']
+
+# Row labels looked up by the tax calculator and the PIT estimator
+REVENUE_KEYWORDS = ['total revenue', 'revenue', 'sales']
+EXPENSE_KEYWORDS = ['total expenses', 'expenses', 'operating expenses', 'costs']
+PROFIT_TAX_PAID_KEYWORDS = ['profit tax paid', 'cit paid', 'tax paid']
+OUTPUT_VAT_KEYWORDS = ['output vat', 'vat collected', 'vat on sales']
+INPUT_VAT_KEYWORDS = ['input vat', 'vat paid on inputs', 'vat on purchases']
+
+KNOWN_KEYWORDS = (
+    REVENUE_KEYWORDS + EXPENSE_KEYWORDS + PROFIT_TAX_PAID_KEYWORDS + OUTPUT_VAT_KEYWORDS + INPUT_VAT_KEYWORDS
+)
+
+# Longest first so the alternation prefers 'total revenue' over 'revenue' at the same position.
+# The zero-width lookahead lets finditer report a match at every offset, i.e. overlapping keywords.
+_ORDERED_KEYWORDS = sorted(set(KNOWN_KEYWORDS), key=len, reverse=True)
+_KEYWORD_RE = re.compile("(?=(" + "|".join(re.escape(k) for k in _ORDERED_KEYWORDS) + "))")
+# Shorter keywords that start a longer one are shadowed by the alternation; recover them here
+_PREFIXES = {k: [p for p in _ORDERED_KEYWORDS if p != k and k.startswith(p)] for k in _ORDERED_KEYWORDS}
+
+_CACHE_SIZE = 32
+_cache: "OrderedDict[str, FinancialSheet]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class FinancialSheet:
+    """A parsed metric/amount sheet with a keyword -> first matching row index."""
+
+    def __init__(self, df: "pd.DataFrame", metric_col, amount_col, digest: str):
+        import pandas as pd
+
+        self.df = df
+        self.metric_col = metric_col
+        self.amount_col = amount_col
+        self.digest = digest
+        self._metrics = df[metric_col].astype(str).str.strip().str.lower()
+        amounts = df[amount_col]
+        if not pd.api.types.is_numeric_dtype(amounts):
+            amounts = pd.to_numeric(amounts.astype(str).str.replace(',', '', regex=False).str.strip(), errors='coerce')
+        self._amounts = amounts.to_numpy(dtype=float, na_value=float('nan'))
+        self._index = self._build_index()
+
+    def _build_index(self) -> Dict[str, int]:
+        index: Dict[str, int] = {}
+        seen = set()
+        for pos, label in enumerate(self._metrics):
+            if label in seen:
+                continue
+            seen.add(label)
+            for match in _KEYWORD_RE.finditer(label):
+                keyword = match.group(1)
+                for k in (keyword, *_PREFIXES[keyword]):
+                    index.setdefault(k, pos)
+        return index
+
+    def _row_for(self, keyword: str) -> Optional[int]:
+        keyword = keyword.lower()
+        if keyword in _PREFIXES:
+            return self._index.get(keyword)
+        # Ad-hoc keyword outside the prebuilt index
+        hits = self._metrics.str.contains(keyword, regex=False).to_numpy().nonzero()[0]
+        return int(hits[0]) if len(hits) else None
+
+    def largest(self, n: int) -> List[Tuple[str, float]]:
+        """Up to `n` (label, amount) rows with the largest absolute amounts, biggest first. O(rows), not a full sort."""
+        numeric = np.flatnonzero(~np.isnan(self._amounts))
+        if n <= 0 or not len(numeric):
+            return []
+        magnitudes = np.abs(self._amounts[numeric])
+        if len(numeric) > n:
+            keep = np.argpartition(magnitudes, -n)[-n:]
+            numeric, magnitudes = numeric[keep], magnitudes[keep]
+        order = numeric[np.argsort(-magnitudes, kind='stable')]
+        labels = self.df[self.metric_col].iloc[order].astype(str).str.strip()
+        return list(zip(labels.tolist(), self._amounts[order].tolist()))
+
+    def numeric_stats(self) -> Tuple[int, int, float]:
+        """(rows, rows with a numeric amount, sum of those amounts)."""
+        mask = ~np.isnan(self._amounts)
+        return len(self._amounts), int(mask.sum()), float(self._amounts[mask].sum())
+
+    def value(self, keywords: List[str]) -> float:
+        """Amount on the first row matching the first keyword that has a numeric amount; 0.0 if none."""
+        for keyword in keywords:
+            pos = self._row_for(keyword)
+            if pos is not None and not np.isnan(self._amounts[pos]):
+                return float(self._amounts[pos])
+        return 0.0
+
+
+def read_table(content: bytes, filename: str) -> "pd.DataFrame":
+    import pandas as pd  # heavy; only needed once an upload arrives
+
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return pd.read_csv(io.BytesIO(content))
+    if name.endswith(('.xlsx', '.xls')):
+        return pd.read_excel(io.BytesIO(content))
+    raise ValueError("Unsupported file format. Please use a .csv or .xlsx file.")
+
+
+def parse_financials(content: bytes, filename: str) -> FinancialSheet:
+    """Parse an uploaded sheet held in memory. Results are memoised by SHA-256 of the bytes.
+
+    Raises ValueError for unsupported formats and KeyError when the metric/amount
+    columns cannot be identified. The returned sheet is shared; do not mutate its df.
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    with _cache_lock:
+        sheet = _cache.get(digest)
+        if sheet is not None:
+            _cache.move_to_end(digest)
+            return sheet
+
+    df = read_table(content, filename)
+    metric_col = next((col for col in df.columns if any(name in str(col).lower() for name in METRIC_COL_NAMES)), None)
+    amount_col = next((col for col in df.columns if any(name in str(col).lower() for name in AMOUNT_COL_NAMES)), None)
+    if not (metric_col and amount_col):
+        raise KeyError("Could not identify the Metric or Amount columns in the file.")
+    sheet = FinancialSheet(df, metric_col, amount_col, digest)
+
+    with _cache_lock:
+        _cache[digest] = sheet
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return sheet
+
+
+def parse_financials_source(source: Union[str, bytes], filename: Optional[str] = None) -> FinancialSheet:
+    """Accept either a filesystem path or the raw bytes of an upload."""
+    if isinstance(source, (bytes, bytearray)):
+        return parse_financials(bytes(source), filename or '')
+    with open(source, 'rb') as fh:
+        return parse_financials(fh.read(), filename or source)
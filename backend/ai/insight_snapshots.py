@@ -0,0 +1,206 @@
+"""Precomputed /ai/insights and /ai/analyze responses.
+
+The endpoints serve the latest InsightSnapshot for (business, kind, period)
+straight from the database, with `generated_at` and `stale`. A snapshot is
+stale once the business's data_version has moved on or it is older than
+INSIGHT_SNAPSHOT_MAX_AGE; serving a stale one queues a background refresh.
+
+Ledger writes note the business on the session (http_cache.bump_data_version);
+after the commit the refresher waits INSIGHT_REFRESH_DEBOUNCE seconds - a new
+write restarts the wait - then recomputes that business's stale snapshots on
+a small thread pool, taking an LLM slot like any request would. Businesses
+that have never opened the reports page have no snapshots and cost nothing.
+
+Only the first view of a (kind, period), or an explicit refresh, computes
+synchronously. Results built from a fallback (the LLM call failed) are
+returned but never stored, so an outage does not pin a degraded snapshot.
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from db_routing import RoutingSession
+from extensions import db
+from models import BusinessProfile, InsightSnapshot
+import metrics
+from .llm import watch_failures
+
+PERIODS = ("month", "quarter", "year")
+REFRESH_SLOT_WAIT_SECONDS = 60
+
+metrics.describe("insight_snapshot_requests_total", "counter", "Insight/analysis requests by snapshot outcome")
+metrics.describe("insight_refreshes_total", "counter", "Background snapshot refreshes by kind and outcome")
+
+_builders = {}
+
+
+def snapshot_builder(kind: str):
+    """Register fn(profile, period) -> dict as the computation behind snapshots of `kind`."""
+    def register(fn):
+        _builders[kind] = fn
+        return fn
+    return register
+
+
+def _find(business_id: int, kind: str, period: str):
+    return InsightSnapshot.query.filter_by(business_id=business_id, kind=kind, period=period).first()
+
+
+def is_fresh(snapshot: InsightSnapshot, data_version: int) -> bool:
+    max_age = timedelta(seconds=current_app.config['INSIGHT_SNAPSHOT_MAX_AGE'])
+    return snapshot.data_version == data_version and snapshot.generated_at > datetime.utcnow() - max_age
+
+
+def _response(snapshot_payload: dict, generated_at: datetime, stale: bool) -> dict:
+    return {**snapshot_payload, "generated_at": generated_at.isoformat() + "Z", "stale": stale}
+
+
+def _store(business_id: int, kind: str, period: str, data_version: int, payload: dict) -> datetime:
+    """Upsert the snapshot and commit. A concurrent insert of the same key simply wins."""
+    generated_at = datetime.utcnow()
+    snapshot = _find(business_id, kind, period)
+    if snapshot is None:
+        snapshot = InsightSnapshot(business_id=business_id, kind=kind, period=period)
+        db.session.add(snapshot)
+    snapshot.data_version = data_version
+    snapshot.payload = json.dumps(payload)
+    snapshot.generated_at = generated_at
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+    return generated_at
+
+
+def has_snapshot(business_id: int, kind: str, period: str) -> bool:
+    return db.session.query(
+        InsightSnapshot.query.filter_by(business_id=business_id, kind=kind, period=period).exists()
+    ).scalar()
+
+
+def serve(kind: str, profile: BusinessProfile, period: str, force: bool = False) -> dict:
+    """The snapshot payload for `profile`, computing and storing it first if there is none (or `force`)."""
+    snapshot = None if force else _find(profile.id, kind, period)
+    if snapshot is not None:
+        stale = not is_fresh(snapshot, profile.data_version)
+        if stale:
+            schedule_refresh(profile.id, delay=0)
+        metrics.inc("insight_snapshot_requests_total", kind=kind, outcome="stale" if stale else "fresh")
+        return _response(json.loads(snapshot.payload), snapshot.generated_at, stale)
+
+    metrics.inc("insight_snapshot_requests_total", kind=kind, outcome="forced" if force else "miss")
+    data_version = profile.data_version
+    with watch_failures() as watch:
+        payload = _builders[kind](profile, period)
+    if watch.failed:
+        return _response(payload, datetime.utcnow(), True)
+    return _response(payload, _store(profile.id, kind, period, data_version, payload), False)
+
+
+def refresh_business(business_id: int):
+    """Recompute every stale snapshot of one business. Runs inside an app context."""
+    from ratelimit import get_backend
+
+    profile = db.session.get(BusinessProfile, business_id)
+    if profile is None:
+        return
+    for snapshot in InsightSnapshot.query.filter_by(business_id=business_id).all():
+        if snapshot.kind not in _builders or is_fresh(snapshot, profile.data_version):
+            continue
+        kind, period, data_version = snapshot.kind, snapshot.period, profile.data_version
+        token = None
+        if current_app.config.get("RATE_LIMIT_ENABLED", True):
+            token = get_backend().acquire_slot(current_app.config.get("LLM_MAX_CONCURRENCY", 4), REFRESH_SLOT_WAIT_SECONDS)
+            if token is None:
+                metrics.inc("insight_refreshes_total", kind=kind, outcome="no_slot")
+                continue
+        try:
+            with watch_failures() as watch:
+                payload = _builders[kind](profile, period)
+        finally:
+            if token is not None:
+                get_backend().release_slot(token)
+        if watch.failed:
+            # Keep the previous snapshot; the next view schedules another attempt
+            metrics.inc("insight_refreshes_total", kind=kind, outcome="llm_failed")
+            continue
+        _store(business_id, kind, period, data_version, payload)
+        metrics.inc("insight_refreshes_total", kind=kind, outcome="ok")
+        print(f"[Insights] refreshed {kind}/{period} for business {business_id} at version {data_version}")
+
+
+class Refresher:
+    """Debounced per-business refresh jobs on a small thread pool (one per process)."""
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._timers = {}      # business_id -> pending debounce Timer
+        self._running = set()  # business ids with a refresh in flight
+        self._again = set()    # changed again while running; refresh once more afterwards
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config['INSIGHT_REFRESH_WORKERS'], thread_name_prefix="insights"
+        )
+
+    def schedule(self, business_id: int, delay: float):
+        with self._lock:
+            pending = self._timers.pop(business_id, None)
+            if pending is not None:
+                pending.cancel()
+            timer = threading.Timer(delay, self._submit, (business_id,))
+            timer.daemon = True
+            self._timers[business_id] = timer
+        timer.start()
+
+    def _submit(self, business_id: int):
+        with self._lock:
+            if self._timers.get(business_id) is threading.current_thread():
+                del self._timers[business_id]
+            if business_id in self._running:
+                self._again.add(business_id)
+                return
+            self._running.add(business_id)
+        self._executor.submit(self._run, business_id)
+
+    def _run(self, business_id: int):
+        try:
+            with self.app.app_context():
+                refresh_business(business_id)
+        except Exception as e:
+            metrics.inc("insight_refreshes_total", kind="any", outcome="error")
+            print(f"[Insights] refresh failed for business {business_id}: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(business_id)
+                again = business_id in self._again
+                self._again.discard(business_id)
+            if again:
+                self._submit(business_id)
+
+
+def schedule_refresh(business_id: int, delay: float = None):
+    refresher = current_app.extensions.get("insight_refresher")
+    if refresher is not None:
+        refresher.schedule(business_id, current_app.config['INSIGHT_REFRESH_DEBOUNCE'] if delay is None else delay)
+
+
+def _after_commit(session):
+    changed = session.info.pop("ledger_changed", None)
+    if changed and has_app_context():
+        for business_id in changed:
+            schedule_refresh(business_id)
+
+
+def _after_rollback(session):
+    session.info.pop("ledger_changed", None)
+
+
+def init_snapshots(app):
+    if app.config.get('INSIGHT_REFRESH_ENABLED', True):
+        app.extensions["insight_refresher"] = Refresher(app)
+    if not event.contains(RoutingSession, "after_commit", _after_commit):
+        event.listen(RoutingSession, "after_commit", _after_commit)
+        event.listen(RoutingSession, "after_rollback", _after_rollback)
@@ -0,0 +1,338 @@
+"""Shared entry point for structured LLM calls.
+
+Every AI module calls `structured(...)` instead of building its own Bedrock
+client. On top of the provider this adds:
+
+* a per-process circuit breaker - after LLM_BREAKER_FAILURES consecutive
+  errors (or calls slower than LLM_SLO_SECONDS) it opens and calls fail fast
+  with LLMUnavailable, so callers drop straight to their fallbacks. After
+  LLM_BREAKER_COOLDOWN seconds one probe call is let through (half-open);
+  success closes the breaker, failure re-opens it.
+* a hard deadline (LLM_TIMEOUT_SECONDS) on how long a worker waits.
+* optional hedging (LLM_HEDGE=1) - if the first request has not answered
+  after the observed p95 latency, a second identical request is sent and
+  whichever finishes first wins. Inside @ai_limited the hedge needs a free
+  LLM slot of its own, and calls still running when structured() returns
+  or gives up are handed to the request's slot lease, so in-flight Bedrock
+  calls stay within LLM_MAX_CONCURRENCY.
+
+LLM_PROVIDER=fake swaps Bedrock for a local provider that fabricates a valid
+response model, with LLM_FAKE_LATENCY_MS / LLM_FAKE_FAILURE_RATE to
+exercise the breaker and hedging offline.
+"""
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Literal, Union, get_args, get_origin
+import metrics
+
+MODEL_ID = "meta.llama3-70b-instruct-v1:0"
+AWS_REGION = os.environ.get("AWS_REGION", "us-east-1")
+
+metrics.describe("llm_calls_total", "counter", "LLM calls by caller and outcome")
+metrics.describe("llm_latency_seconds", "histogram", "Latency of successful LLM calls")
+metrics.describe("llm_hedges_total", "counter", "Hedged second requests sent")
+metrics.describe("llm_prompt_tokens", "histogram", "Estimated prompt tokens per LLM call")
+
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+# Llama 3 averages ~4 characters per token on English prose; digit-heavy
+# ledger text tokenises denser, so estimate conservatively.
+CHARS_PER_TOKEN = 3.0
+
+
+class LLMUnavailable(Exception):
+    """Raised instead of calling the provider while the breaker is open, or on deadline."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt size without loading a tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0, slo: float = 20.0, window: int = 50):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.slo = slo
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._latencies = deque(maxlen=window)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            # Cooldown over: let exactly one probe through
+            if self._probing:
+                return False
+            self._state = self.HALF_OPEN
+            self._probing = True
+            return True
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+            self._probing = False
+            if latency > self.slo:
+                self._fail_locked()
+                return
+            self._failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._probing = False
+            self._fail_locked()
+
+    def _fail_locked(self):
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def p95(self):
+        with self._lock:
+            if len(self._latencies) < 10:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+class BedrockProvider:
+    name = "bedrock"
+
+    def __init__(self, timeout: float):
+        self._timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _instructor(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3  # loaded on first use, not at worker boot
+                    from botocore.config import Config
+                    from instructor import from_bedrock, Mode
+                    # One attempt per call and a read timeout at the deadline; the breaker handles retries
+                    config = Config(read_timeout=self._timeout, connect_timeout=5, retries={"max_attempts": 1})
+                    bedrock = boto3.client("bedrock-runtime", region_name=AWS_REGION, config=config)
+                    self._client = from_bedrock(bedrock, mode=Mode.BEDROCK_JSON)
+        return self._client
+
+    def create(self, response_model, prompt: str, max_tokens: int, temperature: float):
+        return self._instructor().messages.create(
+            model=MODEL_ID,
+            messages=[{"role": "user", "content": prompt}],
+            response_model=response_model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+
+
+def _fake_value(annotation, name: str):
+    origin = get_origin(annotation)
+    if origin is Literal:
+        return get_args(annotation)[0]
+    if origin is Union:
+        return _fake_value(next(a for a in get_args(annotation) if a is not type(None)), name)
+    if origin in (list, tuple, set):
+        (item,) = get_args(annotation)[:1] or (str,)
+        return [_fake_value(item, name)]
+    if annotation is bool:
+        return False
+    if annotation in (int, float):
+        return annotation(0)
+    if hasattr(annotation, "model_fields"):
+        return fake_instance(annotation)
+    return f"[fake] {name.replace('_', ' ')}"
+
+
+def fake_instance(response_model):
+    """A valid instance of `response_model` with placeholder values for every required field."""
+    values = {
+        name: _fake_value(field.annotation, name)
+        for name, field in response_model.model_fields.items()
+        if field.is_required()
+    }
+    return response_model(**values)
+
+
+class FakeProvider:
+    """Offline provider for development and tests; no network, deterministic shape."""
+    name = "fake"
+
+    def create(self, response_model, prompt: str, max_tokens: int, temperature: float):
+        latency_ms = _env_float("LLM_FAKE_LATENCY_MS", 0)
+        if latency_ms:
+            time.sleep(random.uniform(0.5, 1.5) * latency_ms / 1000.0)
+        if random.random() < _env_float("LLM_FAKE_FAILURE_RATE", 0):
+            raise RuntimeError("fake provider failure")
+        return fake_instance(response_model)
+
+
+_state_lock = threading.Lock()
+_provider = None
+_breaker = None
+_executor = None
+
+
+def provider():
+    global _provider
+    if _provider is None:
+        with _state_lock:
+            if _provider is None:
+                kind = os.environ.get("LLM_PROVIDER", "bedrock")
+                _provider = FakeProvider() if kind == "fake" else BedrockProvider(_env_float("LLM_TIMEOUT_SECONDS", 25))
+    return _provider
+
+
+def breaker() -> CircuitBreaker:
+    global _breaker
+    if _breaker is None:
+        with _state_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    failure_threshold=int(_env_float("LLM_BREAKER_FAILURES", 3)),
+                    cooldown=_env_float("LLM_BREAKER_COOLDOWN", 30),
+                    slo=_env_float("LLM_SLO_SECONDS", 20),
+                )
+                metrics.gauge(
+                    "llm_breaker_open",
+                    lambda: 0 if _breaker.state == CircuitBreaker.CLOSED else 1,
+                    "1 while the LLM circuit breaker is open or half-open",
+                )
+    return _breaker
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _state_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=int(_env_float("LLM_THREADS", 16)), thread_name_prefix="llm")
+    return _executor
+
+
+_local = threading.local()
+
+
+class FailureWatch:
+    failed = 0
+
+
+@contextmanager
+def watch_failures():
+    """Count structured() calls in this thread that raised (callers may have swallowed them into fallbacks)."""
+    previous = getattr(_local, "watch", None)
+    _local.watch = watch = FailureWatch()
+    try:
+        yield watch
+    finally:
+        _local.watch = previous
+
+
+@contextmanager
+def holding_slots(lease):
+    """structured() calls in this thread charge hedges and abandoned calls to `lease` (see ratelimit.SlotLease)."""
+    previous = getattr(_local, "lease", None)
+    _local.lease = lease
+    try:
+        yield lease
+    finally:
+        _local.lease = previous
+
+
+def _note_failure():
+    watch = getattr(_local, "watch", None)
+    if watch is not None:
+        watch.failed += 1
+
+
+def reset():
+    """Forget provider/breaker state (tests, or after changing LLM_* settings)."""
+    global _provider, _breaker
+    with _state_lock:
+        _provider = None
+        _breaker = None
+
+
+def structured(response_model, prompt: str, *, max_tokens: int, temperature: float, caller: str):
+    """Return a `response_model` instance from the LLM. Raises on failure; callers keep their own fallbacks."""
+    cb = breaker()
+    if not cb.allow():
+        metrics.inc("llm_calls_total", caller=caller, outcome="short_circuit")
+        _note_failure()
+        raise LLMUnavailable("LLM circuit open; using fallback")
+
+    metrics.observe("llm_prompt_tokens", estimate_tokens(prompt), buckets=TOKEN_BUCKETS, caller=caller)
+    p = provider()
+    deadline = _env_float("LLM_TIMEOUT_SECONDS", 25)
+    hedge_after = cb.p95() if os.environ.get("LLM_HEDGE") == "1" and cb.state == CircuitBreaker.CLOSED else None
+    call = lambda: p.create(response_model, prompt, max_tokens, temperature)  # noqa: E731
+
+    lease = getattr(_local, "lease", None)
+    started = time.monotonic()
+    pending = {_pool().submit(call)}
+    hedged = False
+    error = None
+    try:
+        while pending:
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                raise LLMUnavailable(f"LLM call exceeded {deadline:.0f}s deadline")
+            timeout = remaining
+            if hedge_after is not None and not hedged:
+                timeout = min(remaining, max(0.0, hedge_after - (time.monotonic() - started)))
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    latency = time.monotonic() - started
+                    cb.record_success(latency)
+                    metrics.observe("llm_latency_seconds", latency, buckets=LATENCY_BUCKETS, provider=p.name)
+                    metrics.inc("llm_calls_total", caller=caller, outcome="hedged_ok" if hedged else "ok")
+                    return future.result()
+                error = future.exception()
+            if not done and hedge_after is not None and not hedged:
+                if lease is not None and not lease.try_extra():
+                    hedge_after = None  # no free slot: keep waiting on the first request alone
+                    continue
+                hedged = True
+                metrics.inc("llm_hedges_total", caller=caller)
+                pending.add(_pool().submit(call))
+        raise error
+    except Exception:
+        cb.record_failure()
+        metrics.inc("llm_calls_total", caller=caller, outcome="error")
+        _note_failure()
+        raise
+    finally:
+        # Calls still queued are dropped; running ones cannot be stopped and keep their slots until they end
+        running = [f for f in pending if not f.cancel()]
+        if running and lease is not None:
+            lease.outlive(running)
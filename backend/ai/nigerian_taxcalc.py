@@ -1,11 +1,15 @@
-import os
-import json
-import boto3
-import pandas as pd
 from pydantic import BaseModel, Field
 from typing import Literal
-import instructor
-from instructor import Mode
+from .llm import structured, LLMUnavailable
+from .prompt_budget import sheet_section
+from .financials import (
+    parse_financials_source,
+    REVENUE_KEYWORDS,
+    EXPENSE_KEYWORDS,
+    PROFIT_TAX_PAID_KEYWORDS,
+    OUTPUT_VAT_KEYWORDS,
+    INPUT_VAT_KEYWORDS,
+)
 
 # --- 1. Define the Structured Output Schema (Pydantic Model) ---
 # This defines the exact structure and fields the AI must return.
@@ -79,8 +83,6 @@ class TaxCalculationResult(BaseModel):
 
 
 # --- 2. System Instruction and LLM Configuration ---
-MODEL_ID = "meta.llama3-70b-instruct-v1:0"
-AWS_REGION = os.environ.get("AWS_REGION", "us-east-1")
 
 # --- UPDATED SYSTEM PROMPT ---
 SYSTEM_PROMPT = """
@@ -92,58 +94,26 @@ Rules:
 - Return JSON matching the schema exactly. Be concise and numeric.
 """
 
-_bedrock = None
-
-def _client():
-    global _bedrock
-    if _bedrock is None:
-        _bedrock = boto3.client('bedrock-runtime', region_name=AWS_REGION)
-    return _bedrock
-
-
-def load_financial_data(filepath: str):
+def load_financial_data(source, filename: str = None):
     """
-    Reads data from a CSV or XLSX file and attempts to extract key financial metrics.
-    Returns: (DataFrame, TotalRevenue, ProfitTaxPaid, OutputVAT, InputVAT)
+    Reads data from a CSV or XLSX file (path or in-memory bytes) and extracts key financial metrics.
+    Returns: (FinancialSheet, TotalRevenue, ProfitTaxPaid, OutputVAT, InputVAT)
     """
     try:
-        if filepath.lower().endswith('.csv'):
-            df = pd.read_csv(filepath)
-        elif filepath.lower().endswith('.xlsx') or filepath.lower().endswith('.xls'):
-            df = pd.read_excel(filepath)
-        else:
-            raise ValueError("Unsupported file format. Please use a .csv or .xlsx file.")
-        
-        # Enhanced extraction logic
-        metric_col_names = ['metric', 'item', 'description', 'particulars', 'details']
-        amount_col_names = ['amount', 'value', 'ngn', 'total', 'cost']
-        
-        metric_col = next((col for col in df.columns if any(name in str(col).lower() for name in metric_col_names)), None)
-        amount_col = next((col for col in df.columns if any(name in str(col).lower() for name in amount_col_names)), None)
-
-        if not (metric_col and amount_col):
-            raise KeyError("Could not identify the Metric or Amount columns in the file.")
-        
-        # Helper to find a value, defaulting to 0.0
-        def find_value(keywords: list[str]) -> float:
-            for keyword in keywords:
-                row = df[df[metric_col].astype(str).str.contains(keyword, case=False, na=False)]
-                if not row.empty:
-                    return float(row[amount_col].iloc[0])
-            return 0.0
+        sheet = parse_financials_source(source, filename)
 
         # Find Total Revenue (Mandatory)
-        total_revenue = find_value(['total revenue', 'revenue', 'sales'])
+        total_revenue = sheet.value(REVENUE_KEYWORDS)
         if total_revenue == 0.0:
             raise ValueError("Could not locate a row labeled 'Revenue' or 'Sales' in the data.")
 
         # Find other values (default to 0.0 if not found)
-        profit_tax_paid = find_value(['profit tax paid', 'cit paid', 'tax paid'])
-        output_vat = find_value(['output vat', 'vat collected', 'vat on sales'])
-        input_vat = find_value(['input vat', 'vat paid on inputs', 'vat on purchases'])
-        
-        return df, total_revenue, profit_tax_paid, output_vat, input_vat
-    
+        profit_tax_paid = sheet.value(PROFIT_TAX_PAID_KEYWORDS)
+        output_vat = sheet.value(OUTPUT_VAT_KEYWORDS)
+        input_vat = sheet.value(INPUT_VAT_KEYWORDS)
+
+        return sheet, total_revenue, profit_tax_paid, output_vat, input_vat
+
     except Exception:
         return None, None, 0.0, 0.0, 0.0
 
@@ -167,45 +137,47 @@ def get_fallback_response(recommendation: str, profit_tax_paid: float = 0.0) ->
     )
 
 
-def calculate_tax_and_assess(business_size: str, filepath: str) -> TaxCalculationResult:
+def calculate_tax_and_assess(business_size: str, source, filename: str = None) -> TaxCalculationResult:
     """
-    Loads financial data from file, sends it to the LLM for calculation, and returns the structured result.
+    Loads financial data (file path or uploaded bytes), sends it to the LLM for calculation, and returns the structured result.
     """
     # Load data from the CSV/XLSX file
-    financial_data, total_revenue, profit_tax_paid, output_vat, input_vat = load_financial_data(filepath)
+    sheet, total_revenue, profit_tax_paid, output_vat, input_vat = load_financial_data(source, filename)
 
-    if financial_data is None:
+    if sheet is None:
         # Return a structured error if data loading failed
         return get_fallback_response("Data loading failed. Check file path, existence, and column names.")
 
-    # Convert DataFrame to string for the LLM to process
-    financial_data_str = financial_data.to_string(index=False)
-
-    # 1. Initialize Bedrock Boto3 Client
-    try:
-        client = instructor.from_bedrock(_client(), mode=Mode.BEDROCK_JSON)
-    except Exception:
-        # Fallback for AWS initialization failure
-        return get_fallback_response(
-            f"AWS setup or connectivity failed. Check credentials and Bedrock access in region {AWS_REGION}."
-        )
+    # Summarise the sheet into a bounded DATA block; its size does not grow with the upload
+    financial_data_str, stats = sheet_section(sheet, {
+        "Total Revenue": total_revenue,
+        "Total Expenses": sheet.value(EXPENSE_KEYWORDS),
+        "Profit Tax Paid": profit_tax_paid,
+        "Output VAT": output_vat,
+        "Input VAT": input_vat,
+    })
+    print(f"[TaxCalc] prompt: {stats['rows']} rows -> {stats['items']} line items "
+          f"({stats['hidden']} summarised), ~{stats['est_tokens']} tokens")
 
     # Combine data and prompt
     user_query = f"""
-Please calculate the tax liabilities, audit compliance, and provide business advice for a Nigerian company of '{business_size}' size using the following financial statement data (NGN).\n\n--- DATA ---\n{financial_data_str}\n---\n\nKey Values:\nTotal Revenue: {total_revenue:,.2f}\nProfit Tax Paid: {profit_tax_paid:,.2f}\nOutput VAT: {output_vat:,.2f}\nInput VAT: {input_vat:,.2f}\n"""
+Please calculate the tax liabilities, audit compliance, and provide business advice for a Nigerian company of '{business_size}' size using the following financial statement summary (NGN). Line items not shown are only summarised; rely on the Key Values for totals.\n\n--- DATA ---\n{financial_data_str}\n---\n"""
 
     print(f"\n-> Calculating tax & generating advice for {business_size} company (Llama 3 70B)...")
     try:
-        # 3. Create the structured completion request
-        result_object = client.messages.create(
-            model=MODEL_ID,
-            messages=[{"role": "user", "content": f"{SYSTEM_PROMPT}\n\n{user_query}"}],
-            response_model=TaxCalculationResult,
+        return structured(
+            TaxCalculationResult,
+            f"{SYSTEM_PROMPT}\n\n{user_query}",
             max_tokens=1100,
-            temperature=0.1 
+            temperature=0.1,
+            caller="taxcalc",
+        )
+    except LLMUnavailable as e:
+        print(f"LLM unavailable: {e}")
+        return get_fallback_response(
+            f"AI service temporarily unavailable ({e}). Please retry in a minute.",
+            profit_tax_paid=profit_tax_paid
         )
-        return result_object
-
     except Exception as e:
         print(f"An API/Calculation error occurred: {e}")
         # Return a fallback object on API failure
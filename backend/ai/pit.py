@@ -1,7 +1,8 @@
-import os
+import numpy as np
+from money import to_kobo
 from pydantic import BaseModel, Field
-import pandas as pd
 from typing import List, Tuple, Optional
+from .financials import parse_financials_source, REVENUE_KEYWORDS, EXPENSE_KEYWORDS
 
 class PITBracketBreakdown(BaseModel):
     band: str
@@ -38,56 +39,54 @@ BANDS: List[Tuple[float, float, float, str]] = [
     (50_000_000.0, float("inf"), 0.25, "Above 50,000,000 @ 25%"),
 ]
 
-def _estimate_from_profit(profit: float) -> tuple[float, List[PITBracketBreakdown], float]:
-    if profit <= 0:
-        return 0.0, [], 0.0
-    total_tax = 0.0
-    breakdown: List[PITBracketBreakdown] = []
-    marginal_pct = 0.0
-    for lower, upper, rate, label in BANDS:
-        if profit <= lower:
-            break
-        amount_in_band = max(0.0, min(profit, upper) - lower)
-        if amount_in_band <= 0:
-            continue
-        tax = amount_in_band * rate
-        total_tax += tax
-        breakdown.append(PITBracketBreakdown(band=label, taxable_amount=amount_in_band, rate=rate * 100.0, tax=tax))
-        # If profit lies within this band, set marginal and stop accumulating further bands
-        if profit <= upper:
-            marginal_pct = rate * 100.0
-            break
-        else:
-            marginal_pct = rate * 100.0  # will be overwritten by the final band reached
-    return total_tax, breakdown, marginal_pct
+_BAND_LOWER_KOBO = np.array([int(b[0] * 100) for b in BANDS], dtype=np.int64)
+_BAND_WIDTH_KOBO = np.array([int(min(b[1] - b[0], 1e15) * 100) for b in BANDS], dtype=np.int64)
+_BAND_RATE_BP = np.array([round(b[2] * 10_000) for b in BANDS], dtype=np.int64)
+
+
+def _band_taxes_kobo(profits_kobo):
+    """(amount in each band, tax per band), both int64 kobo with a trailing band axis; half-up per band."""
+    profits = np.asarray(profits_kobo, dtype=np.int64)
+    in_band = np.clip(profits[..., None] - _BAND_LOWER_KOBO, 0, _BAND_WIDTH_KOBO)
+    return in_band, (in_band * _BAND_RATE_BP + 5_000) // 10_000
+
+
+def pit_kobo(profits_kobo) -> np.ndarray:
+    """Exact integer PIT in kobo for an array of annual profits in kobo (half-up per band)."""
+    return _band_taxes_kobo(profits_kobo)[1].sum(axis=-1)
+
+
+def pit_vectorized(profits) -> np.ndarray:
+    """PIT in naira for an array of naira profits (Monte Carlo paths); rounds to the kobo and uses pit_kobo."""
+    return pit_kobo(np.rint(np.asarray(profits, dtype=float) * 100).astype(np.int64)) / 100
+
+
+def estimate_pit_kobo(revenue_kobo: int, expenses_kobo: int) -> PITYearEstimate:
+    """PIT estimate from integer kobo totals; money fields are converted to naira only in the result."""
+    profit_kobo = int(revenue_kobo) - int(expenses_kobo)
+    in_band, taxes = _band_taxes_kobo(max(0, profit_kobo))
+    breakdown = [
+        PITBracketBreakdown(band=label, taxable_amount=int(amount) / 100, rate=rate * 100.0, tax=int(tax) / 100)
+        for (_, _, rate, label), amount, tax in zip(BANDS, in_band.tolist(), taxes.tolist())
+        if amount > 0
+    ]
+    total_kobo = int(taxes.sum())
+    marginal = breakdown[-1].rate if breakdown else 0.0
+    return PITYearEstimate(
+        annual_revenue=int(revenue_kobo) / 100,
+        annual_expenses=int(expenses_kobo) / 100,
+        annual_profit=profit_kobo / 100,
+        estimated_pit=total_kobo / 100,
+        breakdown=breakdown,
+        marginal_rate=marginal,
+        effective_rate=total_kobo / profit_kobo * 100.0 if profit_kobo > 0 else 0.0,
+    )
 
 
 def estimate_pit(annual_revenue: float, annual_expenses: float) -> PITYearEstimate:
+    """Naira wrapper over estimate_pit_kobo (statement uploads)."""
     try:
-        revenue = float(annual_revenue or 0.0)
-        expenses = float(annual_expenses or 0.0)
-        profit = revenue - expenses
-        if profit <= 0:
-            return PITYearEstimate(
-                annual_revenue=revenue,
-                annual_expenses=expenses,
-                annual_profit=profit,
-                estimated_pit=0.0,
-                breakdown=[],
-                marginal_rate=0.0,
-                effective_rate=0.0,
-            )
-        total_tax, breakdown, marginal_pct = _estimate_from_profit(profit)
-        effective_pct = (total_tax / profit * 100.0) if profit > 0 else 0.0
-        return PITYearEstimate(
-            annual_revenue=revenue,
-            annual_expenses=expenses,
-            annual_profit=profit,
-            estimated_pit=total_tax,
-            breakdown=breakdown,
-            marginal_rate=marginal_pct,
-            effective_rate=effective_pct,
-        )
+        return estimate_pit_kobo(to_kobo(annual_revenue or 0), to_kobo(annual_expenses or 0))
     except Exception:
         return PITYearEstimate(
             annual_revenue=annual_revenue or 0.0,
@@ -101,31 +100,16 @@ def estimate_pit(annual_revenue: float, annual_expenses: float) -> PITYearEstima
         )
 
 
-def pit_from_file(filepath: str) -> PITYearEstimate:
+def pit_from_file(source, filename: Optional[str] = None) -> PITYearEstimate:
+    """Estimate PIT from a statement sheet given as a file path or uploaded bytes."""
     try:
-        if filepath.lower().endswith('.csv'):
-            df = pd.read_csv(filepath)
-        elif filepath.lower().endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(filepath)
-        else:
-            return PITYearEstimate(annual_revenue=0, annual_expenses=0, annual_profit=0, estimated_pit=0, breakdown=[], marginal_rate=None, effective_rate=None, notes="Unsupported file format")
-        metric_col_names = ['metric', 'item', 'description', 'particulars', 'details', 'name']
-        amount_col_names = ['amount', 'value', 'ngn', 'total', 'cost']
-        metric_col = next((col for col in df.columns if any(name in str(col).lower() for name in metric_col_names)), None)
-        amount_col = next((col for col in df.columns if any(name in str(col).lower() for name in amount_col_names)), None)
-        if not (metric_col and amount_col):
-            return PITYearEstimate(annual_revenue=0, annual_expenses=0, annual_profit=0, estimated_pit=0, breakdown=[], marginal_rate=None, effective_rate=None, notes="Missing Metric/Amount columns")
-        def find_value(keys: List[str]) -> float:
-            for k in keys:
-                row = df[df[metric_col].astype(str).str.contains(k, case=False, na=False)]
-                if not row.empty:
-                    try:
-                        return float(row[amount_col].iloc[0])
-                    except Exception:
-                        pass
-            return 0.0
-        revenue = find_value(['total revenue', 'revenue', 'sales'])
-        expenses = find_value(['total expenses', 'expenses', 'operating expenses', 'costs'])
-        return estimate_pit(revenue, expenses)
+        sheet = parse_financials_source(source, filename)
+    except ValueError:
+        return PITYearEstimate(annual_revenue=0, annual_expenses=0, annual_profit=0, estimated_pit=0, breakdown=[], marginal_rate=None, effective_rate=None, notes="Unsupported file format")
+    except KeyError:
+        return PITYearEstimate(annual_revenue=0, annual_expenses=0, annual_profit=0, estimated_pit=0, breakdown=[], marginal_rate=None, effective_rate=None, notes="Missing Metric/Amount columns")
     except Exception:
         return PITYearEstimate(annual_revenue=0, annual_expenses=0, annual_profit=0, estimated_pit=0, breakdown=[], marginal_rate=None, effective_rate=None, notes="Failed to parse file")
+    revenue = sheet.value(REVENUE_KEYWORDS)
+    expenses = sheet.value(EXPENSE_KEYWORDS)
+    return estimate_pit(revenue, expenses)
@@ -0,0 +1,134 @@
+from datetime import date, datetime
+import numpy as np
+from money import kobo_sum, naira
+import process_pool
+from .pit import pit_kobo
+from .taxrules import (
+    VAT_REGISTRATION_THRESHOLD_KOBO,
+    cit_and_tet_kobo,
+    is_vat_threshold_nearing_kobo,
+    net_vat_kobo,
+)
+
+TRAILING_DAYS = 365
+RATIO_KEYS = {"margin_pct", "vat_threshold_share"}
+
+
+def evaluate(revenue, expenses, revenue_12m, expenses_12m) -> dict:
+    """Vectorised margins and tax exposure for aligned per-tenant arrays of kobo totals.
+
+    All-time totals give margins; trailing-12-month totals are treated as the
+    annual figures for PIT, CIT/TET and VAT registration proximity. A business
+    pays PIT (sole proprietor) or CIT/TET (company), never both, and there is
+    no legal-form field to choose by, so pit_12m and cit_12m are reported side
+    by side and tax_exposure_12m counts CIT + TET + VAT only. Money results
+    stay integer kobo.
+    """
+    revenue = np.asarray(revenue, dtype=np.int64)
+    expenses = np.asarray(expenses, dtype=np.int64)
+    revenue_12m = np.asarray(revenue_12m, dtype=np.int64)
+    expenses_12m = np.asarray(expenses_12m, dtype=np.int64)
+
+    profit = revenue - expenses
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margin = np.where(revenue > 0, profit / np.maximum(revenue, 1) * 100.0, 0.0)
+    profit_12m = revenue_12m - expenses_12m
+    pit = pit_kobo(profit_12m)
+    cit, tet = cit_and_tet_kobo(revenue_12m, profit_12m)
+    vat = net_vat_kobo(revenue_12m, expenses_12m)
+    return {
+        "profit": profit,
+        "margin_pct": margin,
+        "profit_12m": profit_12m,
+        "pit_12m": pit,
+        "cit_12m": cit,
+        "tet_12m": tet,
+        "net_vat_12m": vat,
+        "tax_exposure_12m": cit + tet + vat,  # PIT is an alternative to CIT, not an addition
+        "vat_threshold_share": revenue_12m / VAT_REGISTRATION_THRESHOLD_KOBO,
+        "vat_threshold_nearing": is_vat_threshold_nearing_kobo(revenue_12m),
+    }
+
+
+def _evaluate_chunk(args):
+    return evaluate(*args)
+
+
+def evaluate_sharded(columns, threshold: int, workers=None) -> dict:
+    """evaluate() in-process for small portfolios, across the worker's process pool above `threshold` tenants."""
+    n = len(columns[0])
+    if n <= threshold:
+        return evaluate(*columns)
+    shards = max(2, -(-n // threshold))
+    chunks = list(zip(*(np.array_split(np.asarray(col, dtype=np.int64), shards) for col in columns)))
+    parts = list(process_pool.get(workers).map(_evaluate_chunk, chunks))
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+def _totals_by_business(model, since: date):
+    """One GROUP BY business_id: all-time and trailing-window sums per tenant."""
+    from extensions import db
+
+    recent = db.case((model.date >= since, model.amount_kobo), else_=0)
+    rows = (
+        db.session.query(
+            model.business_id,
+            kobo_sum(model.amount_kobo),
+            kobo_sum(recent),
+        )
+        .filter(model.business_id.isnot(None))
+        .group_by(model.business_id)
+        .all()
+    )
+    return {bid: (int(total), int(trailing)) for bid, total, trailing in rows}
+
+
+def portfolio_report(threshold: int, workers=None, today: date = None) -> dict:
+    from extensions import db
+    from models import BusinessProfile, Sale, Expense
+
+    today = today or date.today()
+    since = date.fromordinal(today.toordinal() - TRAILING_DAYS)
+    profiles = db.session.query(BusinessProfile.id, BusinessProfile.name, BusinessProfile.industry).order_by(BusinessProfile.id).all()
+    sales = _totals_by_business(Sale, since)
+    expenses = _totals_by_business(Expense, since)
+
+    ids = [p.id for p in profiles]
+    columns = (
+        [sales.get(i, (0, 0))[0] for i in ids],
+        [expenses.get(i, (0, 0))[0] for i in ids],
+        [sales.get(i, (0, 0))[1] for i in ids],
+        [expenses.get(i, (0, 0))[1] for i in ids],
+    )
+    metrics = evaluate_sharded(columns, threshold, workers)
+
+    def out(key, val):
+        if val.dtype == bool:
+            return bool(val)
+        return naira(int(val)) if key not in RATIO_KEYS else float(val)
+
+    businesses = []
+    for k, p in enumerate(profiles):
+        businesses.append({
+            "business_id": p.id,
+            "name": p.name,
+            "industry": p.industry,
+            "revenue": naira(columns[0][k]),
+            "expenses": naira(columns[1][k]),
+            "revenue_12m": naira(columns[2][k]),
+            "expenses_12m": naira(columns[3][k]),
+            **{key: out(key, val[k]) for key, val in metrics.items()},
+        })
+
+    return {
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "tenants": len(businesses),
+        "totals": {
+            "revenue": naira(sum(columns[0])),
+            "expenses": naira(sum(columns[1])),
+            "tax_exposure_12m": naira(int(metrics["tax_exposure_12m"].sum())) if businesses else 0.0,
+            "pit_12m": naira(int(metrics["pit_12m"].sum())) if businesses else 0.0,
+            "vat_threshold_nearing": int(metrics["vat_threshold_nearing"].sum()) if businesses else 0,
+        },
+        "businesses": businesses,
+    }
@@ -0,0 +1,272 @@
+from datetime import date
+from typing import List, Optional
+import numpy as np
+from pydantic import BaseModel, Field
+from .pit import pit_vectorized
+from .taxrules import net_vat, cit_and_tet
+
+MIN_HORIZON = 12
+MAX_HORIZON = 36
+DEFAULT_PATHS = 500
+HISTORY_MONTHS = 36
+# Seasonal dummies need two full cycles to be identifiable; below that only the trend is fitted
+SEASONAL_MIN_MONTHS = 24
+TREND_MIN_MONTHS = 3
+
+
+class ProjectionPeriod(BaseModel):
+    period: str = Field(..., description="Calendar month, YYYY-MM.")
+    sales_p10: float
+    sales_p50: float
+    sales_p90: float
+    expenses_p50: float
+    profit_p10: float
+    profit_p50: float
+    profit_p90: float
+    vat_due_p50: float = Field(..., description="Provisional net VAT for the month (median path).")
+    pit_provisional_p50: float = Field(..., description="The projected year's PIT spread evenly over its months (median path).")
+    cit_provisional_p50: float = Field(..., description="The projected year's CIT + TET spread evenly over its months (median path).")
+
+
+class ProjectionYear(BaseModel):
+    year: int = Field(..., description="1-based projected year (months 1-12, 13-24, ...).")
+    months: int = Field(12, description="Months of the horizon in this year; fewer than 12 for the last year of e.g. 18.")
+    partial: bool = Field(False, description="True when months < 12: money figures cover only those months.")
+    revenue_p50: float
+    expenses_p50: float
+    profit_p10: float
+    profit_p50: float
+    profit_p90: float
+    pit_p50: float
+    cit_p50: float
+    tet_p50: float
+    vat_p50: float
+
+
+class ProjectionReport(BaseModel):
+    months_of_history: int
+    method: str = Field(..., description="'trend+seasonal', 'trend' or 'mean' depending on history length.")
+    monthly_sales_trend: float = Field(..., description="Fitted change in monthly sales per month (NGN).")
+    monthly_expense_trend: float
+    residual_sd_sales: float
+    periods: List[ProjectionPeriod]
+    years: List[ProjectionYear]
+    notes: str = Field(default=(
+        "Least-squares trend/seasonality fit with Monte Carlo residual bands (p10-p90); "
+        "tax figures are provisional estimates, not assessments."
+    ))
+
+
+def _month_ordinals(dates: np.ndarray) -> np.ndarray:
+    return np.asarray(dates, dtype="datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def _monthly_totals(dates, amounts, start: int, n: int) -> np.ndarray:
+    """Per-month sums; integer (kobo) inputs are accumulated exactly in int64."""
+    amounts = np.asarray(amounts)
+    out = np.zeros(n, dtype=np.int64 if amounts.dtype.kind in "iu" else float)
+    if len(dates) == 0:
+        return out
+    idx = _month_ordinals(dates) - start
+    keep = (idx >= 0) & (idx < n)
+    np.add.at(out, idx[keep], amounts[keep])
+    return out
+
+
+def _to_naira(totals: np.ndarray) -> np.ndarray:
+    return totals / 100.0 if totals.dtype.kind in "iu" else totals
+
+
+def _design(t: np.ndarray, month_of_year: np.ndarray, seasonal: bool) -> np.ndarray:
+    cols = [np.ones_like(t, dtype=float), t.astype(float)]
+    if seasonal:
+        # January is the baseline; one dummy per remaining month
+        cols.extend((month_of_year == m).astype(float) for m in range(1, 12))
+    return np.column_stack(cols)
+
+
+def _fit(y: np.ndarray, start: int):
+    """Return (coefficients, residual sd, method) for a monthly series starting at month ordinal `start`."""
+    n = len(y)
+    t = np.arange(n)
+    if n < TREND_MIN_MONTHS:
+        mean = float(y.mean()) if n else 0.0
+        sd = float(y.std()) if n > 1 else abs(mean) * 0.25
+        return np.array([mean, 0.0]), sd, "mean"
+    seasonal = n >= SEASONAL_MIN_MONTHS
+    X = _design(t, (start + t) % 12, seasonal)
+    coef, *_ = np.linalg.lstsq(X, y, rcond=None)
+    resid = y - X @ coef
+    dof = max(1, n - X.shape[1])
+    sd = float(np.sqrt(resid @ resid / dof))
+    return coef, sd, "trend+seasonal" if seasonal else "trend"
+
+
+def _simulate(coef, sd, start: int, n_hist: int, horizon: int, paths: int, rng) -> np.ndarray:
+    t = np.arange(n_hist, n_hist + horizon)
+    X = _design(t, (start + t) % 12, len(coef) > 2)
+    base = np.broadcast_to(X @ coef, (paths, horizon))
+    if sd > 0:
+        base = base + rng.normal(0.0, sd, size=(paths, horizon))
+    return np.maximum(0.0, base)  # always (paths, horizon), even for a flat or empty series
+
+
+def project_series(sale_dates, sale_amounts, expense_dates, expense_amounts,
+                   horizon: int = 12, paths: int = DEFAULT_PATHS, today: Optional[date] = None,
+                   seed: Optional[int] = 0) -> Optional[ProjectionReport]:
+    """Fit monthly sales/expense series and simulate `horizon` months forward.
+
+    Inputs are parallel arrays of dates and amounts (daily rows or raw entries);
+    integer amounts are taken as kobo. Returns None when there is no dated activity.
+    """
+    horizon = int(min(MAX_HORIZON, max(MIN_HORIZON, horizon)))
+    all_dates = np.concatenate([np.asarray(sale_dates, dtype="datetime64[D]"),
+                                np.asarray(expense_dates, dtype="datetime64[D]")])
+    if len(all_dates) == 0:
+        return None
+    months = _month_ordinals(all_dates)
+    start, end = int(months.min()), int(months.max())
+    current = int(np.datetime64(today or date.today(), "M").astype(np.int64))
+    if end >= current and start < current:
+        end = current - 1  # the running month is incomplete and would drag the trend down
+    # With nothing before the running month (e.g. only future-dated rows) the dated months are all there is
+    n = end - start + 1
+
+    sales = _to_naira(_monthly_totals(sale_dates, sale_amounts, start, n))
+    expenses = _to_naira(_monthly_totals(expense_dates, expense_amounts, start, n))
+    sales_coef, sales_sd, method = _fit(sales, start)
+    exp_coef, exp_sd, _ = _fit(expenses, start)
+
+    rng = np.random.default_rng(seed)
+    sim_sales = _simulate(sales_coef, sales_sd, start, n, horizon, paths, rng)
+    sim_exp = _simulate(exp_coef, exp_sd, start, n, horizon, paths, rng)
+    sim_profit = sim_sales - sim_exp
+    sim_vat = net_vat(sim_sales, sim_exp)
+
+    # Annual liabilities per path, then spread evenly as monthly provisional amounts. A partial last year
+    # (horizon not a multiple of 12) is annualised before the progressive bands and pro-rated back.
+    years = -(-horizon // 12)
+    pad = years * 12 - horizon
+    year_months = np.minimum(12, horizon - 12 * np.arange(years))
+    scale = 12.0 / year_months
+    def yearly(a):
+        return np.pad(a, ((0, 0), (0, pad))).reshape(paths, years, 12).sum(axis=2)
+    y_sales, y_exp, y_profit, y_vat = yearly(sim_sales), yearly(sim_exp), yearly(sim_profit), yearly(sim_vat)
+    y_pit = pit_vectorized(y_profit * scale) / scale
+    y_cit, y_tet = cit_and_tet(y_sales * scale, y_profit * scale)
+    y_cit, y_tet = y_cit / scale, y_tet / scale
+
+    q = lambda a: np.percentile(a, [10, 50, 90], axis=0)
+    s10, s50, s90 = q(sim_sales)
+    p10, p50, p90 = q(sim_profit)
+    e50 = np.median(sim_exp, axis=0)
+    v50 = np.median(sim_vat, axis=0)
+    pit50 = np.median(y_pit, axis=0)
+    cit50 = np.median(y_cit + y_tet, axis=0)
+
+    first = end + 1
+    periods = [
+        ProjectionPeriod(
+            period=f"{(first + i) // 12 + 1970:04d}-{(first + i) % 12 + 1:02d}",
+            sales_p10=float(s10[i]), sales_p50=float(s50[i]), sales_p90=float(s90[i]),
+            expenses_p50=float(e50[i]),
+            profit_p10=float(p10[i]), profit_p50=float(p50[i]), profit_p90=float(p90[i]),
+            vat_due_p50=float(v50[i]),
+            pit_provisional_p50=float(pit50[i // 12] / year_months[i // 12]),
+            cit_provisional_p50=float(cit50[i // 12] / year_months[i // 12]),
+        )
+        for i in range(horizon)
+    ]
+    yp10, yp50, yp90 = q(y_profit)
+    year_rows = [
+        ProjectionYear(
+            year=k + 1,
+            months=int(year_months[k]),
+            partial=bool(year_months[k] < 12),
+            revenue_p50=float(np.median(y_sales[:, k])),
+            expenses_p50=float(np.median(y_exp[:, k])),
+            profit_p10=float(yp10[k]), profit_p50=float(yp50[k]), profit_p90=float(yp90[k]),
+            pit_p50=float(pit50[k]),
+            cit_p50=float(np.median(y_cit[:, k])),
+            tet_p50=float(np.median(y_tet[:, k])),
+            vat_p50=float(np.median(y_vat[:, k])),
+        )
+        for k in range(years)
+    ]
+    return ProjectionReport(
+        months_of_history=n,
+        method=method,
+        monthly_sales_trend=float(sales_coef[1]),
+        monthly_expense_trend=float(exp_coef[1]),
+        residual_sd_sales=sales_sd,
+        periods=periods,
+        years=year_rows,
+    )
+
+
+def daily_totals(dates: np.ndarray, amounts: np.ndarray, since: date):
+    """Per-day kobo sums of dated rows on or after `since`, from ledger cache columns (dates ascending)."""
+    keep = ~np.isnat(dates) & (dates >= np.datetime64(since, "D"))
+    dates, amounts = dates[keep], amounts[keep]
+    if not len(dates):
+        return np.array([], dtype="datetime64[D]"), np.array([], dtype=np.int64)
+    order = np.argsort(dates, kind="stable")
+    dates, amounts = dates[order], amounts[order]
+    starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+    return dates[starts], np.add.reduceat(amounts, starts).astype(np.int64)
+
+
+def load_daily_series(business_id: int, months_back: int = HISTORY_MONTHS):
+    """Daily sale/expense totals (int64 kobo) for the last `months_back` months as NumPy arrays."""
+    from extensions import db
+    from models import Sale, Expense
+    from money import kobo_sum
+
+    import ledger_cache
+
+    today = date.today()
+    month = today.year * 12 + today.month - 1 - months_back
+    since = date(month // 12, month % 12 + 1, 1)
+
+    ledger = ledger_cache.load(business_id)
+    if ledger is not None:
+        return (daily_totals(ledger.sales.date, ledger.sales.amount_kobo, since),
+                daily_totals(ledger.expenses.date, ledger.expenses.amount_kobo, since))
+
+    def daily(model):
+        rows = (
+            db.session.query(model.date, kobo_sum(model.amount_kobo))
+            .filter(model.business_id == business_id, model.date.isnot(None), model.date >= since)
+            .group_by(model.date)
+            .all()
+        )
+        if not rows:
+            return np.array([], dtype="datetime64[D]"), np.array([], dtype=np.int64)
+        dates, amounts = zip(*rows)
+        return np.array(dates, dtype="datetime64[D]"), np.array(amounts, dtype=np.int64)
+
+    return daily(Sale), daily(Expense)
+
+
+def project_business(business_id: int, horizon: int = 12, paths: int = DEFAULT_PATHS) -> Optional[ProjectionReport]:
+    (sale_dates, sale_amounts), (exp_dates, exp_amounts) = load_daily_series(business_id)
+    return project_series(sale_dates, sale_amounts, exp_dates, exp_amounts, horizon=horizon, paths=paths)
+
+
+def projection_summary(report: Optional[ProjectionReport]) -> dict:
+    """Compact figures for the analysis prompt."""
+    if report is None or report.months_of_history < TREND_MIN_MONTHS:
+        return {}
+    y1 = report.years[0]
+    return {
+        "months_of_history": report.months_of_history,
+        "method": report.method,
+        "monthly_sales_trend": report.monthly_sales_trend,
+        "next_12m_revenue_p50": y1.revenue_p50,
+        "next_12m_profit_p10": y1.profit_p10,
+        "next_12m_profit_p50": y1.profit_p50,
+        "next_12m_profit_p90": y1.profit_p90,
+        "next_12m_pit_p50": y1.pit_p50,
+        "next_12m_cit_p50": y1.cit_p50 + y1.tet_p50,
+        "next_12m_vat_p50": y1.vat_p50,
+    }
@@ -0,0 +1,66 @@
+"""Bounded prompt sections for uploaded financial sheets.
+
+The tax calculator used to paste `DataFrame.to_string()` of the whole upload
+into the prompt, so prompt size - and Bedrock latency and cost - grew with the
+file. `sheet_section` instead sends the extracted key values plus the
+TAX_PROMPT_TOP_N largest line items, trimmed to TAX_PROMPT_TOKEN_BUDGET
+estimated tokens. Everything else is reduced to a row count and a total.
+"""
+import os
+import metrics
+from .financials import FinancialSheet
+from .llm import estimate_tokens
+
+LABEL_MAX_CHARS = 60
+
+metrics.describe("tax_prompt_rows_dropped_total", "counter", "Sheet rows summarised instead of sent verbatim")
+
+
+def _setting(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _label(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= LABEL_MAX_CHARS else text[:LABEL_MAX_CHARS - 1] + "…"
+
+
+def sheet_section(sheet: FinancialSheet, key_values: dict, top_n: int = None, token_budget: int = None):
+    """Render the DATA block for `sheet`. Returns (text, stats dict).
+
+    Key values are always included; line items are added largest-first until
+    either `top_n` or `token_budget` is reached.
+    """
+    top_n = _setting("TAX_PROMPT_TOP_N", 25) if top_n is None else top_n
+    token_budget = _setting("TAX_PROMPT_TOKEN_BUDGET", 1200) if token_budget is None else token_budget
+
+    rows, numeric_rows, total = sheet.numeric_stats()
+    header = [f"Sheet: {rows:,} rows, {numeric_rows:,} with amounts, amounts sum to {total:,.2f}"]
+    footer = ["", "Key Values:", *(f"{name}: {amount:,.2f}" for name, amount in key_values.items())]
+    used = estimate_tokens("\n".join(header + footer))
+
+    items = []
+    shown_total = 0.0
+    for label, amount in sheet.largest(top_n):
+        line = f"- {_label(label)}: {amount:,.2f}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            break
+        items.append(line)
+        shown_total += amount
+        used += cost
+
+    lines = list(header)
+    if items:
+        lines.append(f"Largest line items ({len(items):,} of {numeric_rows:,}, by absolute amount):")
+        lines.extend(items)
+    hidden = numeric_rows - len(items)
+    if hidden:
+        lines.append(f"- ({hidden:,} smaller line items totalling {total - shown_total:,.2f} not shown)")
+    text = "\n".join(lines + footer)
+
+    stats = {"rows": rows, "items": len(items), "hidden": hidden, "est_tokens": estimate_tokens(text)}
+    if hidden:
+        metrics.inc("tax_prompt_rows_dropped_total", hidden)
+    return text, stats
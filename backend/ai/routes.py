@@ -1,36 +1,64 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
+from db_routing import read_only
+from http_cache import ledger_etag
+from ratelimit import ai_limited
+from auth.decorators import admin_required
 from extensions import db
+import ledger_cache
 from models import Sale, Expense, BusinessProfile
+from money import kobo_sum, naira
 from .advise import get_nigerian_advice
 from .analyst import get_business_analysis
-from .chat import get_business_chat_reply
+from .chat import get_business_chat_reply, is_cached, shares_answer, FALLBACK_REPLY
+from .insight_snapshots import PERIODS, has_snapshot, serve, snapshot_builder
+from .chat_sessions import get_session, new_session, recent_turns, record_exchange
 from .nigerian_taxcalc import calculate_tax_and_assess
-from .pit import estimate_pit, pit_from_file
-import os
-import tempfile
+from .pit import estimate_pit_kobo
+from .taxrules import input_vat_kobo, is_cit_exempt_kobo, is_vat_threshold_nearing_kobo, net_vat_kobo, output_vat_kobo
+from .portfolio import portfolio_report
+from .projection import project_business, projection_summary, MIN_HORIZON, MAX_HORIZON
 
 ai = Blueprint("ai", __name__)
 
-@ai.route('/insights', methods=['POST'])
-@login_required
-def insights():
-    data = request.get_json() or {}
-    period = data.get("period", "month")
 
-    # Build a concise business context
-    profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
-    if not profile:
-        return jsonify({"error": "No business profile"}), 400
+def _ledger_totals_kobo(business_id: int):
+    """(total sales, total expenses) as integer kobo (from the ledger cache when enabled)."""
+    cached = ledger_cache.totals(business_id)
+    if cached is not None:
+        return cached
+    total_sales = db.session.query(kobo_sum(Sale.amount_kobo)).filter_by(business_id=business_id).scalar()
+    total_expenses = db.session.query(kobo_sum(Expense.amount_kobo)).filter_by(business_id=business_id).scalar()
+    return int(total_sales), int(total_expenses)
 
-    sales = Sale.query.filter_by(business_id=profile.id).order_by(Sale.date.desc()).all()
-    expenses = Expense.query.filter_by(business_id=profile.id).order_by(Expense.date.desc()).all()
+def _ledger_totals(business_id: int):
+    """(total sales, total expenses) in naira, for prompts."""
+    total_sales, total_expenses = _ledger_totals_kobo(business_id)
+    return naira(total_sales), naira(total_expenses)
 
-    total_sales = float(sum(s.amount or 0 for s in sales))
-    total_expenses = float(sum(e.amount or 0 for e in expenses))
+def _period_or_none(data: dict):
+    period = data.get("period", "month")
+    return period if period in PERIODS else None
+
+def _snapshot_cached(kind: str):
+    """skip_slot hook: a stored snapshot is served without an LLM call."""
+    def check() -> bool:
+        data = request.get_json(silent=True) or {}
+        period = _period_or_none(data)
+        if data.get("refresh") or period is None:
+            return False
+        profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
+        return profile is not None and has_snapshot(profile.id, kind, period)
+    return check
+
+@snapshot_builder("insights")
+def _build_insights(profile, period: str) -> dict:
+    sales = Sale.query.filter_by(business_id=profile.id).order_by(Sale.date.desc()).limit(10).all()
+    total_sales, total_expenses = _ledger_totals(profile.id)
 
     # Create a user_query for the advisor
-    recent_sales_str = ", ".join([f"{s.name}:{float(s.amount or 0):,.0f}" for s in sales[:10]])
+    recent_sales_str = ", ".join([f"{s.name}:{float(s.amount or 0):,.0f}" for s in sales])
     user_query = (
         f"Business: {profile.name}\n"
         f"Industry: {profile.industry or 'N/A'}\n"
@@ -56,24 +84,27 @@ def insights():
             {"title": f"Step {i+1}", "detail": step} for i, step in enumerate(steps)
         ],
     }
-    return jsonify(strategic), 200
+    return strategic
 
-@ai.route('/analyze', methods=['POST'])
+@ai.route('/insights', methods=['POST'])
 @login_required
-def analyze():
+@ai_limited('insights', per_minute=6, burst=3, skip_slot=_snapshot_cached('insights'))
+def insights():
     data = request.get_json() or {}
-    period = data.get("period", "month")
+    period = _period_or_none(data)
+    if period is None:
+        return jsonify({"error": f"period must be one of {', '.join(PERIODS)}"}), 400
 
     profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
     if not profile:
         return jsonify({"error": "No business profile"}), 400
 
-    sales = Sale.query.filter_by(business_id=profile.id).all()
-    expenses = Expense.query.filter_by(business_id=profile.id).all()
+    return jsonify(serve("insights", profile, period, force=bool(data.get("refresh")))), 200
 
+@snapshot_builder("analyze")
+def _build_analysis(profile, period: str) -> dict:
     # Aggregate simple metrics for KPIs
-    total_revenue = float(sum(s.amount or 0 for s in sales))
-    total_costs = float(sum(e.amount or 0 for e in expenses))
+    total_revenue, total_costs = _ledger_totals(profile.id)
     net_profit = total_revenue - total_costs
 
     # Prepare payload for analyst (uses floats)
@@ -83,6 +114,7 @@ def analyze():
         "total_costs": total_costs,
         "bank_balance": 0.0,  # Not tracked; default to 0
         "net_profit": net_profit,
+        "projection": projection_summary(project_business(profile.id)),
     }
 
     report = get_business_analysis(user_data)
@@ -121,33 +153,42 @@ def analyze():
         "loan": report.loan_eligibility_assessment,
         "actions": actions,
     }
-    return jsonify(analysis), 200
+    return analysis
+
+@ai.route('/analyze', methods=['POST'])
+@login_required
+@ai_limited('analyze', per_minute=4, burst=2, skip_slot=_snapshot_cached('analyze'))
+def analyze():
+    data = request.get_json() or {}
+    period = _period_or_none(data)
+    if period is None:
+        return jsonify({"error": f"period must be one of {', '.join(PERIODS)}"}), 400
+
+    profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
+    if not profile:
+        return jsonify({"error": "No business profile"}), 400
+
+    return jsonify(serve("analyze", profile, period, force=bool(data.get("refresh")))), 200
 
 @ai.route('/tax', methods=['GET'])
 @login_required
+@read_only
+@ledger_etag()
 def tax():
     profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
     if not profile:
         return jsonify({"error": "No business profile"}), 400
 
-    total_sales = float(db.session.query(db.func.coalesce(db.func.sum(Sale.amount), 0)).filter_by(business_id=profile.id).scalar() or 0)
-    total_expenses = float(db.session.query(db.func.coalesce(db.func.sum(Expense.amount), 0)).filter_by(business_id=profile.id).scalar() or 0)
-
-    # Approximate VAT figures for demo
-    vat_collected = total_sales * 0.075
-    vat_paid = total_expenses * 0.05
-    net_vat = max(0.0, vat_collected - vat_paid)
+    total_sales, total_expenses = _ledger_totals_kobo(profile.id)
 
+    # Approximate VAT figures for demo, in exact kobo; naira only in the response
     annualized_revenue = total_sales  # if your data is all-time, this is a rough demo
-    vat_threshold_nearing = annualized_revenue >= (25_000_000 * 0.6) and annualized_revenue < 25_000_000
-    cit_exempt = annualized_revenue <= 100_000_000
-
     summary = {
-        "vat_threshold_nearing": bool(vat_threshold_nearing),
-        "vat_collected": float(vat_collected),
-        "vat_paid": float(vat_paid),
-        "net_vat": float(net_vat),
-        "cit_exempt": bool(cit_exempt),
+        "vat_threshold_nearing": bool(is_vat_threshold_nearing_kobo(annualized_revenue)),
+        "vat_collected": naira(int(output_vat_kobo(total_sales))),
+        "vat_paid": naira(int(input_vat_kobo(total_expenses))),
+        "net_vat": naira(int(net_vat_kobo(total_sales, total_expenses))),
+        "cit_exempt": bool(is_cit_exempt_kobo(annualized_revenue)),
         "cac_due_days": 30,
     }
     return jsonify(summary), 200
@@ -155,6 +196,7 @@ def tax():
 
 @ai.route('/tax/upload', methods=['POST'])
 @login_required
+@ai_limited('tax_upload', per_minute=6, burst=3)
 def tax_upload():
     """Accept a CSV/XLSX file and compute tax using nigerian_taxcalc."""
     if 'file' not in request.files:
@@ -165,53 +207,141 @@ def tax_upload():
         return jsonify({"error": "business_size must be MEDIUM or LARGE"}), 400
 
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename or 'data')[1]) as tmp:
-            file.save(tmp.name)
-            tmp_path = tmp.name
-        result = calculate_tax_and_assess(business_size, tmp_path)
-        # Ensure cleanup
-        try:
-            os.unlink(tmp_path)
-        except Exception:
-            pass
+        # Parsed straight from the in-memory upload; nothing is written to disk
+        result = calculate_tax_and_assess(business_size, file.read(), filename=file.filename)
         return jsonify(result.model_dump()), 200
     except Exception as e:
         return jsonify({"error": f"Tax analysis failed: {e}"}), 500
 
+def _chat_context(profile) -> str:
+    """Lightweight business context from recent sales/expenses."""
+    sales = Sale.query.filter_by(business_id=profile.id).order_by(Sale.date.desc()).limit(10).all()
+    expenses = Expense.query.filter_by(business_id=profile.id).order_by(Expense.date.desc()).limit(10).all()
+    total_sales = naira(sum(s.amount_kobo or 0 for s in sales))
+    total_expenses = naira(sum(e.amount_kobo or 0 for e in expenses))
+    return (
+        f"Business: {profile.name}\nIndustry: {profile.industry or 'N/A'}\n"
+        f"Recent Sales: {', '.join([f'{s.name}:{float(s.amount or 0):,.0f}' for s in sales])}\n"
+        f"Recent Expenses: {', '.join([f'{e.description}:{float(e.amount or 0):,.0f}' for e in expenses])}\n"
+        f"Totals -> Sales: {total_sales:,.0f}, Expenses: {total_expenses:,.0f}"
+    )
+
+def _chat_input(data):
+    """(stripped message, history list) from a /chat body. Raises ValueError with the reason on wrong types."""
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    message = data.get("message")
+    if message is not None and not isinstance(message, str):
+        raise ValueError("message must be a string")
+    history = data.get("history")
+    if history is not None and not (isinstance(history, list) and all(isinstance(t, dict) for t in history)):
+        raise ValueError("history must be a list of {role, content} objects")
+    return (message or "").strip(), history or []
+
+def _chat_answer_cached() -> bool:
+    """Cache hits skip the LLM concurrency slot; they never reach the model."""
+    try:
+        message, _ = _chat_input(request.get_json(silent=True) or {})
+    except ValueError:
+        return False  # the handler answers 400
+    return bool(message) and is_cached(message)
+
 @ai.route('/chat', methods=['POST'])
 @login_required
+@ai_limited('chat', per_minute=20, burst=5, skip_slot=_chat_answer_cached)
 def chat():
     data = request.get_json() or {}
-    history = data.get("history", [])  # [{role, content}]
-    user_message = data.get("message", "")
+    try:
+        user_message, history = _chat_input(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not user_message:
+        return jsonify({"error": "Message is required"}), 400
+    max_chars = current_app.config['CHAT_MESSAGE_MAX_CHARS']
+    if len(user_message) > max_chars:
+        return jsonify({"error": f"Message is too long (max {max_chars} characters)"}), 400
 
     profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
     if not profile:
         return jsonify({"error": "No business profile"}), 400
 
-    # Build lightweight context from recent sales/expenses
-    sales = Sale.query.filter_by(business_id=profile.id).order_by(Sale.date.desc()).limit(10).all()
-    expenses = Expense.query.filter_by(business_id=profile.id).order_by(Expense.date.desc()).limit(10).all()
-    total_sales = float(sum(s.amount or 0 for s in sales))
-    total_expenses = float(sum(e.amount or 0 for e in expenses))
-    context = (
-        f"Business: {profile.name}\nIndustry: {profile.industry or 'N/A'}\n"
-        f"Recent Sales: {', '.join([f'{s.name}:{float(s.amount or 0):,.0f}' for s in sales])}\n"
-        f"Recent Expenses: {', '.join([f'{e.description}:{float(e.amount or 0):,.0f}' for e in expenses])}\n"
-        f"Totals -> Sales: {total_sales:,.0f}, Expenses: {total_expenses:,.0f}"
-    )
+    # General questions are answered from the shared cache without ledger context
+    context = "" if shares_answer(user_message) else _chat_context(profile)
+
+    if "history" in data and "session_id" not in data:
+        # Legacy stateless clients resend the whole history; only the recent tail goes to the model
+        history = history[-current_app.config['CHAT_RECENT_TURNS']:]
+        result = get_business_chat_reply(history, user_message, context)
+        return jsonify({"reply": result.reply}), 200
 
-    result = get_business_chat_reply(history, user_message, context)
-    return jsonify({"reply": result.reply}), 200
+    session_id = data.get("session_id")
+    convo = get_session(profile.id, session_id) if session_id else new_session(profile.id)
+    if convo is None:
+        return jsonify({"error": "Chat session not found"}), 404
+
+    result = get_business_chat_reply(recent_turns(convo), user_message, context, summary=convo.summary)
+    if result.reply == FALLBACK_REPLY:
+        # Nothing worth remembering; the client can resend the same message
+        db.session.rollback()
+        return jsonify({"reply": result.reply, "session_id": session_id}), 200
+
+    record_exchange(convo, user_message, result.reply)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Conversation was updated from another tab; please resend"}), 409
+    return jsonify({"reply": result.reply, "session_id": convo.id}), 200
 
 @ai.route('/pit', methods=['GET'])
 @login_required
+@read_only
+@ledger_etag()
 def pit_quick():
     profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
     if not profile:
         return jsonify({"error": "No business profile"}), 400
     # Use sums as annualized approximation until a date filter exists
-    total_sales = float(db.session.query(db.func.coalesce(db.func.sum(Sale.amount), 0)).filter_by(business_id=profile.id).scalar() or 0)
-    total_expenses = float(db.session.query(db.func.coalesce(db.func.sum(Expense.amount), 0)).filter_by(business_id=profile.id).scalar() or 0)
-    est = estimate_pit(total_sales, total_expenses)
+    est = estimate_pit_kobo(*_ledger_totals_kobo(profile.id))
     return jsonify(est.model_dump()), 200
+
+
+@ai.route('/projection', methods=['GET'])
+@login_required
+@read_only
+def projection():
+    """Monthly sales/profit projection with Monte Carlo bands and provisional PIT/CIT/VAT."""
+    profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
+    if not profile:
+        return jsonify({"error": "No business profile"}), 400
+    months = request.args.get('months', default=12, type=int)
+    if months < MIN_HORIZON or months > MAX_HORIZON:
+        return jsonify({"error": f"months must be between {MIN_HORIZON} and {MAX_HORIZON}"}), 400
+    report = project_business(profile.id, horizon=months)
+    if report is None:
+        return jsonify({"error": "No dated sales or expenses to project from"}), 404
+    return jsonify(report.model_dump()), 200
+
+
+PORTFOLIO_SORT_KEYS = {"tax_exposure_12m", "margin_pct", "vat_threshold_share", "revenue", "revenue_12m", "profit"}
+
+
+@ai.route('/portfolio', methods=['GET'])
+@login_required
+@admin_required
+@read_only
+def portfolio():
+    """Admin-only: margins, tax exposure and VAT threshold proximity for every business."""
+    sort = request.args.get('sort', 'tax_exposure_12m')
+    if sort not in PORTFOLIO_SORT_KEYS:
+        return jsonify({"error": f"sort must be one of {', '.join(sorted(PORTFOLIO_SORT_KEYS))}"}), 400
+    limit = request.args.get('limit', type=int)
+
+    report = portfolio_report(
+        threshold=current_app.config.get('PORTFOLIO_POOL_THRESHOLD', 50000),
+        workers=current_app.config.get('PORTFOLIO_POOL_WORKERS'),
+    )
+    report["businesses"].sort(key=lambda b: b[sort], reverse=True)
+    if limit:
+        report["businesses"] = report["businesses"][:limit]
+    return jsonify(report), 200
@@ -0,0 +1,208 @@
+"""In-process semantic cache for general (business-independent) chat questions.
+
+Questions are normalised, then embedded as hashed TF-IDF vectors: word
+unigrams, word bigrams and character trigrams hashed into DIM buckets, with
+IDF learned from the questions cached so far. A lookup is an exact match on the
+normalised text, then a cosine nearest-neighbour scan over the cached vectors
+(one matrix-vector product). Matches at or above CHAT_CACHE_THRESHOLD are hits.
+
+Only questions that pass `is_general` are cached. Their answers are generated
+without the asker's ledger context or history, so a cached reply can never
+leak one business's figures to another user.
+
+Entries expire after CHAT_CACHE_TTL seconds; beyond CHAT_CACHE_SIZE entries
+the least recently used one is evicted. The cache is per worker process.
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+import numpy as np
+import metrics
+
+DIM = 2048
+
+metrics.describe("chat_cache_lookups_total", "counter", "Chat cache lookups by outcome (hit, miss, bypass)")
+metrics.describe("chat_cache_evictions_total", "counter", "Chat cache entries dropped, by reason (lru, ttl, replaced, clear)")
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CONTRACTIONS = (("what's", "what is"), ("who's", "who is"), ("how's", "how is"), ("when's", "when is"),
+                 ("can't", "cannot"), ("don't", "do not"), ("doesn't", "does not"), ("isn't", "is not"))
+_STOPWORDS = frozenset(
+    "a an the is are was be do does did to of in on for and or with as at by from can could should would "
+    "will please tell explain what how when who which there about any".split()
+)
+# Words that tie a question to the asker's own figures or to the earlier conversation.
+# "How do I register with FIRS?" stays general; "my", "owe", "it" do not.
+_PERSONAL = frozenset(
+    "my mine myself our ours ourselves it its this that these those they them their he she his her "
+    "above previous earlier same owe owed made earned spent".split()
+)
+
+
+def normalise(question: str) -> str:
+    text = unicodedata.normalize("NFKC", question).lower().replace("’", "'")
+    for short, full in _CONTRACTIONS:
+        text = text.replace(short, full)
+    return " ".join(_WORD_RE.findall(text.replace("'", "")))
+
+
+def is_general(question: str) -> bool:
+    """True for self-contained questions that do not refer to the asker's business or figures."""
+    words = normalise(question).split()
+    if len(words) < 2 or len(words) > 40:
+        return False
+    return not any(w in _PERSONAL or any(c.isdigit() for c in w) for w in words)
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _features(text: str):
+    words = [_stem(w) for w in text.split() if w not in _STOPWORDS] or text.split()
+    feats = [f"w:{w}" for w in words]
+    feats += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"#{w}#"
+        feats += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return feats
+
+
+def embed_counts(text: str) -> np.ndarray:
+    """Sublinear term frequencies over hashed features (crc32, so stable across processes)."""
+    vec = np.zeros(DIM, dtype=np.float32)
+    for feat in _features(text):
+        vec[zlib.crc32(feat.encode()) % DIM] += 1.0
+    return np.log1p(vec, out=vec)
+
+
+class SemanticCache:
+    def __init__(self, capacity: int = 1000, ttl: float = 86400.0, threshold: float = 0.9):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._tf = np.zeros((capacity, DIM), dtype=np.float32)  # one row per slot
+        self._df = np.zeros(DIM, dtype=np.float32)              # document frequency per bucket
+        self._used = np.zeros(capacity, dtype=bool)
+        self._entries = OrderedDict()  # slot -> (normalised question, answer, expires); LRU order
+        self._by_text = {}             # normalised question -> slot
+        self._free = list(range(capacity - 1, -1, -1))
+        self._idf_sq = None            # cached per cache generation; reset on every insert/drop
+        self._norms = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _idf(self) -> np.ndarray:
+        n = len(self._entries)
+        return np.log((1.0 + n) / (1.0 + self._df)) + 1.0
+
+    def _drop(self, slot: int, reason: str):
+        text, _, _ = self._entries.pop(slot)
+        del self._by_text[text]
+        self._df -= self._tf[slot] > 0
+        self._tf[slot] = 0.0
+        self._used[slot] = False
+        self._free.append(slot)
+        self._idf_sq = self._norms = None
+        metrics.inc("chat_cache_evictions_total", reason=reason)
+
+    def _nearest(self, counts: np.ndarray):
+        """(slot, cosine similarity) of the closest live entry, or (None, 0.0)."""
+        if not self._entries:
+            return None, 0.0
+        if self._idf_sq is None:
+            self._idf_sq = np.square(self._idf())
+            self._norms = np.sqrt(np.square(self._tf) @ self._idf_sq)
+        # (tf_i * idf) . (q * idf) == tf_i . (q * idf^2): one mat-vec, no weighted copy of the matrix
+        q_norm = float(np.sqrt(np.square(counts) @ self._idf_sq))
+        if q_norm == 0.0:
+            return None, 0.0
+        scores = self._tf @ (counts * self._idf_sq)
+        norms = self._norms * q_norm
+        scores = np.divide(scores, norms, out=np.zeros_like(scores), where=self._used & (norms > 0))
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def get(self, question: str, now: float = None):
+        """Cached answer for a question equal or similar to `question`, or None."""
+        now = time.time() if now is None else now
+        text = normalise(question)
+        with self._lock:
+            slot = self._by_text.get(text)
+            if slot is None:
+                slot, score = self._nearest(embed_counts(text))
+                if slot is None or score < self.threshold:
+                    return None
+            _, answer, expires = self._entries[slot]
+            if expires <= now:
+                self._drop(slot, "ttl")
+                return None
+            self._entries.move_to_end(slot)
+            return answer
+
+    def put(self, question: str, answer: str, now: float = None):
+        now = time.time() if now is None else now
+        text = normalise(question)
+        counts = embed_counts(text)
+        with self._lock:
+            if text in self._by_text:
+                self._drop(self._by_text[text], "replaced")
+            while self._entries:
+                oldest = next(iter(self._entries))
+                if self._entries[oldest][2] > now and self._free:
+                    break
+                self._drop(oldest, "ttl" if self._entries[oldest][2] <= now else "lru")
+            slot = self._free.pop()
+            self._tf[slot] = counts
+            self._df += counts > 0
+            self._used[slot] = True
+            self._idf_sq = self._norms = None
+            self._entries[slot] = (text, answer, now + self.ttl)
+            self._by_text[text] = slot
+
+    def clear(self):
+        with self._lock:
+            for slot in list(self._entries):
+                self._drop(slot, "clear")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _env(name: str, default: str) -> str:
+    return os.environ.get(name) or default
+
+
+def chat_cache():
+    """The process-wide chat cache, or None when CHAT_CACHE_ENABLED=0."""
+    global _cache
+    if _env("CHAT_CACHE_ENABLED", "1") in ("0", "false", "False"):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache(
+                    capacity=int(_env("CHAT_CACHE_SIZE", "1000")),
+                    ttl=float(_env("CHAT_CACHE_TTL", "86400")),
+                    threshold=float(_env("CHAT_CACHE_THRESHOLD", "0.9")),
+                )
+                metrics.gauge("chat_cache_entries", lambda: len(_cache), "Entries in the chat semantic cache")
+                metrics.gauge("chat_cache_hit_ratio", _hit_ratio, "Chat cache hits / cacheable lookups since start")
+    return _cache
+
+
+def _hit_ratio() -> float:
+    hits = metrics.counter_value("chat_cache_lookups_total", outcome="hit")
+    misses = metrics.counter_value("chat_cache_lookups_total", outcome="miss")
+    return hits / (hits + misses) if hits + misses else 0.0
@@ -0,0 +1,90 @@
+import numpy as np
+
+# Rates and thresholds shared by the /ai/tax summary, projections and portfolio reports
+VAT_RATE = 0.075
+# Demo approximation of claimable input VAT as a share of total expenses (not every cost is VATable)
+INPUT_VAT_RATE = 0.05
+VAT_REGISTRATION_THRESHOLD = 25_000_000.0
+VAT_NEARING_SHARE = 0.6
+
+# CIT by annual turnover: small <= 25m exempt, medium <= 100m at 20%, large at 30%. TET 3% where CIT applies.
+CIT_SMALL_LIMIT = 25_000_000.0
+CIT_MEDIUM_LIMIT = 100_000_000.0
+CIT_MEDIUM_RATE = 0.20
+CIT_LARGE_RATE = 0.30
+TET_RATE = 0.03
+
+# Integer versions for exact kobo arithmetic, derived from the figures above: rates in basis points, limits in kobo
+BP = 10_000
+
+
+def _bp(rate: float) -> int:
+    return round(rate * BP)
+
+
+def _kobo(naira: float) -> int:
+    return round(naira * 100)
+
+
+VAT_RATE_BP = _bp(VAT_RATE)
+INPUT_VAT_RATE_BP = _bp(INPUT_VAT_RATE)
+CIT_MEDIUM_RATE_BP = _bp(CIT_MEDIUM_RATE)
+CIT_LARGE_RATE_BP = _bp(CIT_LARGE_RATE)
+TET_RATE_BP = _bp(TET_RATE)
+VAT_REGISTRATION_THRESHOLD_KOBO = _kobo(VAT_REGISTRATION_THRESHOLD)
+VAT_NEARING_KOBO = -(-VAT_REGISTRATION_THRESHOLD_KOBO * _bp(VAT_NEARING_SHARE) // BP)  # rounded up
+CIT_SMALL_LIMIT_KOBO = _kobo(CIT_SMALL_LIMIT)
+CIT_MEDIUM_LIMIT_KOBO = _kobo(CIT_MEDIUM_LIMIT)
+
+
+def apply_bp(amount_kobo, rate_bp):
+    """amount * rate rounded half-up to the kobo, in int64 (amounts up to ~NGN 3.6e13 at 25%)."""
+    return (np.asarray(amount_kobo, dtype=np.int64) * rate_bp + BP // 2) // BP
+
+
+def is_vat_threshold_nearing_kobo(annual_revenue_kobo):
+    """True when turnover is within 60% of the VAT registration threshold but not past it. Works on arrays."""
+    revenue = np.asarray(annual_revenue_kobo, dtype=np.int64)
+    return (revenue >= VAT_NEARING_KOBO) & (revenue < VAT_REGISTRATION_THRESHOLD_KOBO)
+
+
+def is_cit_exempt_kobo(annual_turnover_kobo):
+    """Demo rule used by /ai/tax: no CIT up to the medium-company limit."""
+    return np.asarray(annual_turnover_kobo, dtype=np.int64) <= CIT_MEDIUM_LIMIT_KOBO
+
+
+def output_vat_kobo(sales_kobo):
+    return apply_bp(sales_kobo, VAT_RATE_BP)
+
+
+def input_vat_kobo(expenses_kobo):
+    return apply_bp(expenses_kobo, INPUT_VAT_RATE_BP)
+
+
+def net_vat_kobo(sales_kobo, expenses_kobo):
+    return np.maximum(0, output_vat_kobo(sales_kobo) - input_vat_kobo(expenses_kobo))
+
+
+def cit_and_tet_kobo(annual_turnover_kobo, annual_profit_kobo):
+    """(CIT, TET) in kobo for arrays of turnover/profit; losses attract no tax."""
+    turnover = np.asarray(annual_turnover_kobo, dtype=np.int64)
+    taxable = np.maximum(0, np.asarray(annual_profit_kobo, dtype=np.int64))
+    rate_bp = np.where(turnover <= CIT_SMALL_LIMIT_KOBO, 0,
+                       np.where(turnover <= CIT_MEDIUM_LIMIT_KOBO, CIT_MEDIUM_RATE_BP, CIT_LARGE_RATE_BP))
+    cit = (taxable * rate_bp + BP // 2) // BP
+    tet = np.where(rate_bp > 0, apply_bp(taxable, TET_RATE_BP), 0)
+    return cit, tet
+
+
+# Naira wrappers for float inputs (Monte Carlo paths in ai/projection.py): round to the kobo and apply the rules above
+def to_kobo_array(naira_values) -> np.ndarray:
+    return np.rint(np.asarray(naira_values, dtype=float) * 100).astype(np.int64)
+
+
+def net_vat(sales, expenses):
+    return net_vat_kobo(to_kobo_array(sales), to_kobo_array(expenses)) / 100
+
+
+def cit_and_tet(annual_turnover, annual_profit):
+    cit, tet = cit_and_tet_kobo(to_kobo_array(annual_turnover), to_kobo_array(annual_profit))
+    return cit / 100, tet / 100
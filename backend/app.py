@@ -2,16 +2,19 @@ from flask import Flask
 from flask_cors import CORS
 from config import Config
 from extensions import db, bcrypt, login_manager
-from sqlalchemy import inspect, text
+from db_routing import init_replica
+from compression import init_compression
+from json_provider import FastJSONProvider
+from metrics import metrics_bp
+from pooling import engine_options, register_pool_gauges
+from migrations.cli import register_db_commands
 from dotenv import load_dotenv
-
-from flask import Flask
-from flask_cors import CORS
 import os
 
 
 def create_app():
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
 
     # Load env and apply Config (DB URI, cookies, etc.)
     load_dotenv()
@@ -60,74 +63,43 @@ def create_app():
                 resp.headers.add('Set-Cookie', c)
         return resp
 
-    # Ensure DB is reachable; only fallback to SQLite for local dev
-    try:
-        from sqlalchemy import create_engine
-        test_engine = create_engine(app.config.get("SQLALCHEMY_DATABASE_URI"))
-        with test_engine.connect() as _:
-            pass
-    except Exception:
-        if not os.getenv('RENDER'):  # local dev fallback only
-            app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
-        else:
-            raise
+    # No connectivity probe at boot: the pool connects lazily on first query.
+    # Only fall back to SQLite when no database is configured (local dev).
+    if not app.config.get("SQLALCHEMY_DATABASE_URI"):
+        if os.getenv('RENDER'):
+            raise RuntimeError("DATABASE_URL must be set in production")
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"]))
 
-    # Initialize extensions
+    # Initialize extensions (replica bind must be registered before the engines are created)
+    init_replica(app)
     db.init_app(app)
     bcrypt.init_app(app)
     login_manager.init_app(app)
+    with app.app_context():
+        register_pool_gauges(db.engines)
 
     # Import and register the Blueprints
     from auth.routes import auth as auth_blueprint
     from business.routes import business as business_blueprint
     from ai.routes import ai as ai_blueprint
+    from ai.insight_snapshots import init_snapshots
     app.register_blueprint(auth_blueprint, url_prefix="/auth")
     app.register_blueprint(business_blueprint, url_prefix="/business")
     app.register_blueprint(ai_blueprint, url_prefix="/ai")
+    app.register_blueprint(metrics_bp)
 
-    def ensure_schema():
-        """Best-effort schema guard for existing DBs without migrations.
-        Adds missing columns used by the app and removes deprecated ones.
-        """
-        inspector = inspect(db.engine)
-        with db.engine.begin() as conn:
-            # Expense: quantity, unit_price
-            try:
-                expense_cols = {c['name'] for c in inspector.get_columns('expense')}
-                if 'quantity' not in expense_cols:
-                    conn.execute(text('ALTER TABLE expense ADD COLUMN quantity INTEGER DEFAULT 1'))
-                if 'unit_price' not in expense_cols:
-                    conn.execute(text('ALTER TABLE expense ADD COLUMN unit_price DOUBLE PRECISION'))
-            except Exception:
-                pass
-            # Sale: quantity, unit_price
-            try:
-                sale_cols = {c['name'] for c in inspector.get_columns('sale')}
-                if 'quantity' not in sale_cols:
-                    conn.execute(text('ALTER TABLE sale ADD COLUMN quantity INTEGER DEFAULT 1'))
-                if 'unit_price' not in sale_cols:
-                    conn.execute(text('ALTER TABLE sale ADD COLUMN unit_price DOUBLE PRECISION'))
-                # Drop legacy column sale_type if present
-                if 'sale_type' in sale_cols:
-                    try:
-                        conn.execute(text('ALTER TABLE sale DROP COLUMN sale_type'))
-                    except Exception:
-                        # Fallback: relax NOT NULL and set default if drop not supported (e.g. older SQLite)
-                        try:
-                            conn.execute(text("ALTER TABLE sale ALTER COLUMN sale_type DROP NOT NULL"))
-                            conn.execute(text("ALTER TABLE sale ALTER COLUMN sale_type SET DEFAULT 'fixed'"))
-                        except Exception:
-                            pass
-            except Exception:
-                pass
-
-    with app.app_context():
-        db.create_all()
-        ensure_schema()
+    init_compression(app)
+    init_snapshots(app)
+    register_db_commands(app)
 
     return app
 
 
 if __name__ == "__main__":
     app = create_app()
+    # Local dev convenience; deployments run `flask --app app:create_app db upgrade` instead
+    from migrations import upgrade
+    with app.app_context():
+        upgrade(db.engine)
     app.run(debug=True)
@@ -0,0 +1,14 @@
+from functools import wraps
+from flask import current_app, jsonify
+from flask_login import current_user
+
+
+def admin_required(view):
+    """Allow only users whose email is listed in ADMIN_EMAILS. Use after @login_required."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        admins = current_app.config.get('ADMIN_EMAILS') or set()
+        if not current_user.is_authenticated or (current_user.email or '').lower() not in admins:
+            return jsonify({"error": "Forbidden"}), 403
+        return view(*args, **kwargs)
+    return wrapped
@@ -0,0 +1,15 @@
+from flask import current_app
+from extensions import bcrypt
+
+
+def hash_password(password: str) -> str:
+    return bcrypt.generate_password_hash(password).decode('utf-8')
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True when `hashed` was made with a bcrypt cost other than BCRYPT_LOG_ROUNDS."""
+    try:
+        cost = int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        return False
+    return cost != current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
+from sqlalchemy.exc import IntegrityError
 from extensions import db, bcrypt
 from models import User, BusinessProfile
+from .passwords import hash_password, needs_rehash
+from .session_user import store_snapshot, clear_snapshot
 
 auth = Blueprint("auth", __name__)
 
@@ -18,23 +21,22 @@ def register():
     if not email or not password or not business_name:
         return jsonify({"error": "All fields are required"}), 400
 
-    if User.query.filter_by(email=email).first():
-        return jsonify({"error": "Email already exists"}), 409
-    
-    if User.query.filter_by(username=business_name).first():
-        return jsonify({"error": "Business name already taken"}), 409
-
-    hashed_pw = bcrypt.generate_password_hash(password).decode('utf-8')
+    hashed_pw = hash_password(password)
     new_user = User(username=business_name, email=email, password=hashed_pw)
-    
-    db.session.add(new_user)
-    db.session.commit()
+    new_user.business_profile = BusinessProfile(name=business_name, industry=industry)
 
-    new_business = BusinessProfile(user_id=new_user.id, name=business_name, industry=industry)
-    db.session.add(new_business)
-    db.session.commit()
+    # One transaction; the unique constraints on user.email/user.username catch duplicates
+    db.session.add(new_user)
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if 'email' in str(e.orig).lower():
+            return jsonify({"error": "Email already exists"}), 409
+        return jsonify({"error": "Business name already taken"}), 409
 
     login_user(new_user)
+    store_snapshot(new_user)
 
     return jsonify({"message": "User registered successfully"}), 201
 
@@ -49,7 +51,11 @@ def login():
 
     user = User.query.filter_by(email=email).first()
     if user and bcrypt.check_password_hash(user.password, password):
+        if needs_rehash(user.password):
+            user.password = hash_password(password)
+            db.session.commit()
         login_user(user, remember=data.get('rememberMe'))
+        store_snapshot(user)
         return jsonify({"message": "Login successful", "user": {"id": user.id, "email": user.email, "username": user.username}}), 200
     return jsonify({"error": "Invalid credentials"}), 401
 
@@ -57,6 +63,7 @@ def login():
 @login_required
 def logout():
     logout_user()
+    clear_snapshot()
     return jsonify({"message": "Logged out successfully"}), 200
 
 @auth.route('/status', methods=['GET'])
@@ -0,0 +1,45 @@
+"""Short-lived user snapshot carried in the (signed) Flask session cookie.
+
+`load_user` returns a SessionUser built from the snapshot while it is fresh,
+so most authenticated requests skip the User query. After USER_SNAPSHOT_TTL
+seconds the user is re-read from the database and the snapshot refreshed,
+which bounds how long a deleted or renamed account can linger.
+"""
+import time
+from flask import current_app, session
+from flask_login import UserMixin
+
+SNAPSHOT_KEY = "_user_snapshot"
+
+
+class SessionUser(UserMixin):
+    """Read-only stand-in for models.User with the fields handlers use."""
+
+    def __init__(self, id, email, username):
+        self.id = id
+        self.email = email
+        self.username = username
+
+
+def store_snapshot(user):
+    ttl = current_app.config.get("USER_SNAPSHOT_TTL", 300)
+    if ttl <= 0:
+        session.pop(SNAPSHOT_KEY, None)
+        return
+    session[SNAPSHOT_KEY] = {
+        "id": user.id,
+        "email": user.email,
+        "username": user.username,
+        "exp": int(time.time() + ttl),
+    }
+
+
+def snapshot_user(user_id):
+    snap = session.get(SNAPSHOT_KEY)
+    if not snap or str(snap.get("id")) != str(user_id) or snap.get("exp", 0) < time.time():
+        return None
+    return SessionUser(snap["id"], snap.get("email"), snap.get("username"))
+
+
+def clear_snapshot():
+    session.pop(SNAPSHOT_KEY, None)
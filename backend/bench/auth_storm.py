@@ -0,0 +1,96 @@
+"""Login storm and per-request auth cost.
+
+1. --threads clients log in concurrently, first at the old bcrypt cost (12), then
+   at BCRYPT_LOG_ROUNDS=--rounds. The first pass at the new cost rehashes every
+   user, so the second pass shows the steady state.
+2. Authenticated GET /auth/status with the session snapshot off (TTL 0) and on:
+   SQL statements per request and throughput.
+
+Run from backend/: `python -m bench.auth_storm [--users 16 --threads 8 --rounds 10]`
+"""
+import argparse
+import threading
+from sqlalchemy import event
+from bench.common import make_app, report, timed
+
+PASSWORD = "bench-password"
+
+
+def _set_rounds(app, rounds):
+    from extensions import bcrypt
+    app.config["BCRYPT_LOG_ROUNDS"] = rounds
+    bcrypt.init_app(app)  # Flask-Bcrypt copies the cost at init time
+
+
+def _storm(app, emails, threads):
+    failures = []
+
+    def run(chunk):
+        client = app.test_client()
+        for email in chunk:
+            if client.post("/auth/login", json={"email": email, "password": PASSWORD}).status_code != 200:
+                failures.append(email)
+
+    chunks = [emails[i::threads] for i in range(threads)]
+    workers = [threading.Thread(target=run, args=(c,)) for c in chunks if c]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return len(failures)
+
+
+def _status_cost(app, engine, ttl, requests):
+    app.config["USER_SNAPSHOT_TTL"] = ttl
+    client = app.test_client()
+    client.post("/auth/login", json={"email": "storm0@example.com", "password": PASSWORD})
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        elapsed, _ = timed(lambda: [client.get("/auth/status") for _ in range(requests)])
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return statements[0] / requests, requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    app = make_app()
+    from extensions import db
+    with app.app_context():
+        engine = db.engine
+
+    _set_rounds(app, 12)
+    emails = [f"storm{i}@example.com" for i in range(args.users)]
+    client = app.test_client()
+    for i, email in enumerate(emails):
+        client.post("/auth/register", json={"email": email, "password": PASSWORD, "businessName": f"Storm {i}"})
+
+    rows = []
+    elapsed, failed = timed(_storm, app, emails, args.threads)
+    rows.append(("logins at cost 12", f"{len(emails) / elapsed:,.1f} logins/s ({failed} failed)"))
+    _set_rounds(app, args.rounds)
+    elapsed, failed = timed(_storm, app, emails, args.threads)
+    rows.append((f"first pass at cost {args.rounds} (rehash)", f"{len(emails) / elapsed:,.1f} logins/s ({failed} failed)"))
+    elapsed, failed = timed(_storm, app, emails, args.threads)
+    rows.append((f"steady state at cost {args.rounds}", f"{len(emails) / elapsed:,.1f} logins/s ({failed} failed)"))
+
+    for label, ttl in (("snapshot off", 0), ("snapshot on", 300)):
+        per_request, rate = _status_cost(app, engine, ttl, args.requests)
+        rows.append((f"/auth/status, {label}", f"{per_request:.2f} queries/request, {rate:,.0f} req/s"))
+
+    report(f"Auth ({args.users} users, {args.threads} threads)", rows)
+
+
+if __name__ == "__main__":
+    main()
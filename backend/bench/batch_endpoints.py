@@ -0,0 +1,42 @@
+"""Throughput of POST /business/sales (one item per call) vs POST /business/sales/batch."""
+import argparse
+from bench.common import make_app, logged_in_client, timed, report
+
+
+def _items(n: int):
+    return [
+        {"name": f"Item {i % 40}", "amount": 1000 + i, "quantity": 1 + i % 3, "date": "2024-06-01"}
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    app = make_app()
+    client = logged_in_client(app)
+    items = _items(args.items)
+
+    def single():
+        for item in items:
+            assert client.post("/business/sales", json=item).status_code == 201
+
+    def batched():
+        for i in range(0, len(items), args.batch_size):
+            resp = client.post("/business/sales/batch", json=items[i:i + args.batch_size])
+            assert resp.status_code == 201, resp.get_json()
+
+    single_s, _ = timed(single)
+    batch_s, _ = timed(batched)
+    report(f"{args.items} sales, batch size {args.batch_size}", [
+        ("single-item endpoint (items/s)", f"{args.items / single_s:,.0f}"),
+        ("batch endpoint (items/s)", f"{args.items / batch_s:,.0f}"),
+        ("speedup", f"{single_s / batch_s:.1f}x"),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Shared setup for the benchmark scripts: a throwaway SQLite app and a logged-in client.
+
+Run benchmarks from backend/, e.g. `python -m bench.batch_endpoints`.
+"""
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def make_app(db_path: str = None):
+    """Create the Flask app against a fresh SQLite file (unless DATABASE_URL is already set)."""
+    if not os.getenv("BENCH_DATABASE_URL"):
+        db_path = db_path or os.path.join(tempfile.mkdtemp(prefix="lw-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    else:
+        os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+    from app import create_app
+    from extensions import db
+    from migrations import upgrade
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.app_context():
+        upgrade(db.engine, echo=lambda *_: None)
+    return app
+
+
+def logged_in_client(app, email: str = "bench@example.com", business: str = "Bench Ltd"):
+    client = app.test_client()
+    resp = client.post("/auth/register", json={"email": email, "password": "bench-password", "businessName": business})
+    if resp.status_code == 409:
+        client.post("/auth/login", json={"email": email, "password": "bench-password"})
+    return client
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def report(title: str, rows: list[tuple]):
+    print(f"\n{title}")
+    print("-" * len(title))
+    for label, value in rows:
+        print(f"  {label:<40} {value}")
@@ -0,0 +1,73 @@
+"""Import validation: the old per-row float()/int()/pd.to_datetime loop vs the compiled column schema.
+
+Times both on a clean file and on one where every other row is bad. Needs no database.
+"""
+import argparse
+import io
+import numpy as np
+import pandas as pd
+from bench.common import timed, report
+from business.import_schema import LEDGER_SCHEMA
+
+
+def make_csv(rows: int, bad_fraction: float, seed: int = 3) -> bytes:
+    rng = np.random.default_rng(seed)
+    qty = rng.integers(1, 10, rows)
+    amount = rng.integers(100, 50_000, rows).astype(object)
+    dates = (pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")).strftime("%Y-%m-%d")
+    dates = np.asarray(dates, dtype=object)
+    category = np.where(rng.random(rows) < 0.6, "sale", "expense").astype(object)
+    bad = rng.random(rows) < bad_fraction
+    kind = rng.integers(0, 3, rows)
+    amount[bad & (kind == 0)] = "n/a"
+    dates[bad & (kind == 1)] = "someday"
+    category[bad & (kind == 2)] = "refund"
+    df = pd.DataFrame({"name": np.char.add("item ", (qty * 7 % 40).astype(str)), "category": category,
+                       "amount": amount, "date": dates, "quantity": qty, "totalamount": ""})
+    return df.to_csv(index=False).encode()
+
+
+def per_row(df):
+    """The pre-schema loop: convert each cell and let exceptions mark bad rows."""
+    good, errors = 0, []
+    for i, row in df.iterrows():
+        try:
+            category = str(row.get('category') or '').strip().lower()
+            amount_unit = float(row.get('amount') or 0)
+            qty = int(row.get('quantity') or 1)
+            totalamount = row.get('totalamount')
+            float(totalamount) if pd.notna(totalamount) else amount_unit * qty
+            date_val = pd.to_datetime(row.get('date'), errors='coerce')
+            date_val.date() if pd.notna(date_val) else None
+            if category not in ('sale', 'expense'):
+                errors.append({"row": i + 1, "error": f"Unknown category '{category}'"})
+                continue
+            good += 1
+        except Exception as e:
+            errors.append({"row": i + 1, "error": str(e)})
+    return good, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--bad-fraction", type=float, default=0.5)
+    args = parser.parse_args()
+
+    rows = []
+    for label, fraction in (("clean", 0.0), (f"{args.bad_fraction:.0%} bad", args.bad_fraction)):
+        df = pd.read_csv(io.BytesIO(make_csv(args.rows, fraction)))
+        df.columns = [str(c).strip().lower() for c in df.columns]
+        old_s, (old_good, old_errors) = timed(per_row, df)
+        new_s, checked = timed(LEDGER_SCHEMA.validate, df)
+        rows += [
+            (f"{label}: per-row loop (s)", f"{old_s:.2f}  ({old_good:,} ok, {old_errors:,} errors listed)"),
+            (f"{label}: schema (s)", f"{new_s:.3f}  ({len(checked.rows):,} ok, {len(checked.errors)} of "
+                                     f"{sum(checked.error_counts.values()):,} errors listed)"),
+            (f"{label}: speedup", f"{old_s / new_s:.0f}x"),
+        ]
+    report(f"Import validation, {args.rows:,} rows", rows)
+
+
+if __name__ == "__main__":
+    main()
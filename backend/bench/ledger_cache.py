@@ -0,0 +1,91 @@
+"""Analytics reads from SQL vs the memory-mapped ledger cache.
+
+Seeds one business with synthetic sales and expenses, then times the three
+reads that use the cache (all-time totals, the projection's daily series and
+the anomaly re-scan frame) against SQL, plus the cold build and an
+incremental append after a small write.
+"""
+import argparse
+import os
+import tempfile
+from datetime import date, timedelta
+import numpy as np
+from bench.common import make_app, logged_in_client, timed, report
+
+
+def seed(business_id: int, model, rows: int, start_id: int, rng, label: str):
+    from extensions import db
+    start = date.today() - timedelta(days=730)
+    days = rng.integers(0, 730, rows)
+    kobo = rng.integers(100, 5_000_000, rows)
+    values = [
+        {"business_id": business_id, label: f"item {i % 300}", "date": start + timedelta(days=int(d)),
+         "amount": int(k) / 100, "amount_kobo": int(k), "quantity": 1}
+        for i, d, k in zip(range(start_id, start_id + rows), days, kobo)
+    ]
+    for i in range(0, rows, 50_000):
+        db.session.execute(db.insert(model), values[i:i + 50_000])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000, help="Sales (and as many expenses).")
+    parser.add_argument("--append", type=int, default=1_000, help="Rows written before the incremental rebuild.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    logged_in_client(app)
+    app.config["LEDGER_CACHE_DIR"] = tempfile.mkdtemp(prefix="lw-ledger-cache-")
+    rng = np.random.default_rng(5)
+    with app.app_context():
+        import ledger_cache
+        from ai.projection import load_daily_series
+        from business.anomalies import _frame
+        from extensions import db
+        from http_cache import bump_data_version
+        from models import BusinessProfile, Expense, Sale
+        from money import kobo_sum
+
+        bid = BusinessProfile.query.first().id
+        seed(bid, Sale, args.rows, 0, rng, "name")
+        seed(bid, Expense, args.rows, 0, rng, "description")
+        bump_data_version(bid)
+        db.session.commit()
+
+        def sql_totals():
+            return (db.session.query(kobo_sum(Sale.amount_kobo)).filter_by(business_id=bid).scalar(),
+                    db.session.query(kobo_sum(Expense.amount_kobo)).filter_by(business_id=bid).scalar())
+
+        def best(fn):
+            return min(timed(fn)[0] for _ in range(args.repeat))
+
+        app.config["LEDGER_CACHE_ENABLED"] = False
+        sql = [best(sql_totals), best(lambda: load_daily_series(bid)), best(lambda: _frame(bid, "sale"))]
+        expected = sql_totals()
+
+        app.config["LEDGER_CACHE_ENABLED"] = True
+        cold_s, _ = timed(ledger_cache.load, bid)
+        assert ledger_cache.totals(bid) == tuple(int(t) for t in expected)
+        cached = [best(lambda: ledger_cache.totals(bid)), best(lambda: load_daily_series(bid)),
+                  best(lambda: _frame(bid, "sale"))]
+
+        seed(bid, Sale, args.append, args.rows, rng, "name")
+        bump_data_version(bid)
+        db.session.commit()
+        append_s, _ = timed(ledger_cache.load, bid)
+        path = ledger_cache._version_dir(ledger_cache._root(), bid, ledger_cache.load(bid).version)
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+    rows = [("sql / cached (ms)", "")]
+    for name, s, c in zip(("totals", "daily series (24 months)", "anomaly scan frame"), sql, cached):
+        rows.append((f"  {name}", f"{s * 1000:8.1f} / {c * 1000:8.1f}  ({s / c:,.0f}x)"))
+    report(f"Ledger cache, {args.rows:,} sales + {args.rows:,} expenses", rows + [
+        ("cold build (s)", f"{cold_s:.2f}"),
+        (f"append {args.append:,} rows (s)", f"{append_s:.3f}"),
+        ("on disk (MiB)", f"{size / 2**20:.1f}"),
+    ])
+
+
+if __name__ == "__main__":
+    main()
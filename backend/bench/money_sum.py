@@ -0,0 +1,48 @@
+"""SUM over BIGINT kobo vs DOUBLE PRECISION naira columns, and the drift of the float total.
+
+Uses SQLite by default; set BENCH_DATABASE_URL to a Postgres URL to run it there.
+"""
+import argparse
+import os
+import random
+import tempfile
+from decimal import Decimal
+from sqlalchemy import create_engine, text
+from bench.common import timed, report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp(prefix='lw-money-')}/money.db"
+    engine = create_engine(url)
+    rng = random.Random(7)
+    kobo = [rng.randint(1, 50_000_000) for _ in range(args.rows)]  # up to NGN 500,000 per row
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS money_bench"))
+        conn.execute(text("CREATE TABLE money_bench (id INTEGER PRIMARY KEY, amount DOUBLE PRECISION, amount_kobo BIGINT)"))
+        conn.execute(text("INSERT INTO money_bench (id, amount, amount_kobo) VALUES (:i, :a, :k)"),
+                     [{"i": i, "a": k / 100, "k": k} for i, k in enumerate(kobo)])
+
+    def total(column):
+        with engine.connect() as conn:
+            return conn.execute(text(f"SELECT SUM({column}) FROM money_bench")).scalar()
+
+    float_s = min(timed(total, "amount")[0] for _ in range(args.repeat))
+    int_s = min(timed(total, "amount_kobo")[0] for _ in range(args.repeat))
+    exact = Decimal(sum(kobo)) / 100
+    float_total = Decimal(repr(total("amount")))
+    report(f"SUM over {args.rows:,} rows ({engine.dialect.name})", [
+        ("DOUBLE PRECISION naira (ms)", f"{float_s * 1000:.1f}"),
+        ("BIGINT kobo (ms)", f"{int_s * 1000:.1f}"),
+        ("exact total (NGN)", f"{exact:,.2f}"),
+        ("float total drift (NGN)", f"{float_total - exact:+.6f}"),
+    ])
+
+
+if __name__ == "__main__":
+    main()
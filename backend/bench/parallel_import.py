@@ -0,0 +1,80 @@
+"""Parallel CSV ingestion: parse + validate + row preparation across a process pool.
+
+Times ParallelCsvUpload.chunks() on a synthetic ledger for 1, 2, 4, ... workers up
+to the core count (what the pool speeds up), then optionally the full import
+through the HTTP endpoint including the single writer (--write, SQLite by default).
+"""
+import argparse
+import io
+import os
+import numpy as np
+import pandas as pd
+from bench.common import make_app, logged_in_client, timed, report
+from business.ingest import ParallelCsvUpload
+
+
+def make_csv(rows: int, seed: int = 5) -> bytes:
+    rng = np.random.default_rng(seed)
+    out = io.StringIO()
+    out.write("name,category,amount,date,quantity,totalamount\n")
+    block = 1_000_000
+    for start in range(0, rows, block):
+        n = min(block, rows - start)
+        qty = rng.integers(1, 10, n)
+        amount = rng.integers(100, 50_000, n)
+        frame = pd.DataFrame({
+            "name": np.char.add("item ", rng.integers(0, 500, n).astype(str)),
+            "category": np.where(rng.random(n) < 0.6, "sale", "expense"),
+            "amount": amount,
+            "date": (pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D")).strftime("%Y-%m-%d"),
+            "quantity": qty,
+            "totalamount": amount * qty,
+        })
+        frame.to_csv(out, header=False, index=False)
+    return out.getvalue().encode()
+
+
+def prepare_all(content: bytes, workers: int):
+    rows = 0
+    for chunk in ParallelCsvUpload(content, workers).chunks(business_id=1):
+        rows += len(chunk.sales.dicts) + len(chunk.expenses.dicts)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--write", action="store_true", help="Also time the full import (parallel prepare + inserts).")
+    args = parser.parse_args()
+
+    content = make_csv(args.rows)
+    counts = sorted({1, *(2 ** k for k in range(1, 8) if 2 ** k < args.max_workers), args.max_workers})
+    rows = []
+    base = None
+    for workers in counts:
+        seconds, prepared = timed(prepare_all, content, workers)
+        base = base or seconds
+        rows.append((f"{workers} worker(s) (s)", f"{seconds:.1f}  {prepared / seconds:,.0f} rows/s  "
+                                                 f"speedup {base / seconds:.2f}x"))
+    report(f"Parse + validate + prepare, {args.rows:,} rows ({len(content) / 2**20:.0f} MiB, "
+           f"{os.cpu_count()} cores)", rows)
+
+    if args.write:
+        os.environ["IMPORT_PARALLEL_MIN_BYTES"] = "0"
+        os.environ["IMPORT_WORKERS"] = str(args.max_workers)
+        os.environ["RATE_LIMIT_ENABLED"] = "0"
+        client = logged_in_client(make_app())
+        seconds, resp = timed(client.post, "/business/import",
+                              data={"file": (io.BytesIO(content), "bench.csv")}, content_type="multipart/form-data")
+        body = resp.get_json()
+        report("Full import via /business/import", [
+            ("status", resp.status_code),
+            ("rows inserted", f"{body['sales_added'] + body['expenses_added']:,}"),
+            ("time (s)", f"{seconds:.1f}"),
+            ("rows/s", f"{args.rows / seconds:,.0f}"),
+        ])
+
+
+if __name__ == "__main__":
+    main()
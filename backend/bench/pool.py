@@ -0,0 +1,108 @@
+"""Pool pre-ping vs error-driven reconnect, plus checkout-wait under thread contention.
+
+For each strategy, --threads clients hit /business/dashboard and we report
+throughput and checkout wait p50/p95. Next, every idle pooled connection is
+killed (as after a database restart or failover) and we count the requests
+that fail before the pool recovers.
+
+Run from backend/: `python -m bench.pool [--threads 8 --requests 200]`.
+Set BENCH_DATABASE_URL to a Postgres URL for realistic ping round trips.
+"""
+import argparse
+import os
+import threading
+from bench.common import make_app, report, timed
+
+STRATEGIES = {
+    "pre-ping": {"DB_POOL_PRE_PING": "1"},
+    "error-driven reconnect": {"DB_POOL_PRE_PING": "0"},
+}
+
+
+def _clients(app, n, prefix):
+    clients = []
+    for i in range(n):
+        client = app.test_client()
+        email = f"{prefix}{i}@example.com"
+        client.post("/auth/register", json={"email": email, "password": "bench-password", "businessName": f"{prefix} {i}"})
+        client.post("/business/sales", json={"name": "Item", "amount": 1000, "date": "2024-01-01"})
+        clients.append(client)
+    return clients
+
+
+def _hammer(clients, per_client):
+    errors = []
+
+    def run(client):
+        for _ in range(per_client):
+            try:
+                ok = client.get("/business/dashboard").status_code == 200
+            except Exception:  # TESTING propagates handler exceptions instead of returning a 500
+                ok = False
+            if not ok:
+                errors.append(1)
+
+    threads = [threading.Thread(target=run, args=(c,)) for c in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(errors)
+
+
+def _kill_idle_connections(engine):
+    """Close the DBAPI side of every idle pooled connection behind SQLAlchemy's back."""
+    killed = 0
+    for record in list(engine.pool._pool.queue):
+        if record.dbapi_connection is not None:
+            record.dbapi_connection.close()
+            killed += 1
+    return killed
+
+
+def run_strategy(label, env, args):
+    os.environ.update(env)
+    os.environ["GUNICORN_THREADS"] = str(args.threads)
+    app = make_app()
+    import metrics
+    from extensions import db
+    from pooling import CHECKOUT_WAIT
+
+    with app.app_context():
+        engine = db.engine
+    pool_label = label.replace(" ", "-")
+    engine.pool.lw_name = pool_label
+    # Config is read once per process, so both strategies share one database; keep their users apart
+    clients = _clients(app, args.threads, prefix=pool_label)
+    per_client = max(1, args.requests // args.threads)
+
+    elapsed, errors = timed(_hammer, clients, per_client)
+    total = per_client * len(clients)
+    p50 = metrics.quantile(CHECKOUT_WAIT, 0.5, pool=pool_label)
+    p95 = metrics.quantile(CHECKOUT_WAIT, 0.95, pool=pool_label)
+
+    killed = _kill_idle_connections(engine)
+    failed_after_kill = _hammer(clients, 1)
+    retries = metrics.counter_value("db_reconnect_retries_total")
+    return [
+        (f"{label}: throughput", f"{total / elapsed:,.0f} req/s ({errors} errors)"),
+        (f"{label}: checkout wait p50 / p95", f"<= {p50 * 1000:.1f} ms / <= {p95 * 1000:.1f} ms"),
+        (f"{label}: failed after killing {killed} conns", f"{failed_after_kill} of {len(clients)} requests"),
+        (f"{label}: handler retries (cumulative)", f"{retries:.0f}"),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+
+    rows = []
+    for label, env in STRATEGIES.items():
+        rows.extend(run_strategy(label, env, args))
+    report(f"Pool strategies ({args.threads} threads, {args.requests} requests each)", rows)
+
+
+if __name__ == "__main__":
+    main()
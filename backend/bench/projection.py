@@ -0,0 +1,51 @@
+"""Time ai.projection.project_series on synthetic daily ledgers (target: < 100 ms for a year)."""
+import argparse
+from datetime import date
+import numpy as np
+from bench.common import timed, report
+from ai.projection import project_series
+
+
+def _daily(days: int, base: float, rng):
+    dates = np.datetime64("2023-01-01") + np.arange(days)
+    season = 1.0 + 0.2 * np.sin(2 * np.pi * np.arange(days) / 365.0)
+    amounts = base * season * (1 + np.arange(days) / days) + rng.normal(0, base * 0.1, days)
+    return dates, np.maximum(0, amounts)
+
+
+def check_edge_cases():
+    """Series that used to crash: sales with no expenses (zero residual sd) and only future-dated rows."""
+    today = date(2024, 6, 15)
+    months = np.array(["2024-03-10", "2024-04-10", "2024-05-10"], dtype="datetime64[D]")
+    empty = np.array([], dtype="datetime64[D]")
+    report = project_series(months, np.array([100_000, 100_000, 100_000]), empty, np.array([], dtype=np.int64),
+                            today=today)
+    assert report is not None and report.months_of_history == 3 and len(report.periods) == 12
+    future = np.array(["2024-09-01", "2024-11-20"], dtype="datetime64[D]")
+    report = project_series(future, np.array([5_000, 7_000]), future, np.array([1_000, 2_000]), today=today)
+    assert report is not None and report.months_of_history == 3 and report.periods[0].period == "2024-12"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--horizon", type=int, default=36)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    check_edge_cases()
+    rng = np.random.default_rng(1)
+    sd, sa = _daily(args.days, 50_000, rng)
+    ed, ea = _daily(args.days, 30_000, rng)
+    today = date(2023, 1, 1).fromordinal(date(2023, 1, 1).toordinal() + args.days)
+
+    project_series(sd, sa, ed, ea, horizon=args.horizon, today=today)  # warm-up
+    times = [timed(project_series, sd, sa, ed, ea, horizon=args.horizon, today=today)[0] for _ in range(args.repeat)]
+    report(f"project_series: {args.days} days of history, {args.horizon}-month horizon", [
+        ("median (ms)", f"{np.median(times) * 1000:.1f}"),
+        ("max (ms)", f"{max(times) * 1000:.1f}"),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""GET /business/sales payload size and CPU: ORM objects + stdlib jsonify vs Row tuples + orjson + compression.
+
+Run from backend/: `python -m bench.serialization [--rows 20000 --repeat 5]`
+"""
+import argparse
+import time
+from datetime import date, timedelta
+from flask.json.provider import DefaultJSONProvider
+from bench.common import make_app, logged_in_client, report
+
+
+def _seed(app, client, n):
+    from extensions import db
+    from models import BusinessProfile, Sale
+    from money import money_values
+    with app.app_context():
+        profile = BusinessProfile.query.first()
+        start = date(2023, 1, 1)
+        db.session.execute(db.insert(Sale), [
+            {
+                "name": f"Item {i % 300}",
+                "date": start + timedelta(days=i % 700),
+                "description": "bench row" if i % 3 else None,
+                "quantity": 1 + i % 5,
+                "business_id": profile.id,
+                **money_values(1000 + (i * 37) % 90000, None),
+            }
+            for i in range(n)
+        ])
+        db.session.commit()
+        return profile.id
+
+
+def _legacy_body(app, business_id):
+    """The pre-change handler body: ORM entities, per-row dict with isoformat, stdlib encoder."""
+    from models import Sale
+    sales = Sale.query.filter_by(business_id=business_id).all()
+    payload = [
+        {
+            "id": s.id, "name": s.name, "amount": s.amount,
+            "date": s.date.isoformat() if s.date else None,
+            "description": s.description, "quantity": s.quantity, "unit_price": s.unit_price,
+        }
+        for s in sales
+    ]
+    return DefaultJSONProvider(app).response(payload).get_data()
+
+
+def _cpu(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        result = fn()
+        best = min(best, time.process_time() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    client = logged_in_client(app)
+    business_id = _seed(app, client, args.rows)
+
+    with app.test_request_context():
+        legacy_cpu, legacy = _cpu(lambda: _legacy_body(app, business_id), args.repeat)
+
+    def fetch(url, encoding):
+        return client.get(url, headers={"Accept-Encoding": encoding})
+
+    rows = [("JSON backend", app.json.backend)]
+    rows.append(("before: ORM + stdlib, identity", f"{len(legacy):>10,} B  {legacy_cpu * 1000:7.1f} ms CPU"))
+    for label, url in (("objects", "/business/sales"), ("columns", "/business/sales?shape=columns")):
+        for encoding in ("identity", "gzip", "br"):
+            cpu, resp = _cpu(lambda: fetch(url, encoding), args.repeat)
+            served = resp.headers.get("Content-Encoding", "identity")
+            rows.append((f"after: {label}, {encoding} -> {served}", f"{len(resp.data):>10,} B  {cpu * 1000:7.1f} ms CPU"))
+    report(f"GET /business/sales with {args.rows:,} rows (best of {args.repeat}; 'after' includes the full request)", rows)
+
+
+if __name__ == "__main__":
+    main()
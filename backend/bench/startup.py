@@ -0,0 +1,64 @@
+"""Worker boot time: wall-clock for `create_app()` in a fresh interpreter, plus the slowest imports.
+
+Run from backend/: `python -m bench.startup [--runs 5] [--top 10]`
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from bench.common import BACKEND_DIR, report
+
+BOOT = (
+    "import time; t = time.perf_counter(); "
+    "from app import create_app; create_app(); "
+    "print(time.perf_counter() - t)"
+)
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='lw-boot-')}/boot.db")
+    return env
+
+
+def boot_times(runs: int) -> list[float]:
+    times = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", BOOT], cwd=BACKEND_DIR, env=_env(),
+                             capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def slowest_imports(top: int) -> list[tuple[str, str]]:
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "from app import create_app; create_app()"],
+                         cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line.split(":", 1)[1].split("|"))
+        if not name.startswith(" "):  # top-level imports only
+            rows.append((int(cumulative), name))
+    rows.sort(reverse=True)
+    return [(name, f"{us / 1000:.1f} ms") for us, name in rows[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    times = boot_times(args.runs)
+    report(f"create_app() in a fresh interpreter ({args.runs} runs)", [
+        ("median (ms)", f"{statistics.median(times) * 1000:.0f}"),
+        ("max (ms)", f"{max(times) * 1000:.0f}"),
+    ])
+    report("slowest top-level imports (cumulative)", slowest_imports(args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""Outlier flags for ledger amounts (the classic fat-finger: an extra zero).
+
+Amounts are compared in log10 space, where "ten times too big" is a fixed
+distance of 1 regardless of price level. Each key keeps O(1) streaming state
+in ledger_stat:
+
+* Welford running mean/variance (reported as `z`), and
+* P2 estimates of the median and of the median absolute deviation (MAD),
+  which drive the flag: robust z = 0.6745 * |x - median| / MAD > ANOMALY_THRESHOLD.
+
+Sales are checked on unit price per item when the item has
+ANOMALY_MIN_HISTORY observations, otherwise on amount across the business
+at twice the threshold; expenses likewise by description. Flagged rows are still saved - the flag is
+advisory and returned in the response - and they update the robust markers
+but not the Welford moments, so one typo cannot drag the mean.
+
+`scan_frame` is the vectorized batch equivalent (exact per-key median/MAD in
+pandas) for re-scanning history; `seed_states` turns the same pass into
+streaming state for `flask db rebuild-ledger-stats`.
+"""
+import json
+import math
+from flask import current_app
+from extensions import db
+from models import Expense, LedgerStat, Sale
+import metrics
+from .importer import insert_ignore
+from .items import NAME_KEY_LEN
+
+ROBUST_K = 0.6745  # MAD -> standard deviation for normal data
+MAD_FLOOR = 0.1    # log10 units; items sold at one fixed price have MAD 0
+MAX_REPORTED = 100
+# Business-wide amounts mix cheap and dear items, so the fallback only flags gross slips
+BUSINESS_THRESHOLD_FACTOR = 2.0
+DEFAULT_LABEL = {"sale": "Sale", "expense": "Expense"}  # Sale keys match item_stat.name_key
+
+# scope names: (per-key scope, business-wide scope)
+SCOPES = {"sale": ("sale_item", "sale"), "expense": ("expense_item", "expense")}
+
+metrics.describe("ledger_anomalies_total", "counter", "Sale/expense writes flagged as outliers, by kind and basis")
+
+
+class P2Quantile:
+    """Jain & Chlamtac's P-square estimator: one quantile from five markers, no stored samples."""
+
+    def __init__(self, p: float = 0.5, state=None):
+        self.p = p
+        self.count, self.q, self.n = (state[0], list(state[1:6]), list(state[6:11])) if state else (0, [], [])
+
+    def state(self) -> list:
+        return [self.count, *self.q, *self.n]
+
+    @classmethod
+    def from_sorted(cls, values, p: float = 0.5):
+        """Seed markers from a sorted sample (exact quantiles at the marker positions)."""
+        est = cls(p)
+        count = len(values)
+        if count < 5:
+            for v in values:
+                est.add(v)
+            return est
+        est.count = count
+        fractions = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+        est.n = [1 + round((count - 1) * f) for f in fractions]
+        est.q = [float(values[pos - 1]) for pos in est.n]
+        return est
+
+    def value(self):
+        if self.count == 0:
+            return None
+        if self.count < 5:
+            ordered = sorted(self.q)
+            mid = (len(ordered) - 1) * self.p
+            lo = int(mid)
+            return ordered[lo] + (ordered[min(lo + 1, len(ordered) - 1)] - ordered[lo]) * (mid - lo)
+        return self.q[2]
+
+    def add(self, x: float):
+        self.count += 1
+        if self.count <= 5:
+            self.q.append(x)
+            if self.count == 5:
+                self.q.sort()
+                self.n = [1, 2, 3, 4, 5]
+            return
+        q, n = self.q, self.n
+        if x < q[0]:
+            q[0], k = x, 0
+        elif x >= q[4]:
+            q[4], k = x, 3
+        else:
+            k = next(i for i in range(4) if q[i] <= x < q[i + 1])
+        for i in range(k + 1, 5):
+            n[i] += 1
+        c, p = self.count, self.p
+        desired = (1, 1 + (c - 1) * p / 2, 1 + (c - 1) * p, 1 + (c - 1) * (1 + p) / 2, c)
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if q[i - 1] < parabolic < q[i + 1]:
+                    q[i] = parabolic
+                else:
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+
+class RunningStats:
+    """Welford moments plus P2 median and MAD for one key."""
+
+    def __init__(self, state: dict = None):
+        state = state or {}
+        self.n = state.get("n", 0)
+        self.mean = state.get("mean", 0.0)
+        self.m2 = state.get("m2", 0.0)
+        self.median = P2Quantile(0.5, state.get("med"))
+        self.mad = P2Quantile(0.5, state.get("mad"))
+
+    def to_json(self) -> str:
+        return json.dumps({"n": self.n, "mean": self.mean, "m2": self.m2,
+                           "med": self.median.state(), "mad": self.mad.state()})
+
+    @property
+    def observations(self) -> int:
+        return self.median.count
+
+    def score(self, x: float):
+        """(robust z, Welford z or None, median) of x against the state so far."""
+        med = self.median.value()
+        mad = max(self.mad.value() or 0.0, MAD_FLOOR)
+        robust = ROBUST_K * abs(x - med) / mad
+        z = None
+        if self.n > 1 and self.m2 > 0:
+            z = (x - self.mean) / math.sqrt(self.m2 / (self.n - 1))
+        return robust, z, med
+
+    def add(self, x: float, outlier: bool = False):
+        med = self.median.value()
+        self.median.add(x)
+        self.mad.add(abs(x - (med if med is not None else x)))
+        if not outlier:
+            self.n += 1
+            delta = x - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (x - self.mean)
+
+
+def _settings():
+    cfg = current_app.config
+    return cfg.get("ANOMALY_THRESHOLD", 3.5), cfg.get("ANOMALY_MIN_HISTORY", 8)
+
+
+def _key(kind: str, label) -> str:
+    return (label if label is not None else DEFAULT_LABEL[kind]).strip().lower()[:NAME_KEY_LEN]
+
+
+def _observation(kind: str, row: dict):
+    """(item key, log10 value checked per item, log10 amount checked business-wide); None when not checkable."""
+    amount = (row.get("amount_kobo") or 0) / 100
+    if amount <= 0:
+        return None
+    qty = row.get("quantity") or 1
+    unit = amount / qty if qty > 0 else amount
+    label = row.get("name") if kind == "sale" else row.get("description")
+    return _key(kind, label), math.log10(unit), math.log10(amount)
+
+
+def _flag(basis: str, x: float, med: float, robust: float, z) -> dict:
+    ratio = 10 ** abs(x - med)
+    return {
+        "field": basis,
+        "value": round(10 ** x, 2),
+        "typical": round(10 ** med, 2),
+        "score": round(robust, 1),
+        "z": round(z, 1) if z is not None else None,
+        "reason": f"{basis.replace('_', ' ')} is {ratio:.1f}x {'above' if x > med else 'below'} typical",
+    }
+
+
+def observe(item: RunningStats, business: RunningStats, unit_x: float, amount_x: float,
+            threshold: float, min_history: int):
+    """Score one row against its item and business state, then add it to both. Returns a flag or None."""
+    if item.observations >= min_history:
+        basis, x, (robust, z, med) = "unit_price", unit_x, item.score(unit_x)
+    elif business.observations >= min_history:
+        basis, x, (robust, z, med) = "amount", amount_x, business.score(amount_x)
+        threshold *= BUSINESS_THRESHOLD_FACTOR
+    else:
+        basis = None
+    flag = _flag(basis, x, med, robust, z) if basis is not None and robust > threshold else None
+    item.add(unit_x, outlier=flag is not None)
+    business.add(amount_x, outlier=flag is not None)
+    return flag
+
+
+def check_rows(business_id: int, kind: str, rows: list[dict]) -> list:
+    """Score `rows` (column dicts, in order) against the stored state, update it, and return one flag or None per row.
+
+    Call inside the write's transaction; the state rows are locked (FOR UPDATE on Postgres) until commit.
+    """
+    if not current_app.config.get("ANOMALY_ENABLED", True) or not rows:
+        return [None] * len(rows)
+    threshold, min_history = _settings()
+    item_scope, business_scope = SCOPES[kind]
+    observations = [_observation(kind, row) for row in rows]
+    keys = {(item_scope, obs[0]) for obs in observations if obs} | {(business_scope, "")}
+
+    def locked():
+        return {
+            (s.scope, s.key): s
+            for s in LedgerStat.query.filter(
+                LedgerStat.business_id == business_id,
+                LedgerStat.scope.in_([item_scope, business_scope]),
+                LedgerStat.key.in_({key for _, key in keys}),
+            ).with_for_update()
+        }
+
+    stored = locked()
+    missing = keys - set(stored)
+    if missing:
+        # FOR UPDATE cannot lock a row that does not exist yet: create empty state first, tolerating a
+        # concurrent first write of the same key, then lock what is there
+        empty = RunningStats().to_json()
+        db.session.execute(insert_ignore(LedgerStat), [
+            {"business_id": business_id, "scope": scope, "key": key, "state": empty} for scope, key in sorted(missing)
+        ])
+        stored = locked()
+    stats = {k: RunningStats(json.loads(stored[k].state)) for k in keys}
+
+    flags = []
+    for row, obs in zip(rows, observations):
+        if obs is None:
+            flags.append(None)
+            continue
+        key, unit_x, amount_x = obs
+        flag = observe(stats[(item_scope, key)], stats[(business_scope, "")], unit_x, amount_x, threshold, min_history)
+        if flag:
+            metrics.inc("ledger_anomalies_total", kind=kind, basis=flag["field"])
+        flags.append(flag)
+
+    for k, running in stats.items():
+        stored[k].state = running.to_json()
+    return flags
+
+
+def _frame(business_id: int, kind: str):
+    import numpy as np
+    import pandas as pd  # heavy; only needed for batch scans
+    import ledger_cache
+
+    ledger = ledger_cache.load(business_id) if business_id is not None else None
+    if ledger is not None:
+        cols = ledger[kind]
+        keep = np.flatnonzero(cols.amount_kobo > 0)
+        return pd.DataFrame({
+            "id": cols.id[keep],
+            "business_id": business_id,
+            "label": np.asarray(cols.items, dtype=object)[cols.item[keep]] if cols.items else np.array([], dtype=object),
+            "date": cols.date[keep].astype(object),
+            "amount_kobo": cols.amount_kobo[keep],
+            "quantity": cols.quantity[keep],
+        })
+
+    model = Sale if kind == "sale" else Expense
+    label = Sale.name if kind == "sale" else Expense.description
+    query = db.select(model.id, model.business_id, label.label("label"), model.date, model.amount_kobo, model.quantity)
+    if business_id is not None:
+        query = query.where(model.business_id == business_id)
+    rows = db.session.execute(query.where(model.amount_kobo > 0).order_by(model.id)).all()
+    return pd.DataFrame(rows, columns=["id", "business_id", "label", "date", "amount_kobo", "quantity"])
+
+
+def _prepare(df, kind: str):
+    """Add key / unit_x / amount_x columns, computed as `_observation` does per row."""
+    import numpy as np
+
+    amount = df["amount_kobo"].to_numpy(dtype=float) / 100
+    qty = df["quantity"].fillna(1).to_numpy(dtype=float)
+    qty[qty <= 0] = 1
+    labels = df["label"].fillna(DEFAULT_LABEL[kind]).astype(str)
+    return df.assign(
+        key=labels.str.strip().str.lower().str.slice(0, NAME_KEY_LEN),
+        unit_x=np.log10(amount / qty),
+        amount_x=np.log10(amount),
+    )
+
+
+def scan_frame(df, threshold: float, min_history: int, kind: str = "sale"):
+    """Vectorized batch flags over a ledger frame (columns business_id, label, amount_kobo > 0, quantity).
+
+    Uses exact per-key median/MAD over the whole history rather than the streaming estimates;
+    returns the flagged rows, most anomalous first, with `basis`, `typical` and `score` added.
+    """
+    import numpy as np
+
+    work = _prepare(df, kind)
+
+    def robust(group_cols, column):
+        groups = [work[c] for c in group_cols]
+        med = work[column].groupby(groups, sort=False).transform("median")
+        dev = (work[column] - med).abs()
+        mad = dev.groupby(groups, sort=False).transform("median")
+        count = work[column].groupby(groups, sort=False).transform("size")
+        return ROBUST_K * dev / mad.clip(lower=MAD_FLOOR), med, count
+
+    item_score, item_med, item_n = robust(["business_id", "key"], "unit_x")
+    business_score, business_med, business_n = robust(["business_id"], "amount_x")
+    use_item = (item_n >= min_history).to_numpy()
+    work["basis"] = np.where(use_item, "unit_price", "amount")
+    work["score"] = np.where(use_item, item_score, np.where(business_n >= min_history, business_score, 0.0))
+    work["typical"] = np.power(10.0, np.where(use_item, item_med, business_med))
+    limit = np.where(use_item, threshold, threshold * BUSINESS_THRESHOLD_FACTOR)
+    return work[work["score"] > limit].sort_values("score", ascending=False)
+
+
+def scan_history(business_id: int, kind: str, limit: int = MAX_REPORTED):
+    """Batch re-scan of a business's ledger; (rows scanned, flagged rows, most anomalous first)."""
+    threshold, min_history = _settings()
+    df = _frame(business_id, kind)
+    if df.empty:
+        return 0, []
+    flagged = scan_frame(df, threshold, min_history, kind)
+    return len(df), [
+        {
+            "id": int(r.id),
+            "label": r.label,
+            "date": r.date,
+            "amount": r.amount_kobo / 100,
+            "quantity": int(r.quantity or 1),
+            "basis": r.basis,
+            "typical": round(float(r.typical), 2),
+            "score": round(float(r.score), 1),
+        }
+        for r in flagged.head(limit).itertuples()
+    ]
+
+
+def seed_states(business_id: int = None) -> int:
+    """Rebuild ledger_stat from history: exact markers per key from one grouped pass. Returns keys written."""
+    import numpy as np
+
+    written = 0
+    delete = db.delete(LedgerStat)
+    if business_id is not None:
+        delete = delete.where(LedgerStat.business_id == business_id)
+    db.session.execute(delete)
+    for kind, (item_scope, business_scope) in SCOPES.items():
+        df = _frame(business_id, kind)
+        if df.empty:
+            continue
+        df = _prepare(df, kind)
+        for group_cols, scope, column in ((["business_id", "key"], item_scope, "unit_x"),
+                                          (["business_id"], business_scope, "amount_x")):
+            states = []
+            for keys, values in df.groupby(group_cols, sort=False)[column]:
+                keys = keys if isinstance(keys, tuple) else (keys,)
+                x = np.sort(values.to_numpy())
+                running = RunningStats()
+                running.median = P2Quantile.from_sorted(x)
+                running.mad = P2Quantile.from_sorted(np.sort(np.abs(x - np.median(x))))
+                running.n, running.mean = len(x), float(x.mean())
+                running.m2 = float(((x - x.mean()) ** 2).sum())
+                states.append({"business_id": int(keys[0]), "scope": scope,
+                               "key": keys[1] if len(keys) > 1 else "", "state": running.to_json()})
+            if states:
+                db.session.execute(db.insert(LedgerStat), states)
+                written += len(states)
+    return written
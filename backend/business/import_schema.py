@@ -0,0 +1,158 @@
+"""Declarative column schema for ledger imports.
+
+A `Schema` is a tuple of `Column` declarations (type, blank handling, range,
+allowed values, date formats). `validate` runs each declaration as a handful
+of whole-column pandas operations, so a file full of bad rows costs about the
+same as a clean one. Errors are reported as the first `max_errors` (row,
+column, message) entries plus a count per column and error code; a row with
+any error is left out of `rows`.
+
+Validation never touches the database, which is what lets /business/import
+offer a dry run.
+"""
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+# Tried in order, each only on the values earlier formats did not parse; ISO first, then US-style
+# month-first (what pandas inferred for the sample files before formats were declared)
+DATE_FORMATS = ("ISO8601", "%m/%d/%Y", "%d/%m/%Y", "%d-%m-%Y", "%d %b %Y", "%b %d %Y", "%d %B %Y", "%B %d %Y")
+_NUMBER_NOISE = r"[,\s₦]"  # thousands separators and a leading naira sign are accepted
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    kind: str                 # text, choice, number, integer or date
+    required: bool = True     # header must be present
+    blank: bool = True        # empty cells allowed (filled with `default`)
+    default: object = None
+    min: float = None
+    max: float = None
+    max_length: int = None    # text
+    choices: tuple = ()       # choice; compared trimmed and lower-cased
+    formats: tuple = DATE_FORMATS  # date
+
+
+@dataclass
+class Validation:
+    rows: pd.DataFrame  # valid rows only, typed, indexed by 0-based file row
+    total: int
+    errors: list        # first max_errors {"row", "column", "error"}, by row
+    error_counts: dict  # "column:code" -> number of cells
+    rejected: int
+
+    @property
+    def truncated(self) -> bool:
+        return len(self.errors) < sum(self.error_counts.values())
+
+
+def _text_and_blank(raw: pd.Series):
+    """(stripped text, or None for an already typed column; mask of empty cells). Strips once per column."""
+    if raw.dtype != object and not pd.api.types.is_string_dtype(raw):
+        return None, raw.isna()
+    text = raw.astype(object).str.strip()
+    return text, text.isna() | (text == "")
+
+
+def _text(col: Column, raw: pd.Series, text: pd.Series, blank: pd.Series):
+    values = (raw.astype(str) if text is None else text).mask(blank)
+    checks = []
+    if col.max_length:
+        checks.append(("too_long", values.str.len().fillna(0).to_numpy() > col.max_length,
+                       f"longer than {col.max_length} characters"))
+    return values, checks
+
+
+def _choice(col: Column, raw: pd.Series, text: pd.Series, blank: pd.Series):
+    values = (raw.astype(str) if text is None else text).str.lower().mask(blank)
+    allowed = values.isin(col.choices).to_numpy()
+    return values, [("not_allowed", ~allowed & ~blank.to_numpy(), f"must be one of {', '.join(col.choices)}")]
+
+
+def _number(col: Column, raw: pd.Series, text: pd.Series, blank: pd.Series):
+    if text is None:
+        values = raw.astype(float)
+    else:
+        values = pd.to_numeric(text.mask(blank), errors="coerce").astype(float)
+        retry = values.isna() & ~blank
+        if retry.any():  # only cells with separators or a currency sign pay for the regex
+            values[retry] = pd.to_numeric(text[retry].str.replace(_NUMBER_NOISE, "", regex=True), errors="coerce")
+    bad = values.isna().to_numpy() & ~blank.to_numpy()
+    checks = [("not_number", bad, "not a number")]
+    if col.kind == "integer":
+        checks.append(("not_integer", ((values % 1 != 0) & values.notna()).to_numpy(), "not a whole number"))
+    if col.min is not None:
+        checks.append(("below_min", (values < col.min).to_numpy(), f"must be at least {col.min:g}"))
+    if col.max is not None:
+        checks.append(("above_max", (values > col.max).to_numpy(), f"must be at most {col.max:g}"))
+    return values, checks
+
+
+def _date(col: Column, raw: pd.Series, text: pd.Series, blank: pd.Series):
+    if pd.api.types.is_datetime64_any_dtype(raw):
+        values = raw
+    else:
+        text = (raw.astype(str) if text is None else text).mask(blank)
+        values = pd.Series(pd.NaT, index=raw.index, dtype="datetime64[ns]")
+        for fmt in col.formats:
+            todo = values.isna() & text.notna()
+            if not todo.any():
+                break
+            values[todo] = pd.to_datetime(text[todo], format=fmt, errors="coerce")
+    bad = values.isna().to_numpy() & ~blank.to_numpy()
+    return values.dt.date.astype(object).where(values.notna(), None), [("bad_date", bad, "not a recognised date")]
+
+
+_CONVERTERS = {"text": _text, "choice": _choice, "number": _number, "integer": _number, "date": _date}
+
+
+class Schema:
+    def __init__(self, *columns: Column):
+        unknown = {c.kind for c in columns} - set(_CONVERTERS)
+        if unknown:
+            raise ValueError(f"Unknown column kinds: {', '.join(sorted(unknown))}")
+        self.columns = columns
+
+    def missing_columns(self, columns) -> list:
+        return sorted(c.name for c in self.columns if c.required and c.name not in columns)
+
+    def validate(self, df: pd.DataFrame, max_errors: int = 100) -> Validation:
+        """Type and check every column of `df` (headers already normalised)."""
+        df = df.reset_index(drop=True)
+        typed = {}
+        failed = np.zeros(len(df), dtype=bool)
+        counts = {}
+        samples = []  # (row, column order, column, message) for at most max_errors cells per check
+        for order, col in enumerate(self.columns):
+            raw = df[col.name] if col.name in df.columns else pd.Series(None, index=df.index, dtype=object)
+            text, blank = _text_and_blank(raw)
+            values, checks = _CONVERTERS[col.kind](col, raw, text, blank)
+            if not col.blank:
+                checks.insert(0, ("missing", blank.to_numpy(), "required"))
+            elif col.default is not None:
+                values = values.where(~blank, col.default)
+            for code, mask, message in checks:
+                hits = np.flatnonzero(mask)
+                if not len(hits):
+                    continue
+                counts[f"{col.name}:{code}"] = int(len(hits))
+                failed[hits] = True
+                for i in hits[:max_errors]:
+                    shown = "" if code == "missing" else f" ('{raw.iat[i]}')"
+                    samples.append((int(i), order, col.name, f"{col.name} {message}{shown}"))
+            typed[col.name] = values
+        samples.sort()
+        errors = [{"row": i + 1, "column": name, "error": message} for i, _, name, message in samples[:max_errors]]
+        rows = pd.DataFrame(typed, index=df.index)[~failed]
+        return Validation(rows=rows, total=len(df), errors=errors, error_counts=counts, rejected=int(failed.sum()))
+
+
+LEDGER_SCHEMA = Schema(
+    Column("name", "text", max_length=120),
+    Column("category", "choice", blank=False, choices=("sale", "expense")),
+    Column("amount", "number", default=0.0, min=0),   # unit price
+    Column("date", "date"),
+    Column("quantity", "integer", default=1.0, min=1),
+    Column("totalamount", "number", min=0),           # blank: amount * quantity
+)
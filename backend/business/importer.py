@@ -0,0 +1,65 @@
+import hashlib
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+from models import ImportManifest
+
+
+def file_digest(content: bytes) -> str:
+    """SHA-256 of the raw upload; identifies a whole-file re-upload before any parsing."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def row_hash(business_id: int, dt, name: str, category: str, qty: int, total: float, occurrence: int = 0) -> str:
+    """Content hash for one imported ledger row.
+
+    `occurrence` counts identical rows earlier in the same file, so two genuine
+    identical sales on one day are both kept while a re-upload still collides.
+    """
+    key = "|".join([
+        str(business_id),
+        dt.isoformat() if dt else "",
+        (name or "").strip().lower(),
+        (category or "").strip().lower(),
+        str(int(qty or 0)),
+        f"{float(total or 0):.2f}",
+        str(occurrence),
+    ])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def find_manifest(business_id: int, digest: str):
+    return ImportManifest.query.filter_by(business_id=business_id, file_digest=digest).first()
+
+
+def insert_ignore(model):
+    """INSERT that silently skips rows violating a unique constraint (row_hash). PostgreSQL and SQLite only."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        # SQLite >= 3.24 understands the same ON CONFLICT DO NOTHING clause
+        return sqlite.insert(model).on_conflict_do_nothing()
+    # Callers rely on RETURNING as well as ON CONFLICT, which e.g. MySQL's INSERT IGNORE cannot provide
+    raise NotImplementedError(f"Insert-or-skip is only implemented for PostgreSQL and SQLite, not {dialect}")
+
+
+def insert_new_rows(model, rows: list[dict]) -> list[dict]:
+    """Bulk insert `rows` into `model`, skipping ones whose row_hash already exists.
+    Returns the rows actually inserted, in input order.
+    """
+    if not rows:
+        return []
+    stmt = insert_ignore(model).returning(model.row_hash)
+    inserted = set(db.session.execute(stmt, rows).scalars())
+    return [row for row in rows if row["row_hash"] in inserted]
+
+
+def record_manifest(business_id: int, digest: str, filename: str, sales_added: int, expenses_added: int) -> None:
+    stmt = insert_ignore(ImportManifest).values(
+        business_id=business_id,
+        file_digest=digest,
+        filename=filename,
+        sales_added=sales_added,
+        expenses_added=expenses_added,
+    )
+    db.session.execute(stmt)
@@ -0,0 +1,259 @@
+"""Turning an uploaded ledger file into insertable Sale/Expense rows.
+
+`prepare` validates a parsed frame against LEDGER_SCHEMA and builds the
+column dicts and row hashes. Small uploads are prepared in-process as one
+chunk. CSV uploads of at least IMPORT_PARALLEL_MIN_BYTES are split into byte
+ranges that end on a newline outside quotes, and each range is parsed and
+prepared in the web worker's process pool (see process_pool). Chunks come back in file order to the one
+writer in the request, so inserts, row numbers and errors match a sequential
+import.
+
+Row hashes count identical rows earlier in the file (see importer.row_hash),
+but a worker only sees its own range. Each prepared row therefore carries the
+64-bit id of its key, and `Occurrences` renumbers the rare rows whose key
+already appeared in an earlier chunk.
+"""
+import io
+import os
+import tempfile
+from collections import Counter
+import numpy as np
+import pandas as pd
+from money import money_values
+import process_pool
+from .import_schema import LEDGER_SCHEMA
+from .importer import row_hash
+
+CHUNKS_PER_WORKER = 4  # smaller chunks balance the pool and let the writer start sooner
+
+
+class Rows:
+    """Prepared rows of one category from one chunk, with what renumbering needs."""
+
+    def __init__(self, category: str):
+        self.category = category
+        self.dicts = []
+        self.lines = []       # 0-based row within the chunk, then offset to the file by ImportReport
+        self.keys = []        # uint64 id of (date, name, category, quantity, total)
+        self.occurrence = []  # identical rows before this one in the chunk
+        self.totals = []
+        self.blank_names = []
+
+    def freeze(self):
+        self.lines = np.asarray(self.lines, dtype=np.int64)
+        self.keys = np.asarray(self.keys, dtype=np.uint64)
+        self.occurrence = np.asarray(self.occurrence, dtype=np.int64)
+        self.totals = np.asarray(self.totals, dtype=np.float64)
+        self.blank_names = np.asarray(self.blank_names, dtype=bool)
+        return self
+
+
+class Chunk:
+    def __init__(self, checked, sales: Rows = None, expenses: Rows = None, sales_valid: int = 0):
+        self.total = checked.total
+        self.rejected = checked.rejected
+        self.errors = checked.errors
+        self.error_counts = checked.error_counts
+        self.sales_valid = sales_valid
+        self.expenses_valid = len(checked.rows) - sales_valid
+        self.sales = sales
+        self.expenses = expenses
+
+
+def _key_id(digest: str) -> int:
+    return int(digest[:16], 16)
+
+
+def prepare(df: pd.DataFrame, business_id: int = None, max_errors: int = 100) -> Chunk:
+    """Validate `df` and, given a business, build its insert rows. Without one (dry run) only validates."""
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    checked = LEDGER_SCHEMA.validate(df, max_errors)
+    valid = checked.rows
+    is_sale = (valid["category"] == "sale").to_numpy()
+    if business_id is None:
+        return Chunk(checked, sales_valid=int(is_sale.sum()))
+
+    totals = valid["totalamount"].fillna(valid["amount"] * valid["quantity"])
+    built = {True: Rows("sale"), False: Rows("expense")}
+    seen = Counter()
+    for i, name, sale, amount_unit, qty, total, dt in zip(
+        valid.index.tolist(), valid["name"].fillna("").tolist(), is_sale.tolist(), valid["amount"].tolist(),
+        valid["quantity"].astype(int).tolist(), totals.tolist(), valid["date"].tolist(),
+    ):
+        category = 'sale' if sale else 'expense'
+        key = (dt, name.lower(), category, qty, round(total, 2))
+        occurrence = seen[key]
+        seen[key] += 1
+        digest = row_hash(business_id, dt, name, category, qty, total, occurrence)
+        first = digest if occurrence == 0 else row_hash(business_id, dt, name, category, qty, total, 0)
+        values = {
+            **money_values(total, amount_unit if amount_unit else None),
+            "date": dt,
+            "quantity": qty,
+            "business_id": business_id,
+            "row_hash": digest,
+        }
+        if sale:
+            values["name"] = name or 'Sale'
+        else:
+            values["description"] = name or 'Expense'
+        rows = built[sale]
+        rows.dicts.append(values)
+        rows.lines.append(i)
+        rows.keys.append(_key_id(first))
+        rows.occurrence.append(occurrence)
+        rows.totals.append(total)
+        rows.blank_names.append(not name)
+    return Chunk(checked, built[True].freeze(), built[False].freeze(), sales_valid=len(built[True].dicts))
+
+
+class Occurrences:
+    """Counts of row keys over the chunks written so far (sorted uint64 ids, so memory stays flat)."""
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.uint64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def _lookup(self, keys: np.ndarray):
+        pos = np.searchsorted(self.ids, keys)
+        found = pos < len(self.ids)
+        found[found] = self.ids[pos[found]] == keys[found]
+        return pos, found
+
+    def renumber(self, rows: Rows, business_id: int):
+        """Rehash rows whose key was already seen in an earlier chunk, then count this chunk's keys."""
+        if not len(rows.keys):
+            return
+        if len(self.ids):
+            pos, found = self._lookup(rows.keys)
+            prior = np.where(found, self.counts[np.minimum(pos, len(self.ids) - 1)], 0)
+            label = "name" if rows.category == "sale" else "description"
+            for i in np.flatnonzero(prior):
+                values = rows.dicts[i]
+                name = "" if rows.blank_names[i] else values[label]
+                values["row_hash"] = row_hash(business_id, values["date"], name, rows.category, values["quantity"],
+                                              float(rows.totals[i]), int(prior[i] + rows.occurrence[i]))
+        ids, counts = np.unique(rows.keys, return_counts=True)
+        pos, found = self._lookup(ids)
+        self.counts[pos[found]] += counts[found]
+        self.ids = np.insert(self.ids, pos[~found], ids[~found])
+        self.counts = np.insert(self.counts, pos[~found], counts[~found])
+
+
+class ImportReport:
+    """Merges chunk validation results in file order, keeping the first `max_errors` errors."""
+
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.rejected = 0
+        self.sales_valid = 0
+        self.expenses_valid = 0
+        self.errors = []
+        self.error_counts = Counter()
+
+    def add(self, chunk: Chunk):
+        """Offset the chunk's row numbers to file rows and fold it into the totals."""
+        for error in chunk.errors[:self.max_errors - len(self.errors)]:
+            self.errors.append({**error, "row": error["row"] + self.rows})
+        for rows in (chunk.sales, chunk.expenses):
+            if rows is not None:
+                rows.lines += self.rows
+        self.error_counts.update(chunk.error_counts)
+        self.rows += chunk.total
+        self.rejected += chunk.rejected
+        self.sales_valid += chunk.sales_valid
+        self.expenses_valid += chunk.expenses_valid
+
+    def payload(self) -> dict:
+        return {
+            "rows": self.rows,
+            "rows_rejected": self.rejected,
+            "errors": self.errors,
+            "error_counts": dict(self.error_counts),
+            "errors_truncated": len(self.errors) < sum(self.error_counts.values()),
+        }
+
+
+def record_end(data, start: int, search_from: int = None) -> int:
+    """Offset just past the first record-ending newline at or after `search_from`, or len(data).
+
+    `start` must be a record boundary: quotes are counted from there. RFC 4180 escapes ("") keep
+    the count even, so a newline ends a record exactly when the count before it is even.
+    """
+    last = start if search_from is None else search_from
+    quotes = data.count(b'"', start, last)
+    newline = data.find(b"\n", last)
+    while newline != -1:
+        quotes += data.count(b'"', last, newline)
+        last = newline
+        if quotes % 2 == 0:
+            return newline + 1
+        newline = data.find(b"\n", newline + 1)
+    return len(data)
+
+
+def byte_ranges(data, start: int, parts: int) -> list:
+    """Split data[start:] (start on a record boundary) into about `parts` ranges of whole records."""
+    size = len(data)
+    step = max(1, -(-(size - start) // parts))
+    ranges = []
+    while start < size:
+        end = size if start + step >= size else record_end(data, start, start + step)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _prepare_range(args):
+    path, header_end, start, end, business_id, max_errors = args
+    with open(path, "rb") as f:
+        header = f.read(header_end)
+        f.seek(start)
+        body = f.read(end - start)
+    return prepare(pd.read_csv(io.BytesIO(header + body), dtype=str), business_id, max_errors)
+
+
+class Upload:
+    """A parsed (or about to be parsed) upload: `columns` for the header check, `chunks()` for the rows."""
+
+    parallel = False
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.columns = [str(c).strip().lower() for c in df.columns]
+
+    def chunks(self, business_id: int = None, max_errors: int = 100):
+        yield prepare(self.df, business_id, max_errors)
+
+
+class ParallelCsvUpload(Upload):
+    parallel = True
+
+    def __init__(self, content: bytes, workers: int = None):
+        self.content = content
+        self.workers = workers or process_pool.default_workers()
+        self.header_end = record_end(content, 0)
+        header = pd.read_csv(io.BytesIO(content[:self.header_end]), nrows=0)
+        self.columns = [str(c).strip().lower() for c in header.columns]
+
+    def chunks(self, business_id: int = None, max_errors: int = 100):
+        """Prepared chunks in file order, parsed in a process pool from a temporary copy of the upload."""
+        fd, path = tempfile.mkstemp(prefix="lw-import-", suffix=".csv")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.content)
+            ranges = byte_ranges(self.content, self.header_end, self.workers * CHUNKS_PER_WORKER)
+            jobs = [(path, self.header_end, start, end, business_id, max_errors) for start, end in ranges]
+            yield from process_pool.get(self.workers).map(_prepare_range, jobs)
+        finally:
+            os.unlink(path)
+
+
+def open_upload(content: bytes, ext: str, parallel_min_bytes: int, workers: int = None) -> Upload:
+    """Parse the header (CSV at or above `parallel_min_bytes`) or the whole file. Raises on unreadable input."""
+    if ext == 'csv' and len(content) >= parallel_min_bytes:
+        return ParallelCsvUpload(content, workers)
+    if ext == 'csv':
+        return Upload(pd.read_csv(io.BytesIO(content), dtype=str))
+    return Upload(pd.read_excel(io.BytesIO(content)))
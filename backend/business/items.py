@@ -0,0 +1,210 @@
+"""Item-level sales statistics kept in the item_stat table.
+
+Sale writes (single, batch and import) add the deltas of the rows actually
+inserted with one upsert per (item, month) and (item, all-time) key. Reads
+(dashboard top sellers, /business/items) touch one row per item per month and
+never scan the sale table. `rebuild` recomputes the table from the sale rows
+after manual fixes; it keys items with the same `name_key` as writes, in
+Python, because SQL lower()/trim() differ (SQLite folds ASCII only).
+"""
+from collections import defaultdict
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from extensions import db
+from models import ItemStat, Sale
+from money import naira
+
+ALL_TIME = 0
+NAME_KEY_LEN = 120
+
+
+def _display(name) -> str:
+    return (name if name is not None else "Sale").strip()[:NAME_KEY_LEN]
+
+
+def name_key(name) -> str:
+    """Item key for item_stat; writes and rebuilds both use this, never an SQL lower()."""
+    return (name if name is not None else "Sale").strip().lower()[:NAME_KEY_LEN]
+
+
+def month_key(d) -> int:
+    return d.year * 100 + d.month
+
+
+def parse_month(text: str) -> int:
+    """'YYYY-MM' -> YYYYMM. Raises ValueError."""
+    try:
+        year, month = (int(part) for part in text.split("-"))
+    except (AttributeError, ValueError):
+        raise ValueError("months must be YYYY-MM")
+    if not (1 <= month <= 12 and 1 <= year <= 9999):
+        raise ValueError("months must be YYYY-MM")
+    return year * 100 + month
+
+
+def format_month(key: int) -> str:
+    return f"{key // 100:04d}-{key % 100:02d}"
+
+
+def _upsert(dialect: str):
+    excluded_min = {"postgresql": db.func.least, "sqlite": db.func.min}[dialect]
+    excluded_max = {"postgresql": db.func.greatest, "sqlite": db.func.max}[dialect]
+    stmt = (postgresql if dialect == "postgresql" else sqlite).insert(ItemStat)
+    new = stmt.excluded
+    # COALESCE both ways so a NULL on either side does not null out the other (SQLite min/max are NULL-propagating)
+    return stmt.on_conflict_do_update(
+        index_elements=[ItemStat.business_id, ItemStat.period, ItemStat.name_key],
+        set_={
+            "name": new.name,
+            "sales_kobo": ItemStat.sales_kobo + new.sales_kobo,
+            "units": ItemStat.units + new.units,
+            "sale_count": ItemStat.sale_count + new.sale_count,
+            "first_sold": excluded_min(db.func.coalesce(ItemStat.first_sold, new.first_sold),
+                                       db.func.coalesce(new.first_sold, ItemStat.first_sold)),
+            "last_sold": excluded_max(db.func.coalesce(ItemStat.last_sold, new.last_sold),
+                                      db.func.coalesce(new.last_sold, ItemStat.last_sold)),
+        },
+    )
+
+
+def _new_delta():
+    return {"sales_kobo": 0, "units": 0, "sale_count": 0, "first_sold": None, "last_sold": None}
+
+
+def _accumulate(deltas, business_id: int, name, amount_kobo, quantity, sold) -> None:
+    key = name_key(name)
+    for period in ((ALL_TIME, month_key(sold)) if sold else (ALL_TIME,)):
+        d = deltas[(business_id, period, key)]
+        d["name"] = _display(name)
+        d["sales_kobo"] += amount_kobo or 0
+        d["units"] += quantity or 0
+        d["sale_count"] += 1
+        if sold:
+            d["first_sold"] = min(filter(None, (d["first_sold"], sold)))
+            d["last_sold"] = max(filter(None, (d["last_sold"], sold)))
+
+
+def _values(deltas) -> list:
+    return [
+        {"business_id": business_id, "period": period, "name_key": key, **d}
+        for (business_id, period, key), d in sorted(deltas.items())  # fixed order keeps concurrent upserts deadlock-free
+    ]
+
+
+def record_sales(business_id: int, rows: list[dict]) -> None:
+    """Add freshly inserted sale rows (column dicts) to the item stats. Call inside the write's transaction."""
+    if not rows:
+        return
+    deltas = defaultdict(_new_delta)
+    for row in rows:
+        _accumulate(deltas, business_id, row.get("name"), row.get("amount_kobo"), row.get("quantity"), row.get("date"))
+    db.session.execute(_upsert(db.session.get_bind().dialect.name), _values(deltas))
+
+
+REBUILD_BATCH = 50_000
+
+
+def rebuild(conn, business_id: int = None) -> int:
+    """Recompute item stats from the sale table for one business (default: all). Returns item_stat rows written.
+
+    `conn` is a Connection or the session; sales are streamed and aggregated by `name_key`.
+    """
+    scope = [Sale.business_id.isnot(None)]
+    stale = []
+    if business_id is not None:
+        scope.append(Sale.business_id == business_id)
+        stale.append(ItemStat.business_id == business_id)
+    conn.execute(delete(ItemStat).where(*stale))
+    stmt = (
+        select(Sale.business_id, Sale.name, Sale.amount_kobo, Sale.quantity, Sale.date)
+        .where(*scope)
+        .execution_options(yield_per=REBUILD_BATCH)
+    )
+    deltas = defaultdict(_new_delta)
+    for rows in conn.execute(stmt).partitions():
+        for row in rows:
+            _accumulate(deltas, *row)
+    values = _values(deltas)
+    for i in range(0, len(values), REBUILD_BATCH):
+        conn.execute(insert(ItemStat), values[i:i + REBUILD_BATCH])
+    return len(values)
+
+
+def _months_active(first_sold, last_sold) -> int:
+    if not (first_sold and last_sold):
+        return 1
+    return max(1, (last_sold.year * 12 + last_sold.month) - (first_sold.year * 12 + first_sold.month) + 1)
+
+
+SORTS = {
+    "sales": ItemStat.sales_kobo,
+    "units": ItemStat.units,
+    "count": ItemStat.sale_count,
+    "last_sold": ItemStat.last_sold,
+}
+RANK_METRICS = ("sales", "units")
+
+
+def list_items(business_id: int, sort: str, descending: bool, limit: int, offset: int):
+    """(total items, page of all-time item rows) ordered by `sort`."""
+    column = SORTS[sort]
+    base = ItemStat.query.filter_by(business_id=business_id, period=ALL_TIME)
+    total = base.count()
+    order = column.desc() if descending else column.asc()
+    rows = base.order_by(order, ItemStat.name_key).offset(offset).limit(limit).all()
+    return total, [
+        {
+            "name": r.name,
+            "sales": naira(r.sales_kobo),
+            "units": int(r.units),
+            "count": r.sale_count,
+            "first_sold": r.first_sold,
+            "last_sold": r.last_sold,
+            "units_per_month": round(r.units / _months_active(r.first_sold, r.last_sold), 2),
+        }
+        for r in rows
+    ]
+
+
+def top_items(business_id: int, limit: int, start: int = None, end: int = None, metric: str = "sales"):
+    """Items ranked by `metric`, all time or summed over months start..end (YYYYMM, inclusive)."""
+    if start is None and end is None:
+        sales, units, count = ItemStat.sales_kobo, ItemStat.units, ItemStat.sale_count
+        query = db.session.query(ItemStat.name, sales.label("sales_kobo"), units.label("units"), count.label("sale_count"))
+        query = query.filter(ItemStat.business_id == business_id, ItemStat.period == ALL_TIME)
+        group = ()
+    else:
+        sales = db.func.sum(ItemStat.sales_kobo)
+        units = db.func.sum(ItemStat.units)
+        count = db.func.sum(ItemStat.sale_count)
+        query = db.session.query(
+            db.func.max(ItemStat.name), sales.label("sales_kobo"), units.label("units"), count.label("sale_count")
+        ).filter(
+            ItemStat.business_id == business_id,
+            ItemStat.period >= (start or 1),
+            ItemStat.period <= (end or 999912),
+        )
+        group = (ItemStat.name_key,)
+    ranked = sales if metric == "sales" else units
+    rows = query.group_by(*group).order_by(ranked.desc(), ItemStat.name_key).limit(limit).all()
+    return [
+        {"rank": i + 1, "name": name, "sales": naira(kobo), "units": int(u or 0), "count": int(c or 0)}
+        for i, (name, kobo, u, c) in enumerate(rows)
+    ]
+
+
+def item_trend(business_id: int, name: str, start: int = None, end: int = None):
+    """Monthly series for one item, oldest first."""
+    query = ItemStat.query.filter(
+        ItemStat.business_id == business_id,
+        ItemStat.name_key == name_key(name),
+        ItemStat.period != ALL_TIME,
+    )
+    if start is not None:
+        query = query.filter(ItemStat.period >= start)
+    if end is not None:
+        query = query.filter(ItemStat.period <= end)
+    return [
+        {"month": format_month(r.period), "sales": naira(r.sales_kobo), "units": int(r.units), "count": r.sale_count}
+        for r in query.order_by(ItemStat.period).all()
+    ]
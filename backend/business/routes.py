@@ -1,10 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
+from db_routing import read_only
+from http_cache import ledger_etag, bump_data_version
+from json_provider import rows_payload
 from datetime import date
+from sqlalchemy import insert
 from extensions import db
 from models import Sale, Expense, BusinessProfile
-import io
-import pandas as pd
+from money import money_values, kobo_sum, naira
+import ledger_cache
+from .items import (
+    RANK_METRICS, SORTS, item_trend, list_items, parse_month, record_sales, top_items,
+)
+from .import_schema import LEDGER_SCHEMA
+from .importer import file_digest, find_manifest, insert_new_rows, record_manifest
+from .anomalies import MAX_REPORTED, check_rows, scan_history
 from werkzeug.utils import secure_filename
 
 business = Blueprint("business", __name__)
@@ -16,12 +26,116 @@ def _allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def _entry_values(data: dict, business_id: int) -> dict:
+    """Validate one sale/expense payload and return column values. Raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Item must be a JSON object")
+    try:
+        qty = int(data.get('quantity') or 1)
+    except (TypeError, ValueError):
+        raise ValueError("quantity must be an integer")
+    total = data.get('totalamount', data.get('amount'))
+    unit_price = data.get('unit_price')
+
+    try:
+        # derive totals if needed
+        if total is None and unit_price is not None:
+            total = float(unit_price) * qty
+        if unit_price is None and total is not None and qty:
+            unit_price = float(total) / qty
+        money = money_values(float(total or 0), float(unit_price) if unit_price is not None else None)
+    except (TypeError, ValueError):
+        raise ValueError("amount and unit_price must be numbers")
+
+    try:
+        dt = date.fromisoformat(data['date']) if data.get('date') else date.today()
+    except (TypeError, ValueError):
+        raise ValueError("date must be ISO format (YYYY-MM-DD)")
+
+    return {
+        **money,
+        "date": dt,
+        "description": data.get('description'),
+        "quantity": qty,
+        "business_id": business_id,
+    }
+
+
+def _batch_insert(model, items, build, business_id):
+    """Validate every item, bulk insert the valid ones in one transaction.
+    Returns (results, inserted) where results holds an id or error per input index,
+    plus an "anomaly" for rows whose amount looks out of line.
+    """
+    results = []
+    rows = []
+    positions = []
+    for i, item in enumerate(items):
+        try:
+            rows.append(build(item))
+            positions.append(len(results))
+            results.append({"index": i, "id": None})
+        except ValueError as e:
+            results.append({"index": i, "error": str(e)})
+
+    if rows:
+        stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+        ids = db.session.execute(stmt, rows).scalars().all()
+        if model is Sale:
+            record_sales(business_id, rows)
+        flags = check_rows(business_id, "sale" if model is Sale else "expense", rows)
+        bump_data_version(business_id)
+        db.session.commit()
+        for pos, new_id, flag in zip(positions, ids, flags):
+            results[pos]["id"] = new_id
+            if flag:
+                results[pos]["anomaly"] = flag
+    return results, len(rows)
+
+
+SALE_LIST_COLUMNS = (Sale.id, Sale.name, Sale.amount, Sale.date, Sale.description, Sale.quantity, Sale.unit_price)
+EXPENSE_LIST_COLUMNS = (Expense.id, Expense.amount, Expense.date, Expense.description, Expense.quantity, Expense.unit_price)
+
+
+def _ledger_rows(columns):
+    """List a ledger table for the current business from plain Row tuples (no ORM objects).
+    ?shape=columns returns {"columns": [...], "rows": [[...]]}, serialised without per-row dicts.
+    """
+    profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
+    if not profile:
+        return jsonify([])
+    model = columns[0].class_
+    rows = db.session.execute(
+        db.select(*columns).where(model.business_id == profile.id).order_by(model.id)
+    ).all()
+    keys = [c.key for c in columns]
+    if request.args.get('shape') == 'columns':
+        return jsonify(rows_payload(keys, rows)), 200
+    return jsonify([dict(zip(keys, row)) for row in rows]), 200
+
+
+def _batch_payload():
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({"error": "Expected a non-empty JSON array of items"}), 400)
+    limit = current_app.config.get('BATCH_MAX_ITEMS', 500)
+    if len(items) > limit:
+        return None, (jsonify({"error": f"Too many items; maximum is {limit} per request"}), 413)
+    return items, None
+
+
 @business.route('/dashboard', methods=['GET'])
 @login_required
+@read_only
+@ledger_etag()
 def dashboard_data():
     profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
-    total_sales = db.session.query(db.func.coalesce(db.func.sum(Sale.amount), 0)).filter_by(business_id=profile.id).scalar() if profile else 0
-    total_expenses = db.session.query(db.func.coalesce(db.func.sum(Expense.amount), 0)).filter_by(business_id=profile.id).scalar() if profile else 0
+    cached = ledger_cache.totals(profile.id) if profile else None
+    if cached is not None:
+        total_sales, total_expenses = naira(cached[0]), naira(cached[1])
+    else:
+        total_sales = naira(db.session.query(kobo_sum(Sale.amount_kobo)).filter_by(business_id=profile.id).scalar()) if profile else 0
+        total_expenses = naira(db.session.query(kobo_sum(Expense.amount_kobo)).filter_by(business_id=profile.id).scalar()) if profile else 0
     recent_sales = []
     top_selling = []
     if profile:
@@ -29,28 +143,10 @@ def dashboard_data():
             {"id": s.id, "name": s.name, "amount": s.amount}
             for s in Sale.query.filter_by(business_id=profile.id).order_by(Sale.id.desc()).limit(5)
         ]
-        # Group sales by item name to compute top selling items
-        total_amount = db.func.coalesce(db.func.sum(Sale.amount), 0).label('total_amount')
-        units = db.func.coalesce(db.func.sum(Sale.quantity), 0).label('units')
-        grouped = (
-            db.session.query(
-                Sale.name.label('name'),
-                total_amount,
-                units,
-            )
-            .filter(Sale.business_id == profile.id)
-            .group_by(Sale.name)
-            .order_by(total_amount.desc())
-            .limit(5)
-            .all()
-        )
+        # Maintained incrementally in item_stat; no GROUP BY over the sale table
         top_selling = [
-            {
-                "name": row.name or "Sale",
-                "sales": float(row.total_amount or 0),
-                "units": int(row.units or 0),
-            }
-            for row in grouped
+            {"name": item["name"] or "Sale", "sales": item["sales"], "units": item["units"]}
+            for item in top_items(profile.id, 5)
         ]
     return jsonify({
         "total_revenue": float(total_sales) if total_sales else 0,
@@ -60,25 +156,111 @@ def dashboard_data():
     }), 200
 
 
-@business.route('/sales', methods=['GET'])
+def _month_args():
+    """Optional ?from=YYYY-MM&to=YYYY-MM as YYYYMM ints. Raises ValueError."""
+    start, end = request.args.get('from'), request.args.get('to')
+    return (parse_month(start) if start else None), (parse_month(end) if end else None)
+
+
+def _int_arg(name: str, default: int, low: int, high: int) -> int:
+    try:
+        value = int(request.args.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return value
+
+
+@business.route('/items', methods=['GET'])
 @login_required
-def get_sales():
+@read_only
+@ledger_etag()
+def get_items():
+    """All-time item stats. ?sort=sales|units|count|last_sold&order=desc|asc&limit=50&offset=0
+    (sort=last_sold&order=asc lists slow movers first)."""
     profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
     if not profile:
-        return jsonify([])
-    sales = Sale.query.filter_by(business_id=profile.id).all()
-    return jsonify([
-        {
-            "id": s.id,
-            "name": s.name,
-            "amount": s.amount,
-            "date": s.date.isoformat() if s.date else None,
-            "description": s.description,
-            "quantity": s.quantity,
-            "unit_price": s.unit_price,
-        }
-        for s in sales
-    ]), 200
+        return jsonify({"error": "No business profile"}), 400
+    sort = request.args.get('sort', 'sales')
+    if sort not in SORTS:
+        return jsonify({"error": f"sort must be one of {', '.join(SORTS)}"}), 400
+    try:
+        limit = _int_arg('limit', 50, 1, 500)
+        offset = _int_arg('offset', 0, 0, 10**9)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    total, items = list_items(profile.id, sort, request.args.get('order', 'desc') != 'asc', limit, offset)
+    return jsonify({"total": total, "items": items}), 200
+
+
+@business.route('/items/ranking', methods=['GET'])
+@login_required
+@read_only
+@ledger_etag()
+def get_item_ranking():
+    """Items ranked over a month window. ?from=YYYY-MM&to=YYYY-MM&by=sales|units&limit=10"""
+    profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
+    if not profile:
+        return jsonify({"error": "No business profile"}), 400
+    metric = request.args.get('by', 'sales')
+    if metric not in RANK_METRICS:
+        return jsonify({"error": f"by must be one of {', '.join(RANK_METRICS)}"}), 400
+    try:
+        start, end = _month_args()
+        limit = _int_arg('limit', 10, 1, 500)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "from": request.args.get('from'),
+        "to": request.args.get('to'),
+        "by": metric,
+        "items": top_items(profile.id, limit, start, end, metric),
+    }), 200
+
+
+@business.route('/items/<path:name>/trend', methods=['GET'])
+@login_required
+@read_only
+@ledger_etag()
+def get_item_trend(name):
+    """Monthly sales/units for one item. ?from=YYYY-MM&to=YYYY-MM"""
+    profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
+    if not profile:
+        return jsonify({"error": "No business profile"}), 400
+    try:
+        start, end = _month_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"name": name, "months": item_trend(profile.id, name, start, end)}), 200
+
+
+@business.route('/anomalies', methods=['GET'])
+@login_required
+@read_only
+@ledger_etag()
+def get_anomalies():
+    """Re-scan the whole ledger for outlying amounts. ?kind=sale|expense&limit=100"""
+    profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
+    if not profile:
+        return jsonify({"error": "No business profile"}), 400
+    kind = request.args.get('kind', 'sale')
+    if kind not in ('sale', 'expense'):
+        return jsonify({"error": "kind must be sale or expense"}), 400
+    try:
+        limit = _int_arg('limit', MAX_REPORTED, 1, 1000)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    scanned, flagged = scan_history(profile.id, kind, limit)
+    return jsonify({"kind": kind, "scanned": scanned, "anomalies": flagged}), 200
+
+
+@business.route('/sales', methods=['GET'])
+@login_required
+@read_only
+@ledger_etag()
+def get_sales():
+    return _ledger_rows(SALE_LIST_COLUMNS)
 
 
 @business.route('/sales', methods=['POST'])
@@ -89,48 +271,25 @@ def add_sale():
         return jsonify({"error": "No business profile"}), 400
     data = request.get_json() or {}
 
-    qty = int(data.get('quantity') or 1)
-    total = data.get('totalamount', data.get('amount'))
-    unit_price = data.get('unit_price')
-
-    # derive totals if needed
-    if total is None and unit_price is not None:
-        total = float(unit_price) * qty
-    if unit_price is None and total is not None and qty:
-        unit_price = float(total) / qty
-
-    sale = Sale(
-        name=data.get('name', 'Sale'),
-        amount=float(total or 0),
-        date=date.fromisoformat(data['date']) if data.get('date') else date.today(),
-        description=data.get('description'),
-        quantity=qty,
-        unit_price=float(unit_price) if unit_price is not None else None,
-        business_id=profile.id,
-    )
+    try:
+        values = _entry_values(data, profile.id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    sale = Sale(name=data.get('name', 'Sale'), **values)
     db.session.add(sale)
+    record_sales(profile.id, [{"name": sale.name, **values}])
+    anomaly, = check_rows(profile.id, "sale", [{"name": sale.name, **values}])
+    bump_data_version(profile.id)
     db.session.commit()
-    return jsonify({"message": "Sale added", "id": sale.id}), 201
+    return jsonify({"message": "Sale added", "id": sale.id, "anomaly": anomaly}), 201
 
 
 @business.route('/expenses', methods=['GET'])
 @login_required
+@read_only
+@ledger_etag()
 def get_expenses():
-    profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
-    if not profile:
-        return jsonify([])
-    expenses = Expense.query.filter_by(business_id=profile.id).all()
-    return jsonify([
-        {
-            "id": e.id,
-            "amount": e.amount,
-            "date": e.date.isoformat() if e.date else None,
-            "description": e.description,
-            "quantity": e.quantity,
-            "unit_price": e.unit_price,
-        }
-        for e in expenses
-    ]), 200
+    return _ledger_rows(EXPENSE_LIST_COLUMNS)
 
 
 @business.route('/expenses', methods=['POST'])
@@ -141,32 +300,70 @@ def add_expense():
         return jsonify({"error": "No business profile"}), 400
     data = request.get_json() or {}
 
-    qty = int(data.get('quantity') or 1)
-    total = data.get('totalamount', data.get('amount'))
-    unit_price = data.get('unit_price')
-
-    if total is None and unit_price is not None:
-        total = float(unit_price) * qty
-    if unit_price is None and total is not None and qty:
-        unit_price = float(total) / qty
-
-    expense = Expense(
-        amount=float(total or 0),
-        date=date.fromisoformat(data['date']) if data.get('date') else date.today(),
-        description=data.get('description'),
-        quantity=qty,
-        unit_price=float(unit_price) if unit_price is not None else None,
-        business_id=profile.id,
-    )
+    try:
+        values = _entry_values(data, profile.id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    expense = Expense(**values)
     db.session.add(expense)
+    anomaly, = check_rows(profile.id, "expense", [values])
+    bump_data_version(profile.id)
     db.session.commit()
-    return jsonify({"message": "Expense added", "id": expense.id}), 201
+    return jsonify({"message": "Expense added", "id": expense.id, "anomaly": anomaly}), 201
+
+
+@business.route('/sales/batch', methods=['POST'])
+@login_required
+def add_sales_batch():
+    """Create many sales in one transaction. Body: [{...}, ...] or {"items": [...]}"""
+    profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
+    if not profile:
+        return jsonify({"error": "No business profile"}), 400
+    items, error = _batch_payload()
+    if error:
+        return error
+
+    def build(item):
+        values = _entry_values(item, profile.id)
+        values["name"] = item.get('name', 'Sale')
+        return values
+
+    results, inserted = _batch_insert(Sale, items, build, profile.id)
+    return jsonify({
+        "message": "Sales added",
+        "created": inserted,
+        "failed": len(items) - inserted,
+        "results": results,
+    }), 201 if inserted else 400
+
+
+@business.route('/expenses/batch', methods=['POST'])
+@login_required
+def add_expenses_batch():
+    """Create many expenses in one transaction. Body: [{...}, ...] or {"items": [...]}"""
+    profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
+    if not profile:
+        return jsonify({"error": "No business profile"}), 400
+    items, error = _batch_payload()
+    if error:
+        return error
+
+    results, inserted = _batch_insert(Expense, items, lambda item: _entry_values(item, profile.id), profile.id)
+    return jsonify({
+        "message": "Expenses added",
+        "created": inserted,
+        "failed": len(items) - inserted,
+        "results": results,
+    }), 201 if inserted else 400
 
 
 @business.route('/import', methods=['POST'])
 @login_required
 def import_catalog():
-    """Upload CSV or Excel with columns: name, category(sale/expense), amount, date, quantity, totalamount"""
+    """Upload CSV or Excel with columns: name, category(sale/expense), amount, date, quantity, totalamount
+
+    With dry_run=1 (query or form field) the file is only validated; nothing is read from or written to the ledger.
+    """
     if 'file' not in request.files:
         return jsonify({"error": "No file uploaded"}), 400
 
@@ -174,76 +371,89 @@ def import_catalog():
     if not _allowed_file(file.filename):
         return jsonify({"error": "Invalid file type"}), 400
 
+    from .ingest import ImportReport, Occurrences, open_upload  # pandas; only needed once an upload arrives
+
     filename = secure_filename(file.filename)
     content = file.read()
+    dry_run = request.values.get('dry_run', '').lower() in ('1', 'true', 'yes')
+
+    profile = None
+    if not dry_run:
+        profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
+        if not profile:
+            return jsonify({"error": "No business profile found"}), 400
+
+        # Whole-file re-upload: detected by digest, skipped without parsing
+        digest = file_digest(content)
+        if find_manifest(profile.id, digest):
+            return jsonify({
+                "message": "File already imported",
+                "duplicate_file": True,
+                "sales_added": 0,
+                "expenses_added": 0,
+                "errors": []
+            }), 200
 
     try:
-        ext = filename.rsplit('.', 1)[1].lower()
-        if ext == 'csv':
-            df = pd.read_csv(io.BytesIO(content))
-        else:
-            df = pd.read_excel(io.BytesIO(content))
+        upload = open_upload(content, filename.rsplit('.', 1)[1].lower(),
+                             current_app.config['IMPORT_PARALLEL_MIN_BYTES'], current_app.config['IMPORT_WORKERS'])
     except Exception as e:
         return jsonify({"error": f"Could not read file: {e}"}), 400
 
-    # Normalize headers
-    df.columns = [str(c).strip().lower() for c in df.columns]
-
-    required = {"name", "category", "amount", "date", "quantity", "totalamount"}
-    missing = required - set(df.columns)
+    missing = LEDGER_SCHEMA.missing_columns(upload.columns)
     if missing:
-        return jsonify({"error": f"Missing columns: {', '.join(sorted(missing))}"}), 400
-
-    profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
-    if not profile:
-        return jsonify({"error": "No business profile found"}), 400
-
-    created_sales = 0
-    created_expenses = 0
-    errors = []
-
-    for i, row in df.iterrows():
-        try:
-            name = str(row.get('name') or '').strip()
-            category = str(row.get('category') or '').strip().lower()
-            amount_unit = float(row.get('amount') or 0)
-            qty = int(row.get('quantity') or 1)
-            totalamount = row.get('totalamount')
-            total = float(totalamount) if pd.notna(totalamount) else amount_unit * qty
-            date_val = pd.to_datetime(row.get('date'), errors='coerce')
-            dt = date_val.date() if pd.notna(date_val) else None
-
-            if category == 'sale':
-                sale = Sale(
-                    name=name or 'Sale',
-                    amount=total,
-                    date=dt,
-                    quantity=qty,
-                    unit_price=amount_unit if amount_unit else None,
-                    business_id=profile.id,
-                )
-                db.session.add(sale)
-                created_sales += 1
-            elif category == 'expense':
-                expense = Expense(
-                    amount=total,
-                    date=dt,
-                    description=name or 'Expense',
-                    quantity=qty,
-                    unit_price=amount_unit if amount_unit else None,
-                    business_id=profile.id,
-                )
-                db.session.add(expense)
-                created_expenses += 1
-            else:
-                errors.append({"row": i + 1, "error": f"Unknown category '{category}'"})
-        except Exception as e:
-            errors.append({"row": i + 1, "error": str(e)})
-
+        return jsonify({"error": f"Missing columns: {', '.join(missing)}"}), 400
+
+    max_errors = current_app.config['IMPORT_MAX_ERRORS']
+    report = ImportReport(max_errors)
+    if dry_run:
+        for chunk in upload.chunks(None, max_errors):
+            report.add(chunk)
+        return jsonify({
+            "message": "Validation complete",
+            "dry_run": True,
+            "sales_valid": report.sales_valid,
+            "expenses_valid": report.expenses_valid,
+            **report.payload(),
+        }), 200
+
+    # Chunks arrive in file order; rows are inserted as each one lands
+    occurrences = Occurrences()
+    created = {"sale": 0, "expense": 0}
+    prepared = 0
+    new_rows = {"sale": [], "expense": []}
+    row_numbers = {}  # row_hash -> 1-based file row, for reporting anomalies
+    for chunk in upload.chunks(profile.id, max_errors):
+        report.add(chunk)
+        for rows, model in ((chunk.sales, Sale), (chunk.expenses, Expense)):
+            occurrences.renumber(rows, profile.id)
+            inserted = insert_new_rows(model, rows.dicts)
+            created[rows.category] += len(inserted)
+            prepared += len(rows.dicts)
+            if model is Sale:
+                record_sales(profile.id, inserted)  # only rows that were not duplicates
+            if not upload.parallel:
+                new_rows[rows.category] += inserted
+                row_numbers.update(zip((values["row_hash"] for values in rows.dicts), (rows.lines + 1).tolist()))
+    created_sales, created_expenses = created["sale"], created["expense"]
+    record_manifest(profile.id, digest, filename, created_sales, created_expenses)
+    # Per-row anomaly checks are sequential; parallel (very large) imports leave them to /business/anomalies
+    anomalies = [
+        {"row": row_numbers[row["row_hash"]], "category": kind, **flag}
+        for kind, rows in new_rows.items()
+        for row, flag in zip(rows, check_rows(profile.id, kind, rows))
+        if flag
+    ]
+    anomalies.sort(key=lambda a: a["row"])
+    if created_sales or created_expenses:
+        bump_data_version(profile.id)
     db.session.commit()
     return jsonify({
         "message": "Import complete",
         "sales_added": created_sales,
         "expenses_added": created_expenses,
-        "errors": errors
+        "duplicates_skipped": prepared - created_sales - created_expenses,
+        **report.payload(),
+        "anomalies": anomalies[:MAX_REPORTED],
+        "anomaly_count": len(anomalies),
     }), 200
@@ -0,0 +1,57 @@
+"""gzip/brotli compression of larger responses (after_request).
+
+Brotli is used when the `brotli` package is installed and the client accepts
+it; gzip otherwise. Bodies under COMPRESS_MIN_BYTES are sent as-is since the
+framing overhead outweighs the saving.
+"""
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+COMPRESSIBLE = ("application/json", "text/", "application/javascript")
+
+
+def _choose_encoding(accept) -> str:
+    if brotli is not None and accept["br"]:
+        return "br"
+    if accept["gzip"]:
+        return "gzip"
+    return None
+
+
+def init_compression(app):
+    min_bytes = app.config.get("COMPRESS_MIN_BYTES", 1024)
+    gzip_level = app.config.get("COMPRESS_GZIP_LEVEL", 6)
+    brotli_quality = app.config.get("COMPRESS_BROTLI_QUALITY", 5)
+
+    @app.after_request
+    def compress(resp):
+        if (
+            resp.status_code < 200 or resp.status_code >= 300 or resp.status_code == 204
+            or resp.direct_passthrough or resp.is_streamed
+            or "Content-Encoding" in resp.headers
+            or not (resp.mimetype or "").startswith(COMPRESSIBLE)
+        ):
+            return resp
+        encoding = _choose_encoding(request.accept_encodings)
+        resp.vary.add("Accept-Encoding")
+        if encoding is None:
+            return resp
+        body = resp.get_data()
+        if len(body) < min_bytes:
+            return resp
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+        resp.set_data(compressed)
+        resp.headers["Content-Encoding"] = encoding
+        # The representation changed, so a strong validator no longer applies byte-for-byte
+        etag, weak = resp.get_etag()
+        if etag and not weak:
+            resp.set_etag(etag, weak=True)
+        return resp
@@ -7,6 +7,10 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY') or 'change-this-secret-in-prod'
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Optional read replica for @read_only handlers (dashboard, lists, AI context)
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+    # After a write, keep that user's reads on the primary this long to hide replication lag
+    REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', '5'))
 
     # Use Lax for non-HTTPS local dev, but None/Secure for prod
     IS_PROD = os.getenv('RENDER') or os.getenv('VERCEL')
@@ -19,7 +23,67 @@ class Config:
     REMEMBER_COOKIE_SECURE = True if IS_PROD else False
     REMEMBER_COOKIE_HTTPONLY = True
 
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_pre_ping": True,
-        "pool_recycle": 300,
-    }
\ No newline at end of file
+    # bcrypt cost for new hashes; existing hashes are upgraded/downgraded on the next successful login
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', '12'))
+    # Seconds a logged-in user's session snapshot is trusted before re-reading the User row (0 disables)
+    USER_SNAPSHOT_TTL = int(os.getenv('USER_SNAPSHOT_TTL', '300'))
+
+    # Upper bound on items accepted by /business/sales/batch and /business/expenses/batch
+    BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '500'))
+    # /business/import lists at most this many row errors (error_counts still covers every row)
+    IMPORT_MAX_ERRORS = int(os.getenv('IMPORT_MAX_ERRORS', '100'))
+    # CSV uploads at least this large are parsed and validated across a process pool (0 workers = min(4, cores))
+    IMPORT_PARALLEL_MIN_BYTES = int(os.getenv('IMPORT_PARALLEL_MIN_BYTES', str(32 * 1024 * 1024)))
+    IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', '0')) or None
+    # Memory-mapped NumPy copies of each ledger for analytics, rebuilt incrementally after writes (opt-in)
+    LEDGER_CACHE_ENABLED = os.getenv('LEDGER_CACHE_ENABLED', '0') not in ('0', 'false', 'False')
+    LEDGER_CACHE_DIR = os.getenv('LEDGER_CACHE_DIR')  # default: <tmp>/ledgerwise-ledger
+
+    # Comma-separated emails allowed to read cross-business reports (/ai/portfolio)
+    ADMIN_EMAILS = {e.strip().lower() for e in os.getenv('ADMIN_EMAILS', '').split(',') if e.strip()}
+    # Tenant count above which portfolio evaluation is sharded across a process pool (0 workers = min(4, cores))
+    PORTFOLIO_POOL_THRESHOLD = int(os.getenv('PORTFOLIO_POOL_THRESHOLD', '50000'))
+    PORTFOLIO_POOL_WORKERS = int(os.getenv('PORTFOLIO_POOL_WORKERS', '0')) or None
+
+    # Rate limits for AI endpoints: 'memory' (per worker) or 'sqlite' (shared by workers on one host)
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') not in ('0', 'false', 'False')
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_SQLITE_PATH = os.getenv('RATE_LIMIT_SQLITE_PATH')  # default: /dev/shm/ledgerwise-ratelimit.db
+    # Per-route overrides, e.g. "chat=30:10,analyze=2:1" (requests per minute : burst); parsed by ratelimit.py,
+    # which logs and ignores malformed entries
+    RATE_LIMIT_OVERRIDES = os.getenv('RATE_LIMIT_OVERRIDES', '')
+    # In-flight Bedrock calls allowed at once (per host with the sqlite backend), and how long a request queues for one
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+    LLM_QUEUE_SECONDS = float(os.getenv('LLM_QUEUE_SECONDS', '3'))
+    LLM_RETRY_AFTER_SECONDS = int(os.getenv('LLM_RETRY_AFTER_SECONDS', '5'))
+
+    # Server-side chat sessions: turns kept verbatim in the prompt, cap on the rolling summary of older
+    # turns, and the longest message stored per turn
+    CHAT_RECENT_TURNS = int(os.getenv('CHAT_RECENT_TURNS', '6'))
+    CHAT_SUMMARY_CHARS = int(os.getenv('CHAT_SUMMARY_CHARS', '1500'))
+    CHAT_MESSAGE_MAX_CHARS = int(os.getenv('CHAT_MESSAGE_MAX_CHARS', '4000'))
+
+    # Background refresh of /ai/insights and /ai/analyze snapshots: wait this long after the last
+    # ledger write before recomputing, and treat snapshots older than the max age as stale regardless
+    INSIGHT_REFRESH_ENABLED = os.getenv('INSIGHT_REFRESH_ENABLED', '1') not in ('0', 'false', 'False')
+    INSIGHT_REFRESH_DEBOUNCE = float(os.getenv('INSIGHT_REFRESH_DEBOUNCE', '30'))
+    INSIGHT_REFRESH_WORKERS = int(os.getenv('INSIGHT_REFRESH_WORKERS', '1'))
+    INSIGHT_SNAPSHOT_MAX_AGE = int(os.getenv('INSIGHT_SNAPSHOT_MAX_AGE', '86400'))
+
+    # Sale/expense amounts whose robust z-score (log scale, vs the item's or business's history)
+    # exceeds the threshold are flagged in write responses; keys need this many prior observations
+    ANOMALY_ENABLED = os.getenv('ANOMALY_ENABLED', '1') not in ('0', 'false', 'False')
+    ANOMALY_THRESHOLD = float(os.getenv('ANOMALY_THRESHOLD', '3.5'))
+    ANOMALY_MIN_HISTORY = int(os.getenv('ANOMALY_MIN_HISTORY', '8'))
+
+    # Responses at least this large are gzip/brotli compressed when the client accepts it
+    COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+
+    # Bearer token for Prometheus scrapes of /metrics (admins can also read it with a session)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+    # SQLALCHEMY_ENGINE_OPTIONS is derived in create_app() from the worker model (see pooling.py):
+    # WEB_CONCURRENCY, GUNICORN_THREADS, DB_MAX_CONNECTIONS, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    # DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_PGBOUNCER
@@ -0,0 +1,87 @@
+"""Optional read-replica routing for the SQLAlchemy session.
+
+When DATABASE_REPLICA_URL is set it is registered as the `replica` bind. Handlers
+decorated with @read_only send their SELECTs to it; everything else, and any
+statement that writes, goes to the primary. After a request that wrote, the
+user's session cookie pins their reads to the primary for REPLICA_STICKY_SECONDS
+so they see their own changes despite replication lag.
+
+@read_only handlers are also safe to retry, so with DB_POOL_PRE_PING=0 a
+connection found dead mid-request is replaced and the handler re-run once
+instead of paying a ping round trip on every checkout.
+"""
+import time
+from functools import wraps
+from flask import g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.dml import UpdateBase
+import metrics
+
+REPLICA_BIND = "replica"
+_PIN_KEY = "_primary_until"
+
+
+def _wants_replica() -> bool:
+    return has_request_context() and g.get("db_read_only", False) and not g.get("db_wrote", False)
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session whose reads go to the replica inside @read_only handlers."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        writing = self._flushing or isinstance(clause, UpdateBase)
+        if writing and has_request_context():
+            g.db_wrote = True
+        if not writing and _wants_replica():
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def retry_on_disconnect(fn):
+    """Re-run `fn` once if its connection turned out to be dead. Only for code that does not write."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except DBAPIError as e:
+            if not e.connection_invalidated:
+                raise
+            # SQLAlchemy has already invalidated the dead connection (and older pool entries)
+            from extensions import db
+            db.session.rollback()
+            metrics.inc("db_reconnect_retries_total")
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def read_only(view):
+    """Route this handler's queries to the replica unless the caller recently wrote."""
+    view = retry_on_disconnect(view)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        pinned_until = session.get(_PIN_KEY, 0)
+        g.db_read_only = time.time() >= pinned_until
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_replica(app):
+    """Register the replica bind (if configured) and the read-your-writes hook."""
+    url = app.config.get("DATABASE_REPLICA_URL")
+    if not url:
+        return
+    app.config.setdefault("SQLALCHEMY_BINDS", {})[REPLICA_BIND] = url
+
+    @app.after_request
+    def pin_after_write(resp):
+        if g.get("db_wrote") and resp.status_code < 400:
+            session[_PIN_KEY] = time.time() + app.config.get("REPLICA_STICKY_SECONDS", 5)
+        return resp
+
+    print(f"[DB] Read replica enabled; writers pinned to primary for {app.config.get('REPLICA_STICKY_SECONDS', 5)}s")
@@ -1,17 +1,26 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
+from db_routing import RoutingSession, retry_on_disconnect
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 bcrypt = Bcrypt()
 login_manager = LoginManager()
 
 
 @login_manager.user_loader
+@retry_on_disconnect
 def load_user(user_id):
+    from auth.session_user import snapshot_user, store_snapshot
+    cached = snapshot_user(user_id)
+    if cached is not None:
+        return cached
     from models import User
-    return User.query.get(int(user_id))
+    user = User.query.get(int(user_id))
+    if user is not None:
+        store_snapshot(user)
+    return user
 
 
 # Do not force HTML redirects; return JSON 401 for APIs
@@ -0,0 +1,6 @@
+# Gunicorn reads this from the working directory. Keep WEB_CONCURRENCY/GUNICORN_THREADS
+# in sync with pooling.py, which sizes each worker's database pool from the same variables.
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
@@ -0,0 +1,62 @@
+"""Conditional GETs keyed on BusinessProfile.data_version.
+
+Every write to a business's ledger bumps its data_version in the same
+transaction (bump_data_version). Read handlers decorated with @ledger_etag
+look the version up first; when it matches the client's If-None-Match they
+answer 304 without running the handler.
+"""
+from functools import wraps
+from flask import current_app, request
+from flask_login import current_user
+from extensions import db
+from models import BusinessProfile
+
+# Every ledger-derived view (including tax estimates) revalidates, so a write shows on the next read;
+# an unchanged data_version still costs only the version lookup and a 304
+CACHE_REVALIDATE = "private, no-cache"
+
+
+def bump_data_version(business_id: int):
+    """Increment the business's data version; call before committing a ledger write.
+
+    The id is also noted on the session so after-commit hooks (insight refresh) see which businesses changed.
+    """
+    db.session.info.setdefault("ledger_changed", set()).add(business_id)
+    db.session.execute(
+        db.update(BusinessProfile)
+        .where(BusinessProfile.id == business_id)
+        .values(data_version=BusinessProfile.data_version + 1)
+    )
+
+
+def current_data_version():
+    """(business_id, data_version) for the logged-in user, or None without a profile."""
+    return (
+        db.session.query(BusinessProfile.id, BusinessProfile.data_version)
+        .filter(BusinessProfile.user_id == current_user.id)
+        .first()
+    )
+
+
+def ledger_etag(cache_control: str = CACHE_REVALIDATE):
+    """Strong ETag from the business data version plus route and query string; 304 on match."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            row = current_data_version()
+            if row is None:
+                return view(*args, **kwargs)
+            # Distinct per URL so one route's validator is never accepted by another
+            etag = f"{row.id}-{row.data_version}-{request.endpoint}-{request.query_string.decode() or '_'}"
+            if request.if_none_match.contains_weak(etag):  # weak match: compression weakens the tag
+                resp = current_app.response_class(status=304)
+            else:
+                resp = current_app.make_response(view(*args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+            resp.set_etag(etag)
+            resp.headers["Cache-Control"] = cache_control
+            resp.vary.add("Cookie")
+            return resp
+        return wrapper
+    return decorator
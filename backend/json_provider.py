@@ -0,0 +1,75 @@
+"""Flask JSON provider backed by orjson when it is installed, stdlib json otherwise.
+
+Both paths agree on the wire format: dates are ISO 8601 (Flask's default would
+be an RFC 822 HTTP date), keys keep insertion order, NaN becomes null.
+"""
+import json
+import math
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib encoder
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, "_fields") and hasattr(obj, "_mapping"):  # SQLAlchemy Row
+        return tuple(obj)
+    return DefaultJSONProvider.default(obj)
+
+
+def _nan_to_none(obj):
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    if isinstance(obj, dict):
+        return {k: _nan_to_none(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_nan_to_none(v) for v in obj]
+    return obj
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    sort_keys = False
+    ensure_ascii = False
+    default = staticmethod(_default)
+
+    @property
+    def backend(self) -> str:
+        return "orjson" if orjson else "json"
+
+    def dumps_bytes(self, obj) -> bytes:
+        if orjson:
+            return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+        return json.dumps(_nan_to_none(obj), default=_default, ensure_ascii=False,
+                          separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson and not kwargs:
+            return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS).decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self._app.debug and self.compact is not False:
+            return super().response(obj)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def rows_payload(keys, rows) -> dict:
+    """Columnar payload serialised straight from Row tuples: {"columns": [...], "rows": [[...], ...]}.
+
+    Rows are turned into plain tuples up front: orjson encodes those natively,
+    whereas a Row would go through the Python `default` hook one at a time.
+    """
+    return {"columns": list(keys), "rows": [tuple(row) for row in rows]}
@@ -0,0 +1,229 @@
+"""Memory-mapped columnar copies of each business's ledger for analytics.
+
+With LEDGER_CACHE_ENABLED=1, analytics read a business's sales and expenses
+as NumPy arrays instead of querying and building Python objects each time.
+The columns are id, date, amount_kobo, quantity and item, where item is a
+code into a per-kind list of item names or expense descriptions, trimmed
+but otherwise as written, so labels read back exactly as SQL returns them. They live as
+.npy files under LEDGER_CACHE_DIR/<database>/<business>/v<data_version>/ and
+are opened with mmap_mode="r", so reads are zero-copy and every worker
+process on the host shares the same pages through the OS cache.
+
+A version directory is immutable. When the data_version moves on, the next
+reader copies the newest older version and appends the rows with higher ids,
+then checks the row count against the table. A mismatch, such as a row
+committed out of id order or a manual fix, triggers a full rebuild. Versions
+are published by renaming a finished temporary directory, so concurrent
+builders cannot expose a half-written one. Older versions are deleted;
+readers that still have them mapped keep working.
+
+Ledger rows are only ever inserted by the app. Edits made directly in the
+database do not bump data_version, so run `flask db clear-ledger-cache`
+afterwards.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+from flask import current_app
+from extensions import db
+from models import BusinessProfile, Expense, Sale
+import metrics
+
+KINDS = {"sale": (Sale, Sale.name, "Sale"), "expense": (Expense, Expense.description, "Expense")}
+COLUMNS = {"id": np.int64, "date": "datetime64[D]", "amount_kobo": np.int64, "quantity": np.int32, "item": np.int32}
+FETCH_BATCH = 50_000
+OPEN_LEDGERS = 64  # per process; each holds a few file mappings
+
+metrics.describe("ledger_cache_loads_total", "counter", "Ledger cache reads by outcome (hit, append, rebuild)")
+
+_open = OrderedDict()  # (root, business_id, version) -> Ledger
+_open_lock = threading.Lock()
+
+
+class Columns:
+    """One kind's arrays (read-only memory maps) plus the item code -> name list."""
+
+    def __init__(self, arrays: dict, items: list):
+        self.id = arrays["id"]
+        self.date = arrays["date"]
+        self.amount_kobo = arrays["amount_kobo"]
+        self.quantity = arrays["quantity"]
+        self.item = arrays["item"]
+        self.items = items
+
+    def __len__(self):
+        return len(self.id)
+
+
+class Ledger:
+    def __init__(self, version: int, sales: Columns, expenses: Columns):
+        self.version = version
+        self.sales = sales
+        self.expenses = expenses
+
+    def __getitem__(self, kind: str) -> Columns:
+        return self.sales if kind == "sale" else self.expenses
+
+
+def enabled() -> bool:
+    return bool(current_app.config.get("LEDGER_CACHE_ENABLED"))
+
+
+def _root() -> str:
+    # Per database, so two apps (or a test database) sharing a cache dir never mix business ids
+    url = db.engine.url.render_as_string(hide_password=True)
+    base = current_app.config.get("LEDGER_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "ledgerwise-ledger")
+    return os.path.join(base, hashlib.sha1(url.encode()).hexdigest()[:12])
+
+
+def _version_dir(root: str, business_id: int, version: int) -> str:
+    return os.path.join(root, str(business_id), f"v{version}")
+
+
+def _versions(root: str, business_id: int) -> list:
+    try:
+        names = os.listdir(os.path.join(root, str(business_id)))
+    except FileNotFoundError:
+        return []
+    return sorted(int(n[1:]) for n in names if n.startswith("v") and n[1:].isdigit())
+
+
+def _read(path: str) -> Ledger:
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    kinds = {}
+    for kind in KINDS:
+        arrays = {col: np.load(os.path.join(path, f"{kind}.{col}.npy"), mmap_mode="r")
+                  for col in COLUMNS}
+        kinds[kind] = Columns(arrays, meta["items"][kind])
+    return Ledger(meta["version"], kinds["sale"], kinds["expense"])
+
+
+def _fetch(kind: str, business_id: int, after_id: int, codes: dict, items: list) -> dict:
+    """Rows with id > after_id as arrays, extending the item dictionary in place."""
+    model, label, default = KINDS[kind]
+    stmt = (
+        db.select(model.id, model.date, model.amount_kobo, model.quantity, label)
+        .where(model.business_id == business_id, model.id > after_id)
+        .order_by(model.id)
+        .execution_options(yield_per=FETCH_BATCH)
+    )
+    parts = {col: [] for col in COLUMNS}
+    for rows in db.session.execute(stmt).partitions():
+        ids, dates, amounts, quantities, labels = zip(*rows)
+        item = []
+        for name in labels:
+            display = (name if name is not None else default).strip()
+            code = codes.get(display)
+            if code is None:
+                code = codes[display] = len(items)
+                items.append(display)
+            item.append(code)
+        parts["id"].append(np.array(ids, dtype=np.int64))
+        parts["date"].append(np.array([d if d is not None else "NaT" for d in dates], dtype="datetime64[D]"))
+        parts["amount_kobo"].append(np.array([a or 0 for a in amounts], dtype=np.int64))
+        parts["quantity"].append(np.array([q if q is not None else 1 for q in quantities], dtype=np.int32))
+        parts["item"].append(np.array(item, dtype=np.int32))
+    return {col: np.concatenate(parts[col]) if parts[col] else np.empty(0, dtype=dtype)
+            for col, dtype in COLUMNS.items()}
+
+
+def _row_counts(business_id: int) -> dict:
+    return {
+        kind: db.session.query(db.func.count(model.id)).filter(model.business_id == business_id).scalar()
+        for kind, (model, _, _) in KINDS.items()
+    }
+
+
+def _build(root: str, business_id: int, version: int, base: Ledger = None) -> str:
+    """Write version `version` (appending to `base` when given) and publish it. Returns its directory."""
+    outcome = "append" if base is not None else "rebuild"
+    counts = _row_counts(business_id)
+    columns, items = {}, {}
+    for kind in KINDS:
+        old = base[kind] if base is not None else None
+        names = list(old.items) if old is not None else []
+        after = int(old.id[-1]) if old is not None and len(old) else 0
+        new = _fetch(kind, business_id, after, {n: i for i, n in enumerate(names)}, names)
+        if old is not None and len(old) + len(new["id"]) != counts[kind]:
+            return _build(root, business_id, version)  # out-of-order commit or outside edit: start over
+        columns[kind] = {col: np.concatenate([getattr(old, col), new[col]]) if old is not None else new[col]
+                         for col in COLUMNS}
+        items[kind] = names
+
+    parent = os.path.join(root, str(business_id))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".build-", dir=parent)
+    for kind, arrays in columns.items():
+        for col, values in arrays.items():
+            np.save(os.path.join(tmp, f"{kind}.{col}.npy"), values)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"version": version, "items": items}, f)
+    final = _version_dir(root, business_id, version)
+    try:
+        os.rename(tmp, final)
+    except OSError:  # another process published this version first
+        shutil.rmtree(tmp, ignore_errors=True)
+    for old_version in _versions(root, business_id):
+        if old_version < version:
+            shutil.rmtree(_version_dir(root, business_id, old_version), ignore_errors=True)
+    metrics.inc("ledger_cache_loads_total", outcome=outcome)
+    return final
+
+
+def load(business_id: int):
+    """The business's ledger at its current data_version, or None when the cache is disabled."""
+    if not enabled():
+        return None
+    version = db.session.query(BusinessProfile.data_version).filter(BusinessProfile.id == business_id).scalar()
+    if version is None:
+        return None
+    root = _root()
+    key = (root, business_id, version)
+    with _open_lock:
+        ledger = _open.get(key)
+        if ledger is not None:
+            _open.move_to_end(key)
+    if ledger is not None:
+        metrics.inc("ledger_cache_loads_total", outcome="hit")
+        return ledger
+
+    try:
+        ledger = _read(_version_dir(root, business_id, version))
+        metrics.inc("ledger_cache_loads_total", outcome="hit")
+    except (OSError, ValueError):
+        older = [v for v in _versions(root, business_id) if v < version]
+        base = None
+        if older:
+            try:
+                base = _read(_version_dir(root, business_id, older[-1]))
+            except (OSError, ValueError):
+                base = None  # removed by a concurrent publish, or unreadable: rebuild in full
+        ledger = _read(_build(root, business_id, version, base))
+    with _open_lock:
+        _open[key] = ledger
+        while len(_open) > OPEN_LEDGERS:
+            _open.popitem(last=False)
+    return ledger
+
+
+def totals(business_id: int):
+    """(sales, expenses) all-time kobo totals from the cache, or None when it is disabled."""
+    ledger = load(business_id)
+    if ledger is None:
+        return None
+    return int(ledger.sales.amount_kobo.sum()), int(ledger.expenses.amount_kobo.sum())
+
+
+def clear(business_id: int = None):
+    """Delete cached versions for one business (or all of this database's); they rebuild on the next read."""
+    root = _root()
+    shutil.rmtree(os.path.join(root, str(business_id)) if business_id is not None else root, ignore_errors=True)
+    with _open_lock:
+        for key in [k for k in _open if k[0] == root and (business_id is None or k[1] == business_id)]:
+            del _open[key]
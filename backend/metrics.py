@@ -0,0 +1,134 @@
+"""In-process metrics registry exposed in Prometheus text format at /metrics.
+
+Counters and histograms are per process; with several gunicorn workers each
+scrape sees the worker that answered, so aggregate with sum()/rate() as usual.
+"""
+import bisect
+import hmac
+import threading
+from flask import Blueprint, Response, current_app, request
+from flask_login import current_user
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_help = {}
+_counters = {}
+_histograms = {}
+_gauges = {}
+
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted(labels.items()))
+
+
+def _fmt_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def describe(name: str, kind: str, text: str):
+    _help[name] = (kind, text)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name: str, value: float, buckets=DEFAULT_BUCKETS, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"buckets": tuple(buckets), "counts": [0] * (len(buckets) + 1), "sum": 0.0}
+        hist["counts"][bisect.bisect_left(hist["buckets"], value)] += 1
+        hist["sum"] += value
+
+
+def gauge(name: str, fn, text: str = ""):
+    """Register a callback evaluated at scrape time; it returns a number or {labels-tuple: number}."""
+    _gauges[name] = fn
+    describe(name, "gauge", text)
+
+
+def counter_value(name: str, **labels) -> float:
+    return _counters.get(_key(name, labels), 0)
+
+
+def quantile(name: str, q: float, **labels):
+    """Approximate quantile (upper bucket bound) from a histogram; None when empty."""
+    hist = _histograms.get(_key(name, labels))
+    if not hist:
+        return None
+    total = sum(hist["counts"])
+    if not total:
+        return None
+    running = 0
+    for bound, count in zip(hist["buckets"] + (float("inf"),), hist["counts"]):
+        running += count
+        if running >= q * total:
+            return bound
+    return float("inf")
+
+
+def render() -> str:
+    lines = []
+    seen = set()
+
+    def header(name, default_kind):
+        if name in seen:
+            return
+        seen.add(name)
+        kind, text = _help.get(name, (default_kind, ""))
+        if text:
+            lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: {"buckets": v["buckets"], "counts": list(v["counts"]), "sum": v["sum"]} for k, v in _histograms.items()}
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+    for (name, labels), hist in sorted(histograms.items()):
+        header(name, "histogram")
+        running = 0
+        for bound, count in zip(hist["buckets"], hist["counts"]):
+            running += count
+            lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', bound)])} {running}")
+        running += hist["counts"][-1]
+        lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {running}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {hist['sum']}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {running}")
+    for name, fn in sorted(_gauges.items()):
+        try:
+            value = fn()
+        except Exception as e:  # a broken gauge must not take the scrape down
+            print(f"[Metrics] gauge {name} failed: {e}")
+            continue
+        header(name, "gauge")
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in items:
+            lines.append(f"{name}{_fmt_labels(labels)} {v}")
+    return "\n".join(lines) + "\n"
+
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus scrape target. Requires `Authorization: Bearer $METRICS_TOKEN`, or an admin session."""
+    token = current_app.config.get("METRICS_TOKEN")
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    allowed = bool(token) and hmac.compare_digest(supplied, token)
+    if not allowed:
+        admins = current_app.config.get("ADMIN_EMAILS") or set()
+        allowed = current_user.is_authenticated and (current_user.email or "").lower() in admins
+    if not allowed:
+        return Response("forbidden\n", status=403, mimetype="text/plain")
+    return Response(render(), mimetype="text/plain; version=0.0.4")
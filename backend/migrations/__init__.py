@@ -0,0 +1,162 @@
+"""Small versioned migration runner.
+
+Each migration is a function registered with @migration(version, name) in
+migrations/versions.py. Applied versions are recorded in a `schema_version`
+table; `flask db upgrade` applies the missing ones in order. Works on SQLite
+and Postgres.
+"""
+import time
+from datetime import datetime
+from sqlalchemy import inspect, text
+
+MIGRATIONS = []
+_ADVISORY_LOCK_ID = 7_301_026  # arbitrary constant shared by every Ledgerwise deploy
+
+
+def migration(version: int, name: str):
+    def register(fn):
+        if any(v == version for v, _, _ in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append((version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+class Migrator:
+    """Helpers handed to every migration function."""
+
+    def __init__(self, engine, echo=print):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.echo = echo
+
+    @property
+    def is_postgres(self) -> bool:
+        return self.dialect == "postgresql"
+
+    def _inspector(self):
+        return inspect(self.engine)
+
+    def has_table(self, table: str) -> bool:
+        return self._inspector().has_table(table)
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in {c["name"] for c in self._inspector().get_columns(table)}
+
+    def has_index(self, table: str, name: str) -> bool:
+        return name in {i["name"] for i in self._inspector().get_indexes(table)}
+
+    def execute(self, sql: str, **params):
+        with self.engine.begin() as conn:
+            return conn.execute(text(sql), params)
+
+    def scalar(self, sql: str, **params):
+        with self.engine.connect() as conn:
+            return conn.execute(text(sql), params).scalar()
+
+    def add_column(self, table: str, column: str, ddl_type: str):
+        """ALTER TABLE ... ADD COLUMN when missing. Nullable/no default keeps it metadata-only on Postgres."""
+        if not self.has_column(table, column):
+            self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}")
+            self.echo(f"  added {table}.{column}")
+
+    def create_index(self, name: str, table: str, columns: str, unique: bool = False):
+        """Create an index without blocking writes: CONCURRENTLY on Postgres, plain IF NOT EXISTS on SQLite."""
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        if not self.is_postgres:
+            self.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns})")
+            return
+        with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            from .partitioning import is_partitioned
+            if is_partitioned(conn, table):
+                # CONCURRENTLY is not supported on partitioned parents; the build cascades to each partition
+                conn.execute(text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns})"))
+                return
+            valid = conn.execute(text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+            ), {"name": name}).scalar()
+            if valid is False:
+                # Left behind by an interrupted CONCURRENTLY build; it is ignored by the planner but blocks a retry
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            elif valid:
+                return
+            self.echo(f"  building {name} concurrently ...")
+            conn.execute(text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"))
+
+    def backfill(self, table: str, assignments: str, pending: str, batch_size: int = 5000):
+        """UPDATE `table` SET `assignments` in id batches while rows match `pending`.
+
+        Each batch commits separately so row locks are short-lived; progress is echoed.
+        """
+        total = self.scalar(f"SELECT COUNT(*) FROM {table} WHERE {pending}") or 0
+        if not total:
+            return 0
+        done = 0
+        started = time.perf_counter()
+        while True:
+            result = self.execute(
+                f"UPDATE {table} SET {assignments} WHERE id IN "
+                f"(SELECT id FROM {table} WHERE {pending} ORDER BY id LIMIT :batch)",
+                batch=batch_size,
+            )
+            if not result.rowcount:
+                break
+            done += result.rowcount
+            rate = done / max(time.perf_counter() - started, 1e-9)
+            self.echo(f"  {table}: backfilled {done:,}/{total:,} rows ({rate:,.0f} rows/s)")
+        return done
+
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+
+
+def applied_versions(engine) -> set:
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_version"))}
+
+
+def current_version(engine) -> int:
+    return max(applied_versions(engine), default=0)
+
+
+def pending_migrations(engine):
+    from . import versions  # noqa: F401  (registers migrations)
+    applied = applied_versions(engine)
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def upgrade(engine, target: int = None, echo=print) -> list:
+    """Apply pending migrations up to `target` (default: latest). Returns the versions applied."""
+    from . import versions  # noqa: F401
+
+    lock = None
+    if engine.dialect.name == "postgresql":
+        # Serialise concurrent deploys; session-level lock so it spans the AUTOCOMMIT index builds
+        lock = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        lock.execute(text("SELECT pg_advisory_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+    try:
+        migrator = Migrator(engine, echo)
+        done = []
+        for version, name, fn in pending_migrations(engine):
+            if target is not None and version > target:
+                break
+            echo(f"Applying {version:04d} {name}")
+            fn(migrator)
+            with engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)"),
+                    {"v": version, "n": name, "t": datetime.utcnow()},
+                )
+            done.append(version)
+        return done
+    finally:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _ADVISORY_LOCK_ID})
+            lock.close()
@@ -0,0 +1,100 @@
+import click
+from datetime import date
+from flask.cli import AppGroup
+from extensions import db
+from . import MIGRATIONS, current_version, pending_migrations, upgrade
+from .partitioning import (
+    PARTITIONED_TABLES,
+    DEFAULT_HASH_PARTITIONS,
+    convert_table,
+    create_future_partitions,
+    explain_pruning,
+)
+
+db_cli = AppGroup("db", help="Schema migrations.")
+
+
+@db_cli.command("upgrade")
+@click.option("--target", type=int, default=None, help="Stop after this version.")
+def upgrade_command(target):
+    """Apply pending migrations. Run once per deploy, not on every worker boot."""
+    applied = upgrade(db.engine, target=target)
+    click.echo(f"Applied {len(applied)} migration(s); schema at version {current_version(db.engine)}.")
+
+
+@db_cli.command("current")
+def current_command():
+    """Print the applied schema version."""
+    click.echo(current_version(db.engine))
+
+
+@db_cli.command("history")
+def history_command():
+    """List migrations and whether each is applied."""
+    pending = {v for v, _, _ in pending_migrations(db.engine)}
+    for version, name, _ in MIGRATIONS:
+        click.echo(f"{version:04d} {'pending' if version in pending else 'applied'}  {name}")
+
+
+@db_cli.command("rebuild-items")
+@click.option("--business-id", type=int, default=None, help="Only this business (default: all).")
+def rebuild_items_command(business_id):
+    """Recompute item_stat from the sale table (after manual data fixes)."""
+    from business.items import rebuild
+    with db.engine.begin() as conn:
+        written = rebuild(conn, business_id)
+    click.echo(f"Item statistics rebuilt ({written} rows).")
+
+
+@db_cli.command("rebuild-ledger-stats")
+@click.option("--business-id", type=int, default=None, help="Only this business (default: all).")
+def rebuild_ledger_stats_command(business_id):
+    """Seed ledger_stat (anomaly flag state) from existing sales and expenses."""
+    from business.anomalies import seed_states
+    written = seed_states(business_id)
+    db.session.commit()
+    click.echo(f"Ledger statistics rebuilt for {written} keys.")
+
+
+@db_cli.command("clear-ledger-cache")
+@click.option("--business-id", type=int, default=None, help="Only this business (default: all).")
+def clear_ledger_cache_command(business_id):
+    """Drop memory-mapped ledger copies (after editing sale/expense rows outside the app); they rebuild on read."""
+    import ledger_cache
+    ledger_cache.clear(business_id)
+    click.echo("Ledger cache cleared.")
+
+
+@db_cli.command("partition")
+@click.option("--by", type=click.Choice(["month", "business"]), required=True)
+@click.option("--ahead", type=int, default=3, help="Month partitions to pre-create past the current month.")
+@click.option("--modulus", type=int, default=DEFAULT_HASH_PARTITIONS, help="Hash partitions for --by business.")
+def partition_command(by, ahead, modulus):
+    """Convert sale/expense to Postgres partitioned tables (exclusive lock; run in a maintenance window)."""
+    for table in PARTITIONED_TABLES:
+        convert_table(db.engine, table, by, ahead=ahead, modulus=modulus, echo=click.echo)
+
+
+@db_cli.command("partitions")
+@click.option("--ahead", type=int, default=3)
+def partitions_command(ahead):
+    """Maintenance: pre-create upcoming month partitions (schedule daily or weekly)."""
+    created = create_future_partitions(db.engine, ahead=ahead, echo=click.echo)
+    click.echo(f"Created {created} partition(s).")
+
+
+@db_cli.command("explain-pruning")
+@click.option("--business-id", type=int, default=1)
+@click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), default=None)
+def explain_pruning_command(business_id, since):
+    """Show how many partitions the dashboard, tax and period queries scan."""
+    since = since.date() if since else date(date.today().year - 1, date.today().month, 1)
+    rows = explain_pruning(db.engine, business_id, since)
+    if not rows:
+        click.echo("No partitioned tables (or not Postgres); nothing to prune.")
+    for label, scanned, total in rows:
+        click.echo(f"{label:<50} {scanned}/{total} partitions")
+
+
+def register_db_commands(app):
+    app.cli.add_command(db_cli)
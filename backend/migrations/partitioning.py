@@ -0,0 +1,186 @@
+"""Optional Postgres declarative partitioning for the sale and expense tables.
+
+Two layouts are supported:
+
+* ``month``    - PARTITION BY RANGE (date), one partition per calendar month plus a
+                 DEFAULT partition for undated rows. Period queries (projection
+                 history, trailing-12-month portfolio totals) prune to the months
+                 they touch.
+* ``business`` - PARTITION BY HASH (business_id) with a fixed modulus. Every
+                 per-business query (dashboard, tax, PIT, lists) prunes to one
+                 partition.
+
+The ORM models are unchanged, so the same code runs on SQLite, where every
+command here is a no-op. Converting is an explicit maintenance step
+(`flask db partition --by month|business`) because it rewrites the tables.
+"""
+import json
+from datetime import date
+from sqlalchemy import text
+
+PARTITIONED_TABLES = ("sale", "expense")
+DEFAULT_HASH_PARTITIONS = 16
+
+
+def _month_start(year: int, month: int) -> date:
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date(year, month, 1)
+
+
+def _month_partition(table: str, start: date) -> str:
+    return f"{table}_p{start.year:04d}{start.month:02d}"
+
+
+def partition_strategy(conn, table: str):
+    """'range', 'hash' or None (not partitioned / not Postgres)."""
+    if conn.dialect.name != "postgresql":
+        return None
+    row = conn.execute(text(
+        "SELECT p.partstrat FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :t AND c.relnamespace = 'public'::regnamespace"
+    ), {"t": table}).scalar()
+    return {"r": "range", "h": "hash"}.get(row)
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return partition_strategy(conn, table) is not None
+
+
+def create_month_partitions(conn, table: str, first: date, ahead: int = 3, today: date = None, echo=print) -> int:
+    """Create monthly partitions from `first` through `ahead` months past today. Returns how many were new.
+
+    Creating them ahead of time matters: once a row for a month lands in the
+    DEFAULT partition, Postgres refuses to attach that month until it is moved.
+    """
+    today = today or date.today()
+    start = _month_start(first.year, first.month)
+    last = _month_start(today.year, today.month + ahead)
+    created = 0
+    while start <= last:
+        end = _month_start(start.year, start.month + 1)
+        name = _month_partition(table, start)
+        exists = conn.execute(text("SELECT to_regclass(:n)"), {"n": f"public.{name}"}).scalar()
+        if not exists:
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+            echo(f"  created {name}")
+            created += 1
+        start = end
+    return created
+
+
+def _copy_into_partitioned(conn, table: str, partition_clause: str):
+    legacy = f"{table}_unpartitioned"
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    # Index names are global in a schema; free them for the new parent
+    for (index_name,) in conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :t"), {"t": legacy}).all():
+        conn.execute(text(f"ALTER INDEX {index_name} RENAME TO {index_name}_unpartitioned"))
+    conn.execute(text(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY {partition_clause}"))
+    # The id sequence is owned by the legacy column; re-home it before the legacy table is dropped
+    seq = conn.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": legacy}).scalar()
+    if seq:
+        conn.execute(text(f"ALTER SEQUENCE {seq} OWNED BY {table}.id"))
+    return legacy
+
+
+def _finish(conn, table: str, legacy: str, unique_key: str, echo):
+    # Unique indexes on a partitioned table must include the partition key. row_hash already
+    # encodes business and date, so (row_hash, key) is as strict as row_hash alone.
+    conn.execute(text(f"CREATE UNIQUE INDEX ix_{table}_row_hash ON {table} (row_hash, {unique_key})"))
+    conn.execute(text(f"CREATE INDEX ix_{table}_business_date ON {table} (business_id, date)"))
+    conn.execute(text(f"CREATE INDEX ix_{table}_id ON {table} (id)"))
+    conn.execute(text(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_business_id_fkey "
+        f"FOREIGN KEY (business_id) REFERENCES business_profile (id)"
+    ))
+    moved = conn.execute(text(f"INSERT INTO {table} SELECT * FROM {legacy}")).rowcount
+    conn.execute(text(f"DROP TABLE {legacy}"))
+    conn.execute(text(f"ANALYZE {table}"))
+    echo(f"  {table}: moved {moved:,} rows into partitions")
+
+
+def convert_table(engine, table: str, by: str, ahead: int = 3, modulus: int = DEFAULT_HASH_PARTITIONS, echo=print):
+    """Rewrite `table` as a partitioned table in one transaction (takes an exclusive lock; run off-peak)."""
+    if engine.dialect.name != "postgresql":
+        echo(f"  {table}: partitioning is Postgres-only; SQLite keeps the plain table")
+        return False
+    with engine.begin() as conn:
+        if is_partitioned(conn, table):
+            echo(f"  {table}: already partitioned ({partition_strategy(conn, table)})")
+            return False
+        # Without a partition-key column a global primary key is impossible; ids stay unique via the sequence
+        if by == "month":
+            first = conn.execute(text(f"SELECT MIN(date) FROM {table}")).scalar() or date.today()
+            legacy = _copy_into_partitioned(conn, table, "RANGE (date)")
+            conn.execute(text(f"CREATE TABLE {table}_pdefault PARTITION OF {table} DEFAULT"))
+            create_month_partitions(conn, table, first, ahead=ahead, echo=echo)
+            _finish(conn, table, legacy, "date", echo)
+        elif by == "business":
+            legacy = _copy_into_partitioned(conn, table, "HASH (business_id)")
+            for remainder in range(modulus):
+                conn.execute(text(
+                    f"CREATE TABLE {table}_h{remainder:02d} PARTITION OF {table} "
+                    f"FOR VALUES WITH (MODULUS {modulus}, REMAINDER {remainder})"
+                ))
+            _finish(conn, table, legacy, "business_id", echo)
+        else:
+            raise ValueError("by must be 'month' or 'business'")
+    return True
+
+
+def create_future_partitions(engine, ahead: int = 3, echo=print) -> int:
+    """Maintenance: make sure month-partitioned tables have partitions `ahead` months out."""
+    if engine.dialect.name != "postgresql":
+        return 0
+    created = 0
+    with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            if partition_strategy(conn, table) == "range":
+                created += create_month_partitions(conn, table, date.today(), ahead=ahead, echo=echo)
+    return created
+
+
+def _scanned_relations(plan) -> set:
+    found = set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if "Relation Name" in node:
+            found.add(node["Relation Name"])
+        stack.extend(node.get("Plans", []))
+    return found
+
+
+def explain_pruning(engine, business_id: int, since: date):
+    """EXPLAIN representative ledger queries and report how many partitions each touches.
+
+    Returns [(label, scanned, total_partitions)] for each table/query pair.
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+    queries = {
+        "dashboard/tax totals": "SELECT COALESCE(SUM(amount_kobo), 0) FROM {t} WHERE business_id = :b",
+        "period (projection history)": (
+            "SELECT date, SUM(amount_kobo) FROM {t} WHERE business_id = :b AND date >= :since GROUP BY date"
+        ),
+        "trailing 12 months (portfolio)": (
+            "SELECT business_id, SUM(amount_kobo) FROM {t} WHERE date >= :since GROUP BY business_id"
+        ),
+    }
+    results = []
+    with engine.connect() as conn:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(conn, table):
+                continue
+            total = conn.execute(text(
+                "SELECT COUNT(*) FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhparent WHERE c.relname = :t"
+            ), {"t": table}).scalar()
+            for label, sql in queries.items():
+                raw = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql.format(t=table)),
+                                   {"b": business_id, "since": since}).scalar()
+                plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+                scanned = {r for r in _scanned_relations(plan) if r != table}
+                results.append((f"{table}: {label}", len(scanned), total))
+    return results
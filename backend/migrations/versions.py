@@ -0,0 +1,108 @@
+"""Ordered schema migrations. Append new ones at the bottom with the next version number.
+
+Migrations must be safe to run against a database that `db.create_all()` already
+built from the current models (fresh installs), so they check before altering.
+"""
+from extensions import db
+from . import migration
+
+
+@migration(1, "baseline tables and legacy column fixes")
+def baseline(m):
+    import models  # noqa: F401  (register every model on db.metadata)
+
+    # Creates only tables that do not exist yet; existing tables are left untouched
+    db.metadata.create_all(m.engine)
+
+    for table in ("sale", "expense"):
+        m.add_column(table, "quantity", "INTEGER DEFAULT 1")
+        m.add_column(table, "unit_price", "DOUBLE PRECISION")
+
+    if m.has_column("sale", "sale_type"):
+        try:
+            m.execute("ALTER TABLE sale DROP COLUMN sale_type")
+        except Exception:
+            # DROP COLUMN needs SQLite >= 3.35; relax the constraint instead where unsupported
+            if m.is_postgres:
+                m.execute("ALTER TABLE sale ALTER COLUMN sale_type DROP NOT NULL")
+                m.execute("ALTER TABLE sale ALTER COLUMN sale_type SET DEFAULT 'fixed'")
+
+
+@migration(2, "import row hashes and manifest")
+def import_row_hashes(m):
+    import models  # noqa: F401
+
+    for table in ("sale", "expense"):
+        m.add_column(table, "row_hash", "VARCHAR(64)")
+        m.create_index(f"ix_{table}_row_hash", table, "row_hash", unique=True)
+    db.metadata.tables["import_manifest"].create(m.engine, checkfirst=True)
+
+
+@migration(3, "per-business ledger indexes")
+def ledger_indexes(m):
+    # Every ledger query filters on business_id, most also order or window by date
+    m.create_index("ix_sale_business_date", "sale", "business_id, date")
+    m.create_index("ix_expense_business_date", "expense", "business_id, date")
+
+
+@migration(4, "integer kobo money columns")
+def kobo_columns(m):
+    for table in ("sale", "expense"):
+        m.add_column(table, "amount_kobo", "BIGINT")
+        m.add_column(table, "unit_price_kobo", "BIGINT")
+        # NUMERIC cast so ROUND is exact half-away-from-zero rather than on the binary double
+        m.backfill(
+            table,
+            "amount_kobo = CAST(ROUND(CAST(amount AS NUMERIC) * 100) AS BIGINT), "
+            "unit_price_kobo = CAST(ROUND(CAST(unit_price AS NUMERIC) * 100) AS BIGINT)",
+            "amount_kobo IS NULL AND amount IS NOT NULL",
+        )
+
+
+@migration(5, "business data version")
+def business_data_version(m):
+    # Constant default: metadata-only on Postgres 11+, no table rewrite
+    m.add_column("business_profile", "data_version", "BIGINT NOT NULL DEFAULT 0")
+
+
+@migration(6, "server-side chat sessions")
+def chat_sessions(m):
+    import models  # noqa: F401
+
+    for table in ("chat_session", "chat_turn"):
+        db.metadata.tables[table].create(m.engine, checkfirst=True)
+
+
+@migration(7, "insight snapshots")
+def insight_snapshots(m):
+    import models  # noqa: F401
+
+    db.metadata.tables["insight_snapshot"].create(m.engine, checkfirst=True)
+
+
+@migration(8, "item statistics")
+def item_statistics(m):
+    import models  # noqa: F401
+    from business.items import rebuild
+
+    db.metadata.tables["item_stat"].create(m.engine, checkfirst=True)
+    # One pass over the sale table; afterwards writes keep it current
+    with m.engine.begin() as conn:
+        rebuild(conn)
+
+
+@migration(9, "ledger anomaly statistics")
+def ledger_stats(m):
+    import models  # noqa: F401
+
+    # Starts empty and fills from new writes; `flask db rebuild-ledger-stats` seeds it from history
+    db.metadata.tables["ledger_stat"].create(m.engine, checkfirst=True)
+
+
+@migration(10, "item statistics keyed in Python")
+def item_statistics_rekey(m):
+    from business.items import rebuild
+
+    # Version 8 grouped by SQL lower(trim(name)), which disagrees with name_key for non-ASCII names
+    with m.engine.begin() as conn:
+        rebuild(conn)
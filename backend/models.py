@@ -1,5 +1,6 @@
 from extensions import db
 from flask_login import UserMixin
+from datetime import datetime
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -13,6 +14,8 @@ class BusinessProfile(db.Model):
     name = db.Column(db.String(80), nullable=False)
     industry = db.Column(db.String(100))
     business_type = db.Column(db.String(100))
+    # Bumped on every ledger write/import; drives ETags on read endpoints (see http_cache.py)
+    data_version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
 
     user = db.relationship('User', backref=db.backref('business_profile', uselist=False))
 
@@ -20,22 +23,121 @@ class Sale(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     amount = db.Column(db.Float, nullable=False)  # total amount (quantity * unit_price)
+    amount_kobo = db.Column(db.BigInteger)  # exact total in kobo; use for sums
     date = db.Column(db.Date)
     description = db.Column(db.String(255))
     quantity = db.Column(db.Integer, default=1)
     unit_price = db.Column(db.Float)
+    unit_price_kobo = db.Column(db.BigInteger)
     business_id = db.Column(db.Integer, db.ForeignKey('business_profile.id'))  # <== should match the actual table name
+    row_hash = db.Column(db.String(64), unique=True, index=True)  # set for imported rows only
 
     business = db.relationship('BusinessProfile', backref=db.backref('sales', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_sale_business_date', 'business_id', 'date'),
+    )
+
 
 class Expense(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     amount = db.Column(db.Float)  # total amount (quantity * unit_price)
+    amount_kobo = db.Column(db.BigInteger)  # exact total in kobo; use for sums
     date = db.Column(db.Date)
     description = db.Column(db.String(255))
     quantity = db.Column(db.Integer, default=1)
     unit_price = db.Column(db.Float)
+    unit_price_kobo = db.Column(db.BigInteger)
     business_id = db.Column(db.Integer, db.ForeignKey('business_profile.id'))
+    row_hash = db.Column(db.String(64), unique=True, index=True)  # set for imported rows only
 
     business = db.relationship('BusinessProfile', backref=db.backref('expenses', lazy=True))
+
+    __table_args__ = (
+        db.Index('ix_expense_business_date', 'business_id', 'date'),
+    )
+
+
+class ImportManifest(db.Model):
+    """One row per file imported into a business, keyed by the file's SHA-256 digest."""
+    id = db.Column(db.Integer, primary_key=True)
+    business_id = db.Column(db.Integer, db.ForeignKey('business_profile.id'), nullable=False)
+    file_digest = db.Column(db.String(64), nullable=False)
+    filename = db.Column(db.String(255))
+    sales_added = db.Column(db.Integer, default=0)
+    expenses_added = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('business_id', 'file_digest', name='uq_import_manifest_business_digest'),
+    )
+
+
+class ChatSession(db.Model):
+    """A server-side /ai/chat conversation. Turns before `summarized_through` live only in `summary`."""
+    id = db.Column(db.String(32), primary_key=True)  # random hex; handed to the client
+    business_id = db.Column(db.Integer, db.ForeignKey('business_profile.id'), nullable=False, index=True)
+    summary = db.Column(db.Text, nullable=False, default='')
+    summarized_through = db.Column(db.Integer, nullable=False, default=0)  # turns [0, n) are folded into summary
+    turn_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ChatTurn(db.Model):
+    """One message of a chat session; role is 'u' (user) or 'a' (assistant)."""
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(32), db.ForeignKey('chat_session.id', ondelete='CASCADE'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    role = db.Column(db.String(1), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('session_id', 'seq', name='uq_chat_turn_session_seq'),
+    )
+
+
+class InsightSnapshot(db.Model):
+    """Latest computed /ai/insights or /ai/analyze response for a business and period."""
+    id = db.Column(db.Integer, primary_key=True)
+    business_id = db.Column(db.Integer, db.ForeignKey('business_profile.id'), nullable=False)
+    kind = db.Column(db.String(16), nullable=False)  # 'insights' | 'analyze'
+    period = db.Column(db.String(16), nullable=False)
+    data_version = db.Column(db.BigInteger, nullable=False)  # BusinessProfile.data_version it was computed from
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    generated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('business_id', 'kind', 'period', name='uq_insight_snapshot_business_kind_period'),
+    )
+
+
+class ItemStat(db.Model):
+    """Per-business sales aggregates by item name, maintained on every sale write (see business/items.py).
+
+    One row per item per calendar month (period = YYYYMM) plus an all-time row (period = 0).
+    """
+    business_id = db.Column(db.Integer, db.ForeignKey('business_profile.id'), primary_key=True)
+    period = db.Column(db.Integer, primary_key=True)
+    name_key = db.Column(db.String(120), primary_key=True)  # business.items.name_key(Sale.name)
+    name = db.Column(db.String(120), nullable=False)  # display name, as last written
+    sales_kobo = db.Column(db.BigInteger, nullable=False, default=0)
+    units = db.Column(db.BigInteger, nullable=False, default=0)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+    first_sold = db.Column(db.Date)
+    last_sold = db.Column(db.Date)
+
+    __table_args__ = (
+        db.Index('ix_item_stat_business_period_sales', 'business_id', 'period', 'sales_kobo'),
+    )
+
+
+class LedgerStat(db.Model):
+    """Streaming statistics of log10 amounts for one key, used to flag outliers (see business/anomalies.py).
+
+    scope is 'sale' / 'expense' (whole business, key '') or 'sale_item' / 'expense_item' (key = item name).
+    """
+    business_id = db.Column(db.Integer, db.ForeignKey('business_profile.id'), primary_key=True)
+    scope = db.Column(db.String(16), primary_key=True)
+    key = db.Column(db.String(120), primary_key=True)
+    state = db.Column(db.Text, nullable=False)  # JSON: Welford n/mean/m2 plus P2 median and MAD markers
@@ -0,0 +1,41 @@
+"""Money is stored as integer kobo (1 NGN = 100 kobo) so sums are exact.
+
+The legacy float `amount`/`unit_price` columns are still written alongside
+(rounded to the kobo) for older readers; totals should come from the
+`*_kobo` columns and be converted to naira only at the edge.
+"""
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from extensions import db
+
+KOBO_PER_NAIRA = 100
+
+
+def to_kobo(value) -> int:
+    """Naira (float/str/Decimal) -> integer kobo, rounding half away from zero."""
+    if value is None:
+        return None
+    try:
+        return int((Decimal(str(value)) * KOBO_PER_NAIRA).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f"Invalid money amount: {value!r}")
+
+
+def naira(kobo) -> float:
+    return (kobo or 0) / KOBO_PER_NAIRA
+
+
+def money_values(total, unit_price) -> dict:
+    """Column values for a ledger row: kobo integers plus matching legacy floats."""
+    amount_kobo = to_kobo(total or 0)
+    unit_price_kobo = to_kobo(unit_price)
+    return {
+        "amount": naira(amount_kobo),
+        "amount_kobo": amount_kobo,
+        "unit_price": naira(unit_price_kobo) if unit_price_kobo is not None else None,
+        "unit_price_kobo": unit_price_kobo,
+    }
+
+
+def kobo_sum(column):
+    """SUM over a *_kobo column that stays an integer in SQL (0 when there are no rows)."""
+    return db.func.coalesce(db.func.sum(column), 0)
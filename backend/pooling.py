@@ -0,0 +1,121 @@
+"""Connection pool sizing and instrumentation.
+
+Pool size follows the gunicorn worker model so the service as a whole stays
+under the database's connection limit:
+
+    workers (WEB_CONCURRENCY) x (pool_size + max_overflow) <= DB_MAX_CONNECTIONS
+
+Each worker needs about one connection per thread (GUNICORN_THREADS). DB_POOL_SIZE
+and DB_MAX_OVERFLOW override the derived values. With DB_PGBOUNCER=1 the app
+keeps no pool of its own (NullPool) and leaves pooling to PgBouncer.
+"""
+import os
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import NullPool, QueuePool
+import metrics
+
+CHECKOUT_WAIT = "db_pool_checkout_wait_seconds"
+CHECKOUT_TIMEOUTS = "db_pool_checkout_timeouts_total"
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+metrics.describe(CHECKOUT_WAIT, "histogram", "Time spent waiting for a pooled connection")
+metrics.describe(CHECKOUT_TIMEOUTS, "counter", "Checkouts that hit pool_timeout")
+
+
+def _env_int(env, name, default=None):
+    value = env.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_flag(env, name, default: bool) -> bool:
+    value = env.get(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited (pool exhaustion shows up here first)."""
+
+    lw_name = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            metrics.inc(CHECKOUT_TIMEOUTS, pool=self.lw_name)
+            raise
+        finally:
+            metrics.observe(CHECKOUT_WAIT, time.perf_counter() - started, buckets=CHECKOUT_BUCKETS, pool=self.lw_name)
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep its label
+        pool = super().recreate()
+        pool.lw_name = self.lw_name
+        return pool
+
+
+def pool_settings(env=None) -> dict:
+    """Derive pool_size/max_overflow from WEB_CONCURRENCY, GUNICORN_THREADS and DB_MAX_CONNECTIONS."""
+    env = os.environ if env is None else env
+    workers = max(1, _env_int(env, "WEB_CONCURRENCY", 1))
+    threads = max(1, _env_int(env, "GUNICORN_THREADS", 1))
+    size = _env_int(env, "DB_POOL_SIZE", threads)
+    overflow = _env_int(env, "DB_MAX_OVERFLOW", threads)
+    budget = _env_int(env, "DB_MAX_CONNECTIONS")
+    if budget:
+        per_worker = max(1, budget // workers)
+        size = min(size, per_worker)
+        overflow = min(overflow, per_worker - size)
+    return {"workers": workers, "threads": threads, "pool_size": size, "max_overflow": max(0, overflow)}
+
+
+def engine_options(uri: str, env=None) -> dict:
+    """SQLALCHEMY_ENGINE_OPTIONS for `uri` under the current worker model."""
+    env = os.environ if env is None else env
+    pre_ping = _env_flag(env, "DB_POOL_PRE_PING", True)
+    recycle = _env_int(env, "DB_POOL_RECYCLE", 300)
+    if uri.startswith("sqlite") and (":memory:" in uri or uri.rstrip("/") == "sqlite:"):
+        return {"pool_pre_ping": pre_ping}
+
+    if _env_flag(env, "DB_PGBOUNCER", False):
+        options = {"poolclass": NullPool}
+        if uri.startswith("postgresql+psycopg:"):
+            # psycopg 3 prepares repeated statements server-side; PgBouncer transaction mode cannot route them.
+            # psycopg2 (the default driver) never prepares, so it needs nothing here.
+            options["connect_args"] = {"prepare_threshold": None}
+        return options
+
+    sizing = pool_settings(env)
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": sizing["pool_size"],
+        "max_overflow": sizing["max_overflow"],
+        "pool_timeout": _env_int(env, "DB_POOL_TIMEOUT", 10),
+        "pool_recycle": recycle,
+        "pool_pre_ping": pre_ping,
+    }
+
+
+def register_pool_gauges(engines: dict):
+    """Expose checked-out/idle/overflow counts for each QueuePool engine."""
+    for key, engine in engines.items():
+        name = key or "primary"
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.lw_name = name
+
+    def snapshot(attr):
+        def read():
+            out = {}
+            for key, engine in engines.items():
+                pool = engine.pool
+                if isinstance(pool, QueuePool):
+                    out[(("pool", key or "primary"),)] = getattr(pool, attr)()
+            return out
+        return read
+
+    metrics.gauge("db_pool_checked_out", snapshot("checkedout"), "Connections currently checked out")
+    metrics.gauge("db_pool_idle", snapshot("checkedin"), "Idle connections held by the pool")
+    metrics.gauge("db_pool_overflow", snapshot("overflow"), "Connections above pool_size (negative: not yet opened)")
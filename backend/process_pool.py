@@ -0,0 +1,35 @@
+"""Process pools for CPU-heavy request work (parallel imports, sharded portfolio reports).
+
+Each web worker keeps one pool per worker count, created on first use and
+reused by later requests, so N gunicorn workers run at most N small pools
+rather than one full-size pool per request. Children are started with the
+forkserver method: a gunicorn worker already runs threads (the LLM pool,
+insight refresh timers), and a child forked from a multi-threaded process can
+block forever on a lock one of those threads held at fork time.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_MAX_WORKERS = 4  # per web worker, when IMPORT_WORKERS / PORTFOLIO_POOL_WORKERS are unset
+
+_pools = {}  # (pid, workers) -> ProcessPoolExecutor
+_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    return min(DEFAULT_MAX_WORKERS, os.cpu_count() or 1)
+
+
+def get(workers: int = None) -> ProcessPoolExecutor:
+    """This process's pool of `workers` (default: default_workers()) processes; replaced if it broke."""
+    workers = workers or default_workers()
+    key = (os.getpid(), workers)  # a pool inherited across a fork is not usable in the child
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None or getattr(pool, "_broken", False):
+            pool = _pools[key] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("forkserver")
+            )
+        return pool
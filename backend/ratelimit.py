@@ -0,0 +1,285 @@
+"""Per-user token buckets and a global cap on in-flight LLM calls.
+
+Two backends:
+
+* ``memory`` - state lives in the worker process. Fine for one worker.
+* ``sqlite`` - state lives in a SQLite file (default under /dev/shm) shared by
+  every gunicorn worker on the host; transactions use BEGIN IMMEDIATE so
+  updates are serialised across processes.
+
+Decorate expensive handlers with @ai_limited(route, per_minute, burst). The
+bucket is checked first (429 + Retry-After when empty); the handler then
+waits up to LLM_QUEUE_SECONDS for an LLM slot before giving up with 429.
+The slot is held as a `SlotLease`: a hedged LLM request takes a second slot
+(or is not sent), and calls still running when the handler gives up keep
+their slots until they finish.
+"""
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from functools import wraps
+from flask import current_app, jsonify
+from flask_login import current_user
+from ai.llm import holding_slots
+import metrics
+
+metrics.describe("rate_limited_total", "counter", "Requests rejected by a rate limit or the LLM concurrency cap")
+metrics.describe("llm_slot_wait_seconds", "histogram", "Time spent queueing for an LLM slot")
+
+SLOT_LEASE_SECONDS = 300  # a crashed worker's slot frees itself after this
+_POLL_SECONDS = 0.05
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._slots = set()
+        self._slot_freed = threading.Condition(self._lock)
+
+    def take(self, key: str, rate: float, capacity: float, now: float = None):
+        """Take one token. Returns (allowed, seconds until a token is available)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            return False, (1 - tokens) / rate
+
+    def acquire_slot(self, limit: int, timeout: float):
+        deadline = time.monotonic() + timeout
+        with self._slot_freed:
+            while len(self._slots) >= limit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._slot_freed.wait(remaining)
+            token = uuid.uuid4().hex
+            self._slots.add(token)
+            return token
+
+    def release_slot(self, token: str):
+        with self._slot_freed:
+            self._slots.discard(token)
+            self._slot_freed.notify()
+
+
+class SQLiteBackend:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_slots (token TEXT PRIMARY KEY, expires REAL NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # limiter state is disposable
+            self._local.conn = conn
+        return conn
+
+    def _immediate(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def take(self, key: str, rate: float, capacity: float, now: float = None):
+        now = time.time() if now is None else now
+
+        def run(conn):
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+        return self._immediate(run)
+
+    def acquire_slot(self, limit: int, timeout: float):
+        deadline = time.monotonic() + timeout
+        token = uuid.uuid4().hex
+
+        def run(conn):
+            now = time.time()
+            conn.execute("DELETE FROM llm_slots WHERE expires < ?", (now,))
+            if conn.execute("SELECT COUNT(*) FROM llm_slots").fetchone()[0] >= limit:
+                return False
+            conn.execute("INSERT INTO llm_slots (token, expires) VALUES (?, ?)", (token, now + SLOT_LEASE_SECONDS))
+            return True
+
+        while True:
+            if self._immediate(run):
+                return token
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(_POLL_SECONDS)
+
+    def release_slot(self, token: str):
+        self._immediate(lambda conn: conn.execute("DELETE FROM llm_slots WHERE token = ?", (token,)))
+
+
+class SlotLease:
+    """One request's LLM slots. All are released once the request is done and no provider call is still running."""
+
+    def __init__(self, backend, limit: int, token: str):
+        self.backend = backend
+        self.limit = limit
+        self._tokens = [token]
+        self._running = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def try_extra(self) -> bool:
+        """Take another slot for a hedged call without waiting; False when none is free."""
+        token = self.backend.acquire_slot(self.limit, 0)
+        if token is None:
+            return False
+        with self._lock:
+            self._tokens.append(token)
+        return True
+
+    def outlive(self, futures):
+        """Keep the slots until these abandoned provider calls finish (bounded by the client read timeout)."""
+        with self._lock:
+            self._running += len(futures)
+        for future in futures:
+            future.add_done_callback(self._finished)
+
+    def _finished(self, _future):
+        with self._lock:
+            self._running -= 1
+        self._release_if_idle()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._release_if_idle()
+
+    def _release_if_idle(self):
+        with self._lock:
+            if not self._closed or self._running:
+                return
+            tokens, self._tokens = self._tokens, []
+        for token in tokens:
+            self.backend.release_slot(token)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _default_sqlite_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "ledgerwise-ratelimit.db")
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                kind = current_app.config.get("RATE_LIMIT_BACKEND", "memory")
+                if kind == "sqlite":
+                    _backend = SQLiteBackend(current_app.config.get("RATE_LIMIT_SQLITE_PATH") or _default_sqlite_path())
+                elif kind == "memory":
+                    _backend = MemoryBackend()
+                else:
+                    raise ValueError(f"Unknown RATE_LIMIT_BACKEND {kind!r}; use 'memory' or 'sqlite'")
+    return _backend
+
+
+def parse_overrides(text: str) -> dict:
+    """'chat=30:10,analyze=2:1' -> {route: (per_minute, burst)}. Malformed or non-positive entries are logged and skipped."""
+    overrides = {}
+    for item in (text or "").split(","):
+        if not item.strip():
+            continue
+        try:
+            route, spec = item.split("=")
+            per_minute, burst = spec.split(":")
+            per_minute, burst = float(per_minute), int(burst)
+            if not route.strip() or not per_minute > 0 or burst < 1 or math.isinf(per_minute):
+                raise ValueError
+        except ValueError:
+            print(f"[RateLimit] ignoring RATE_LIMIT_OVERRIDES entry {item.strip()!r}; expected route=per_minute:burst")
+            continue
+        overrides[route.strip()] = (per_minute, burst)
+    return overrides
+
+
+_parsed_overrides = {}  # raw setting -> parsed, so each bad entry is logged once per process
+
+
+def _limit_for(route: str, per_minute: float, burst: int):
+    """Apply RATE_LIMIT_OVERRIDES entries of the form route=per_minute:burst."""
+    setting = current_app.config.get("RATE_LIMIT_OVERRIDES") or ""
+    if isinstance(setting, dict):
+        overrides = setting
+    else:
+        if setting not in _parsed_overrides:
+            _parsed_overrides[setting] = parse_overrides(setting)
+        overrides = _parsed_overrides[setting]
+    return overrides.get(route) or (per_minute, burst)
+
+
+def _too_many(reason: str, route: str, retry_after: float):
+    metrics.inc("rate_limited_total", route=route, reason=reason)
+    seconds = max(1, math.ceil(retry_after))
+    resp = jsonify({"error": "Too many requests, please retry shortly", "retry_after": seconds})
+    resp.status_code = 429
+    resp.headers["Retry-After"] = str(seconds)
+    return resp
+
+
+def ai_limited(route: str, per_minute: float, burst: int, skip_slot=None):
+    """Per-user token bucket for `route`, then a global in-flight LLM slot. Use after @login_required.
+
+    `skip_slot`, if given, is called after the bucket check; when it returns True
+    (e.g. the answer is already cached) the handler runs without taking a slot.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get("RATE_LIMIT_ENABLED", True):
+                return view(*args, **kwargs)
+            backend = get_backend()
+            rate, capacity = _limit_for(route, per_minute, burst)
+            allowed, retry_after = backend.take(f"{route}:{current_user.id}", rate / 60.0, capacity)
+            if not allowed:
+                return _too_many("user_rate", route, retry_after)
+            if skip_slot is not None and skip_slot():
+                return view(*args, **kwargs)
+
+            started = time.perf_counter()
+            limit = current_app.config.get("LLM_MAX_CONCURRENCY", 4)
+            token = backend.acquire_slot(limit, current_app.config.get("LLM_QUEUE_SECONDS", 3.0))
+            metrics.observe("llm_slot_wait_seconds", time.perf_counter() - started)
+            if token is None:
+                return _too_many("llm_concurrency", route, current_app.config.get("LLM_RETRY_AFTER_SECONDS", 5))
+            lease = SlotLease(backend, limit, token)
+            try:
+                with holding_slots(lease):
+                    return view(*args, **kwargs)
+            finally:
+                lease.close()
+        return wrapper
+    return decorator
@@ -12,6 +12,8 @@ type ChatMsg = { id: number; role: 'user' | 'assistant'; content: string; time?:
 const Chat = () => {
   const [message, setMessage] = useState("");
   const [loading, setLoading] = useState(false);
+  // Server-side conversation id; the server keeps the history, so each turn sends only the new message
+  const [sessionId, setSessionId] = useState<string | null>(null);
   const [messages, setMessages] = useState<ChatMsg[]>([{
     id: 1,
     role: 'assistant',
@@ -34,15 +36,16 @@ const Chat = () => {
     setLoading(true);
 
     try {
-      const history = messages.map(m => ({ role: m.role, content: m.content }));
       const res = await fetch(`${API_BASE}/ai/chat`, {
         method: 'POST',
         credentials: 'include',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ history, message: userMsg.content })
+        body: JSON.stringify({ session_id: sessionId, message: userMsg.content })
       });
 
       const data = await res.json();
+      if (res.status === 404) setSessionId(null);
+      else if (res.ok && data?.session_id) setSessionId(data.session_id);
       const replyText = res.ok && data?.reply ? data.reply : (
         data?.error || "Sorry, I couldn't reach the AI service right now."
       );
@@ -35,12 +35,13 @@ const Reports = () => {
   const [expensesData, setExpensesData] = useState<any[]>([]);
   const [pitQuick, setPitQuick] = useState<any | null>(null);
 
-  const fetchAll = async () => {
+  // refresh=true asks the server to recompute the AI snapshots instead of serving the stored ones
+  const fetchAll = async (refresh = false) => {
     try {
       setLoading(true);
       const [insightsRes, analyzeRes, taxRes, salesRes, expensesRes, pitRes] = await Promise.all([
-        fetch(`${API_BASE}/ai/insights`, { method: "POST", credentials: "include", headers: { "Content-Type": "application/json" }, body: JSON.stringify({ period }) }),
-        fetch(`${API_BASE}/ai/analyze`, { method: "POST", credentials: "include", headers: { "Content-Type": "application/json" }, body: JSON.stringify({ period }) }),
+        fetch(`${API_BASE}/ai/insights`, { method: "POST", credentials: "include", headers: { "Content-Type": "application/json" }, body: JSON.stringify({ period, refresh }) }),
+        fetch(`${API_BASE}/ai/analyze`, { method: "POST", credentials: "include", headers: { "Content-Type": "application/json" }, body: JSON.stringify({ period, refresh }) }),
         fetch(`${API_BASE}/ai/tax`, { credentials: "include" }),
         fetch(`${API_BASE}/business/sales`, { credentials: "include" }),
         fetch(`${API_BASE}/business/expenses`, { credentials: "include" }),
@@ -170,7 +171,7 @@ const Reports = () => {
                 <SelectItem value="year">This Year</SelectItem>
               </SelectContent>
             </Select>
-            <Button className="h-9 px-3" onClick={fetchAll} disabled={loading}>{loading ? "Refreshing..." : "Refresh AI"}</Button>
+            <Button className="h-9 px-3" onClick={() => fetchAll(true)} disabled={loading}>{loading ? "Refreshing..." : "Refresh AI"}</Button>
           </div>
         </div>
 